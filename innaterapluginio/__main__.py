@@ -13,6 +13,7 @@
 import os
 import sys
 import traceback
+import warnings
 
 import click
 
@@ -66,12 +67,8 @@ def configure():
 
     # https://urllib3.readthedocs.org
     # /en/latest/security.html#insecureplatformwarning
-    try:
-        import urllib3  # pylint: disable=import-outside-toplevel
-
-        urllib3.disable_warnings()
-    except (AttributeError, ImportError):
-        pass
+    # the same as `urllib3.disable_warnings()` without importing it on startup
+    warnings.filterwarnings("ignore", module="urllib3")
 
     # Handle IOError issue with VSCode's Terminal (Windows)
     click_echo_origin = [click.echo, click.secho]
@@ -44,10 +44,29 @@ DEFAULT_SETTINGS = {
         "description": "Enable caching for HTTP API requests",
         "value": True,
     },
+    "enable_download_cache": {
+        "description": "Keep downloaded package archives in a local cache (Yes/No)",
+        "value": True,
+    },
     "enable_telemetry": {
         "description": ("Telemetry service <https://bit.ly/pio-telemetry> (Yes/No)"),
         "value": True,
     },
+    "enable_build_server": {
+        "description": (
+            "Keep a warm build server between builds to reduce startup time "
+            "(Yes/No)"
+        ),
+        "value": False,
+    },
+    "http_pool_connections": {
+        "description": "Number of hosts with kept-alive HTTP connections",
+        "value": 10,
+    },
+    "http_pool_maxsize": {
+        "description": "Maximum number of kept-alive HTTP connections per host",
+        "value": 16,
+    },
     "force_verbose": {
         "description": "Force verbose output when processing environments",
         "value": False,
@@ -54,6 +54,7 @@ DEFAULT_ENV_OPTIONS = dict(
         "c++",
         "link",
         "piohooks",
+        "piocache",
         "pioasm",
         "piobuild",
         "pioproject",
@@ -147,10 +148,7 @@ if int(ARGUMENTS.get("ISATTY", 0)):
     # pylint: disable=protected-access
     click._compat.isatty = lambda stream: True
 
-if env.subst("$BUILD_CACHE_DIR"):
-    if not os.path.isdir(env.subst("$BUILD_CACHE_DIR")):
-        os.makedirs(env.subst("$BUILD_CACHE_DIR"))
-    env.CacheDir("$BUILD_CACHE_DIR")
+env.ConfigureBuildCache()
 
 if not int(ARGUMENTS.get("PIOVERBOSE", 0)):
     click.echo("Verbose mode can be enabled via `-v, --verbose` option")
@@ -0,0 +1,116 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import atexit
+import os
+import threading
+
+import SCons.CacheDir  # pylint: disable=import-error
+
+from innaterapluginio.system.buildcache import BuildCacheStorage
+
+
+class PioCacheDir(SCons.CacheDir.CacheDir):
+    """Build cache with usage statistics and size-bounded LRU eviction.
+
+    Entries are addressed by the build signature of a target: contents of
+    a source file and all its implicit dependencies (headers) plus the
+    full command line. SCons pushes entries through a temporary file and
+    an atomic rename, and touches an entry on every retrieval, which keeps
+    the cache safe for concurrent writers and gives an LRU order.
+    """
+
+    SIZE_LIMIT = 0  # in bytes, 0 = unlimited
+    _INSTANCES = []
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._lock = threading.Lock()
+        self.bytes_saved = 0
+        self.pushes = 0
+        self.bytes_pushed = 0
+        # every cloned build environment may have own instance
+        PioCacheDir._INSTANCES.append(self)
+
+    def _get_entry_size(self, node):
+        _, cachefile = self.cachepath(node)
+        try:
+            return os.path.getsize(cachefile)
+        except (OSError, TypeError):
+            return 0
+
+    def retrieve(self, node):
+        result = super().retrieve(node)
+        if result:
+            size = self._get_entry_size(node)
+            with self._lock:
+                self.bytes_saved += size
+        return result
+
+    def push(self, node):
+        _, cachefile = self.cachepath(node)
+        existed = cachefile and os.path.isfile(cachefile)
+        result = super().push(node)
+        if cachefile and not existed and os.path.isfile(cachefile):
+            size = self._get_entry_size(node)
+            with self._lock:
+                self.pushes += 1
+                self.bytes_pushed += size
+        return result
+
+    @staticmethod
+    def commit_stats():
+        counters = {}
+        for cd in PioCacheDir._INSTANCES:
+            if not cd.is_enabled():
+                continue
+            item = counters.setdefault(
+                cd.path,
+                dict(
+                    requests=0, hits=0, bytes_saved=0, pushes=0, bytes_pushed=0
+                ),
+            )
+            for name in item:
+                item[name] += getattr(cd, name)
+        for path, item in counters.items():
+            if not item["requests"] and not item["pushes"]:
+                continue
+            try:
+                BuildCacheStorage(path).commit(
+                    size_limit=PioCacheDir.SIZE_LIMIT, **item
+                )
+            except OSError:
+                pass
+
+
+def ConfigureBuildCache(env):
+    cache_dir = env.subst("$BUILD_CACHE_DIR")
+    if not cache_dir:
+        return None
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    PioCacheDir.SIZE_LIMIT = (
+        int(env.GetProjectConfig().get("platformio", "build_cache_size") or 0)
+        * 1024
+        * 1024
+    )
+    atexit.register(PioCacheDir.commit_stats)
+    return env.CacheDir("$BUILD_CACHE_DIR", PioCacheDir)
+
+
+def exists(_):
+    return True
+
+
+def generate(env):
+    env.AddMethod(ConfigureBuildCache)
+    return env
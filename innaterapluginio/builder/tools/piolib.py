@@ -15,9 +15,12 @@
 
 import hashlib
 import io
+import json
+import multiprocessing
 import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
 import click
 import SCons.Scanner  # pylint: disable=import-error
@@ -43,7 +46,9 @@ from innaterapluginio.project.options import ProjectOptions
 
 class LibBuilderFactory:
     @staticmethod
-    def new(env, path, verbose=int(ARGUMENTS.get("PIOVERBOSE", 0))):
+    def new(env, path, verbose=None):
+        if verbose is None:
+            verbose = int(ARGUMENTS.get("PIOVERBOSE", 0))
         clsname = "UnknownLibBuilder"
         if os.path.isfile(os.path.join(path, "library.json")):
             clsname = "PlatformIOLibBuilder"
@@ -106,6 +111,328 @@ class LibBuilderFactory:
         return []
 
 
+class LibIncludeScanCache:
+    """Persistent storage of include candidates found by LDF scanners.
+
+    Entries are grouped by a scan context (include dirs, macros, LDF mode)
+    and are valid while a source file and all resolved includes keep the
+    same modification time and size, none of the unresolved includes
+    appears in the source directory or in the include directories, and
+    none of the search directories ahead of a resolved include is modified
+    (a new header there would shadow the resolved one).
+    """
+
+    VERSION = 3
+    INCLUDE_RE = re.compile(r"^\s*#\s*include\s*[<\"]([^>\"]+)[>\"]", re.M)
+
+    def __init__(self, path):
+        self.path = path
+        self._contexts = {}
+        self._used = {}
+        self._modified = False
+        self._include_dirs = {}
+        self._found = {}
+        self._dir_stats = {}
+        self._unchanged_dirs = {}
+        self.load()
+
+    def load(self):
+        if not os.path.isfile(self.path):
+            return
+        try:
+            data = fs.load_json(self.path)
+            assert data.get("version") == self.VERSION
+            self._contexts = data["contexts"]
+        except (
+            AssertionError,
+            AttributeError,
+            KeyError,
+            ValueError,
+            UnicodeDecodeError,
+            exception.InvalidJSONFile,
+        ):
+            self._contexts = {}
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return [st.st_mtime, st.st_size]
+
+    def _stat_dir(self, path):
+        # the directories are shared by all files, check them once per scan
+        if path not in self._dir_stats:
+            self._dir_stats[path] = self._stat(path)
+        return self._dir_stats[path]
+
+    def compute_context_key(self, env, include_dirs, conditional, depth):
+        data = {
+            "conditional": conditional,
+            "depth": depth,
+            "defines": str(env.get("CPPDEFINES", "")),
+            "include_dirs": [d.get_abspath() for d in include_dirs],
+        }
+        result = hashlib.sha1(
+            hashlib_encode_data(json.dumps(data, sort_keys=True))
+        ).hexdigest()
+        # search paths of the includes
+        self._include_dirs[result] = data["include_dirs"]
+        return result
+
+    def _use_context(self, context_key):
+        if context_key not in self._used:
+            self._used[context_key] = dict(
+                files={},
+                dirs=dict(self._contexts.get(context_key, {}).get("dirs", {})),
+            )
+        return self._used[context_key]
+
+    def get(self, context_key, path):
+        # an entry of the current scan is actual
+        entry = self._used.get(context_key, {}).get("files", {}).get(path)
+        if entry:
+            return [item_path for item_path, _ in entry["includes"]]
+        entry = self._contexts.get(context_key, {}).get("files", {}).get(path)
+        if not entry or not self._is_actual(context_key, path, entry):
+            return None
+        self._use_context(context_key)["files"][path] = entry
+        return [item_path for item_path, _ in entry["includes"]]
+
+    def _is_actual(self, context_key, path, entry):
+        if entry["stat"] != self._stat(path):
+            return False
+        if any(
+            item_stat != self._stat(item_path)
+            for item_path, item_stat in entry["includes"]
+        ):
+            return False
+        src_dir = os.path.dirname(path)
+        if any(
+            self._find_include(context_key, src_dir, name) is not None
+            for name in entry["unresolved"]
+        ):
+            return False
+        dirs = self._contexts[context_key]["dirs"]
+        for subdir, position in entry["shadowing"]:
+            probe = _join_include_dir(src_dir, subdir)
+            if dirs.get(probe, False) != self._stat_dir(probe) or (
+                position - 1 > self._count_unchanged_dirs(context_key, subdir)
+            ):
+                return False
+        return True
+
+    def set(self, context_key, path, includes, names=None):
+        context = self._use_context(context_key)
+        src_dir = os.path.dirname(path)
+        unresolved = []
+        shadowing = {}
+        if names is None:
+            names = self.parse_includes(path)
+        for name in names:
+            position = self._find_include(context_key, src_dir, name)
+            if position is None:
+                unresolved.append(name)
+            elif position:
+                subdir = os.path.dirname(name)
+                shadowing[subdir] = max(shadowing.get(subdir, 0), position)
+        # remember the search directories ahead of the resolved includes
+        for subdir, position in shadowing.items():
+            for search_dir in [src_dir] + self._include_dirs.get(context_key, [])[
+                : position - 1
+            ]:
+                probe = _join_include_dir(search_dir, subdir)
+                context["dirs"][probe] = self._stat_dir(probe)
+        context["files"][path] = dict(
+            stat=self._stat(path),
+            includes=[[item_path, self._stat(item_path)] for item_path in includes],
+            unresolved=unresolved,
+            shadowing=sorted([subdir, pos] for subdir, pos in shadowing.items()),
+        )
+        self._modified = True
+
+    @classmethod
+    def parse_includes(cls, path):
+        try:
+            with open(path, encoding="utf8", errors="ignore") as fp:
+                return sorted(set(cls.INCLUDE_RE.findall(fp.read())))
+        except OSError:
+            return []
+
+    def _find_include(self, context_key, src_dir, name):
+        """Position of the first search path which contains an include.
+
+        The source directory goes first, then the include directories.
+        """
+        if os.path.isfile(os.path.join(src_dir, name)):
+            return 0
+        # the include directories are shared by all files of a context
+        key = (context_key, name)
+        if key not in self._found:
+            self._found[key] = next(
+                (
+                    position
+                    for position, include_dir in enumerate(
+                        self._include_dirs.get(context_key, []), 1
+                    )
+                    if os.path.isfile(os.path.join(include_dir, name))
+                ),
+                None,
+            )
+        return self._found[key]
+
+    def _count_unchanged_dirs(self, context_key, subdir):
+        """Number of the leading include directories without changes."""
+        key = (context_key, subdir)
+        if key not in self._unchanged_dirs:
+            dirs = self._contexts.get(context_key, {}).get("dirs", {})
+            result = 0
+            for include_dir in self._include_dirs.get(context_key, []):
+                probe = _join_include_dir(include_dir, subdir)
+                if dirs.get(probe, False) != self._stat_dir(probe):
+                    break
+                result += 1
+            self._unchanged_dirs[key] = result
+        return self._unchanged_dirs[key]
+
+    def save(self):
+        # keep only entries that were used during the current scan
+        if not self._modified and self._used == self._contexts:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, mode="w", encoding="utf8") as fp:
+                json.dump(dict(version=self.VERSION, contexts=self._used), fp)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            return
+        self._contexts = self._used
+        self._modified = False
+
+
+def _join_include_dir(include_dir, subdir):
+    return os.path.normpath(os.path.join(include_dir, subdir))
+
+
+_INCLUDE_SCAN_WORKER_ENV = None
+
+
+def _run_include_scan_task(task):
+    """Scan a source file in a worker process of the parallel LDF mode.
+
+    The worker is forked from the build process and resolves includes with
+    the inherited SCons file system. Returns the found include paths and
+    the include names of the file, or `None` if the advanced scanner has
+    failed and the build process must scan the file itself.
+    """
+    global _INCLUDE_SCAN_WORKER_ENV  # pylint: disable=global-statement
+    path, include_dirs, cppdefines, conditional, depth = task
+    if not _INCLUDE_SCAN_WORKER_ENV:
+        _INCLUDE_SCAN_WORKER_ENV = DefaultEnvironment().Clone()
+    env = _INCLUDE_SCAN_WORKER_ENV
+    env.Replace(CPPDEFINES=cppdefines)
+    node = env.File(path)
+    include_dirs = tuple(env.Dir(d) for d in include_dirs)
+    try:
+        if conditional:
+            candidates = LibBuilderBase.CCONDITIONAL_SCANNER(
+                node, env, include_dirs, depth=depth
+            )
+        else:
+            candidates = LibBuilderBase.CLASSIC_SCANNER(node, env, include_dirs)
+    except Exception:  # pylint: disable=broad-except
+        return None
+    return (
+        [item.get_abspath() for item in candidates],
+        LibIncludeScanCache.parse_includes(path),
+    )
+
+
+class LibIncludeDirsCache:
+    """Include directories of a project and all library builders.
+
+    Directories of dependent builders go first, in the order in which
+    builders became dependent. Marking a builder as dependent moves only
+    its own directories instead of rebuilding the whole list.
+    """
+
+    def __init__(self, project_dirs, lib_builders, env):
+        self.project_dirs = project_dirs
+        self._dependent = {}
+        self._independent = {}
+        for lb in lib_builders:
+            storage = self._dependent if lb.is_dependent else self._independent
+            storage[lb] = [env.Dir(d) for d in lb.get_include_dirs()]
+
+    def add_dependent(self, lb):
+        if lb in self._dependent:
+            return True
+        if lb not in self._independent:
+            return False
+        self._dependent[lb] = self._independent.pop(lb)
+        return True
+
+    def __iter__(self):
+        yield from self.project_dirs
+        for storage in (self._dependent, self._independent):
+            for dirs in storage.values():
+                yield from dirs
+
+
+class LibBuilderPathIndex:
+    """Lookup of a library builder which owns a path.
+
+    Emulates `path in lb` for every builder from `GetLibBuilders()` by
+    walking the parent directories of a path instead of checking each
+    builder one by one.
+    """
+
+    def __init__(self, lib_builders):
+        self.lib_builders = lib_builders
+        self._size = len(lib_builders)
+        self._positions = {}
+        self._by_path = {}
+        self._by_realpath = {}
+        for position, lb in enumerate(lib_builders):
+            self._positions[lb] = position
+            self._by_path.setdefault(self._normalize(lb.path), []).append(lb)
+            self._by_realpath.setdefault(
+                self._normalize(os.path.realpath(lb.path)), []
+            ).append(lb)
+
+    def is_valid_for(self, lib_builders):
+        return self.lib_builders is lib_builders and self._size == len(lib_builders)
+
+    @staticmethod
+    def _normalize(path):
+        return path.lower() if IS_WINDOWS else path
+
+    @staticmethod
+    def _iter_parents(path):
+        while True:
+            yield path
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            path = parent
+
+    def find(self, path):
+        found = []
+        for index, item in (
+            (self._by_path, self._normalize(path)),
+            (self._by_realpath, self._normalize(os.path.realpath(path))),
+        ):
+            for parent in self._iter_parents(item):
+                found.extend(index.get(parent, []))
+        if not found:
+            return None
+        # the same order as `GetLibBuilders()`, dependent builders go first
+        return min(
+            found, key=lambda lb: (0 if lb.is_dependent else 1, self._positions[lb])
+        )
+
+
 class LibBuilderBase:
     CLASSIC_SCANNER = SCons.Scanner.C.CScanner()
     CCONDITIONAL_SCANNER = SCons.Scanner.C.CConditionalScanner()
@@ -115,8 +442,12 @@ class LibBuilderBase:
     # >0 - number of allowed nested includes
     CCONDITIONAL_SCANNER_DEPTH = 99
     PARSE_SRC_BY_H_NAME = True
+    # number of files sent to a worker of the parallel LDF mode at once
+    INCLUDE_SCAN_CHUNK_SIZE = 16
 
     _INCLUDE_DIRS_CACHE = None
+    _INCLUDE_SCAN_CACHE = None
+    _INCLUDE_SCAN_EXECUTOR = None
 
     def __init__(self, env, path, manifest=None, verbose=False):
         self.env = env.Clone()
@@ -138,7 +469,7 @@ class LibBuilderBase:
 
         self._deps_are_processed = False
         self._circular_deps = []
-        self._processed_search_files = []
+        self._processed_search_files = set()
 
         # pass a macro to the projenv + libs
         if "test" in env["BUILD_TYPE"]:
@@ -350,52 +681,79 @@ class LibBuilderBase:
             )
         ]
 
-    def get_implicit_includes(  # pylint: disable=too-many-branches
-        self, search_files=None
-    ):
+    def get_implicit_include_dirs(self):
         # all include directories
         if not LibBuilderBase._INCLUDE_DIRS_CACHE:
-            LibBuilderBase._INCLUDE_DIRS_CACHE = [
-                self.env.Dir(d)
-                for d in ProjectAsLibBuilder(
-                    self.envorigin, "$PROJECT_DIR", export_projenv=False
-                ).get_include_dirs()
-            ]
-            for lb in self.env.GetLibBuilders():
-                LibBuilderBase._INCLUDE_DIRS_CACHE.extend(
-                    [self.env.Dir(d) for d in lb.get_include_dirs()]
-                )
+            LibBuilderBase._INCLUDE_DIRS_CACHE = LibIncludeDirsCache(
+                [
+                    self.env.Dir(d)
+                    for d in ProjectAsLibBuilder(
+                        self.envorigin, "$PROJECT_DIR", export_projenv=False
+                    ).get_include_dirs()
+                ],
+                self.env.GetLibBuilders(),
+                self.env,
+            )
 
         # append self include directories
         include_dirs = [self.env.Dir(d) for d in self.get_include_dirs()]
         include_dirs.extend(LibBuilderBase._INCLUDE_DIRS_CACHE)
+        return include_dirs
+
+    def get_include_scan_context_key(self, include_dirs):
+        return LibBuilderBase.get_include_scan_cache(self.env).compute_context_key(
+            self.env,
+            include_dirs,
+            "+" in self.lib_ldf_mode,
+            self.CCONDITIONAL_SCANNER_DEPTH,
+        )
+
+    def get_include_scan_task(self, search_files):
+        include_dirs = self.get_implicit_include_dirs()
+        return (
+            self,
+            search_files,
+            include_dirs,
+            self.get_include_scan_context_key(include_dirs),
+        )
+
+    def get_implicit_includes(  # pylint: disable=too-many-branches
+        self, search_files=None
+    ):
+        include_dirs = self.get_implicit_include_dirs()
+        scan_context_key = self.get_include_scan_context_key(include_dirs)
 
         result = []
+        result_nodes = set()
+        prefetched_files = set()
         search_files = search_files or []
+        # files which have been queued at least once, a popped file is
+        # always moved to `_processed_search_files`
+        queued_files = set(search_files)
         while search_files:
+            if (
+                LibBuilderBase._INCLUDE_SCAN_EXECUTOR
+                and search_files[0] not in prefetched_files
+            ):
+                # scan the whole queue at once, the results are merged
+                # below in the same order as a serial scan does
+                LibBuilderBase.prefetch_implicit_includes(
+                    [
+                        (
+                            self,
+                            [f for f in search_files if f not in prefetched_files],
+                            include_dirs,
+                            scan_context_key,
+                        )
+                    ]
+                )
+                prefetched_files.update(search_files)
             node = self.env.File(search_files.pop(0))
             if node.get_abspath() in self._processed_search_files:
                 continue
-            self._processed_search_files.append(node.get_abspath())
+            self._processed_search_files.add(node.get_abspath())
 
-            try:
-                assert "+" in self.lib_ldf_mode
-                candidates = LibBuilderBase.CCONDITIONAL_SCANNER(
-                    node,
-                    self.env,
-                    tuple(include_dirs),
-                    depth=self.CCONDITIONAL_SCANNER_DEPTH,
-                )
-
-            except Exception as exc:  # pylint: disable=broad-except
-                if self.verbose and "+" in self.lib_ldf_mode:
-                    sys.stderr.write(
-                        "Warning! Classic Pre Processor is used for `%s`, "
-                        "advanced has failed with `%s`\n" % (node.get_abspath(), exc)
-                    )
-                candidates = LibBuilderBase.CLASSIC_SCANNER(
-                    node, self.env, tuple(include_dirs)
-                )
+            candidates = self._scan_includes(node, include_dirs, scan_context_key)
 
             # print(node.get_abspath(), [c.get_abspath() for c in candidates])
             for item in candidates:
@@ -403,11 +761,13 @@ class LibBuilderBase:
                 # process internal files recursively
                 if (
                     item_path not in self._processed_search_files
-                    and item_path not in search_files
+                    and item_path not in queued_files
                     and item_path in self
                 ):
                     search_files.append(item_path)
-                if item not in result:
+                    queued_files.add(item_path)
+                if item not in result_nodes:
+                    result_nodes.add(item)
                     result.append(item)
                 if not self.PARSE_SRC_BY_H_NAME:
                     continue
@@ -418,11 +778,121 @@ class LibBuilderBase:
                     if not os.path.isfile("%s.%s" % (item_fname, ext)):
                         continue
                     item_c_node = self.env.File("%s.%s" % (item_fname, ext))
-                    if item_c_node not in result:
+                    if item_c_node not in result_nodes:
+                        result_nodes.add(item_c_node)
                         result.append(item_c_node)
 
         return result
 
+    @staticmethod
+    def get_include_scan_cache(env):
+        if not LibBuilderBase._INCLUDE_SCAN_CACHE:
+            LibBuilderBase._INCLUDE_SCAN_CACHE = LibIncludeScanCache(
+                env.subst(os.path.join("$BUILD_DIR", "ldfcache.json"))
+            )
+        return LibBuilderBase._INCLUDE_SCAN_CACHE
+
+    @staticmethod
+    def start_include_scan_executor(env):
+        jobs = env.GetOption("num_jobs") or 1
+        # the workers inherit the SCons file system of the build process
+        if (
+            env.GetProjectOption("lib_ldf_parallel")
+            and jobs > 1
+            and not LibBuilderBase._INCLUDE_SCAN_EXECUTOR
+            and "fork" in multiprocessing.get_all_start_methods()
+        ):
+            LibBuilderBase._INCLUDE_SCAN_EXECUTOR = ProcessPoolExecutor(
+                max_workers=jobs, mp_context=multiprocessing.get_context("fork")
+            )
+        return LibBuilderBase._INCLUDE_SCAN_EXECUTOR
+
+    @staticmethod
+    def stop_include_scan_executor():
+        if LibBuilderBase._INCLUDE_SCAN_EXECUTOR:
+            LibBuilderBase._INCLUDE_SCAN_EXECUTOR.shutdown()
+        LibBuilderBase._INCLUDE_SCAN_EXECUTOR = None
+
+    @staticmethod
+    def prefetch_implicit_includes(tasks):
+        """Scan files in worker processes and store results in the cache.
+
+        Each task is a tuple of `(lib_builder, search_files, include_dirs,
+        scan_context_key)`. The workers tokenize the files and resolve
+        includes, the results are merged into the include-scan cache in the
+        order of tasks. The dependency graph is not modified here, the serial
+        LDF walk picks up the prefetched results from the cache.
+        """
+        executor = LibBuilderBase._INCLUDE_SCAN_EXECUTOR
+        if not executor:
+            return
+        items = []
+        for lb, search_files, include_dirs, scan_context_key in tasks:
+            scan_cache = LibBuilderBase.get_include_scan_cache(lb.env)
+            task_args = (
+                [d.get_abspath() for d in include_dirs],
+                lb.env.get("CPPDEFINES"),
+                "+" in lb.lib_ldf_mode,
+                lb.CCONDITIONAL_SCANNER_DEPTH,
+            )
+            for search_file in search_files:
+                path = lb.env.File(search_file).get_abspath()
+                if scan_cache.get(scan_context_key, path) is not None:
+                    continue
+                items.append((scan_cache, scan_context_key, (path,) + task_args))
+        if not items:
+            return
+        try:
+            results = list(
+                executor.map(
+                    _run_include_scan_task,
+                    [task for _, _, task in items],
+                    chunksize=LibBuilderBase.INCLUDE_SCAN_CHUNK_SIZE,
+                )
+            )
+        except Exception:  # pylint: disable=broad-except
+            # the build process scans the files itself
+            LibBuilderBase.stop_include_scan_executor()
+            return
+        for (scan_cache, scan_context_key, task), result in zip(items, results):
+            if result is not None:
+                scan_cache.set(scan_context_key, task[0], *result)
+
+    def _scan_includes(self, node, include_dirs, scan_context_key):
+        scan_cache = LibBuilderBase.get_include_scan_cache(self.env)
+        cached_paths = scan_cache.get(scan_context_key, node.get_abspath())
+        if cached_paths is not None:
+            return [self.env.File(p) for p in cached_paths]
+
+        candidates = self.run_include_scanner(node, include_dirs)
+        scan_cache.set(
+            scan_context_key,
+            node.get_abspath(),
+            [item.get_abspath() for item in candidates],
+        )
+        return candidates
+
+    def run_include_scanner(self, node, include_dirs):
+        try:
+            assert "+" in self.lib_ldf_mode
+            candidates = LibBuilderBase.CCONDITIONAL_SCANNER(
+                node,
+                self.env,
+                tuple(include_dirs),
+                depth=self.CCONDITIONAL_SCANNER_DEPTH,
+            )
+
+        except Exception as exc:  # pylint: disable=broad-except
+            if self.verbose and "+" in self.lib_ldf_mode:
+                sys.stderr.write(
+                    "Warning! Classic Pre Processor is used for `%s`, "
+                    "advanced has failed with `%s`\n" % (node.get_abspath(), exc)
+                )
+            candidates = LibBuilderBase.CLASSIC_SCANNER(
+                node, self.env, tuple(include_dirs)
+            )
+        return candidates
+
     def search_deps_recursive(self, search_files=None):
         self.process_dependencies()
 
@@ -436,23 +906,28 @@ class LibBuilderBase:
         lib_inc_map = {}
         for inc in self.get_implicit_includes(search_files):
             inc_path = inc.get_abspath()
-            for lb in self.env.GetLibBuilders():
-                if inc_path in lb:
-                    if lb not in lib_inc_map:
-                        lib_inc_map[lb] = []
-                    lib_inc_map[lb].append(inc_path)
-                    break
+            lb = self.env.FindLibBuilderByPath(inc_path)
+            if not lb:
+                continue
+            if lb not in lib_inc_map:
+                lib_inc_map[lb] = []
+            lib_inc_map[lb].append(inc_path)
 
         for lb, lb_search_files in lib_inc_map.items():
             self.depend_on(lb, search_files=lb_search_files)
 
     def depend_on(self, lb, search_files=None, recursive=True):
         def _already_depends(_lb):
-            if self in _lb.depbuilders:
-                return True
-            for __lb in _lb.depbuilders:
-                if _already_depends(__lb):
-                    return True
+            # a library is reachable by many paths, visit it once
+            visited = {_lb}
+            queue = [_lb]
+            while queue:
+                for __lb in queue.pop().depbuilders:
+                    if __lb == self:
+                        return True
+                    if __lb not in visited:
+                        visited.add(__lb)
+                        queue.append(__lb)
             return False
 
         # assert isinstance(lb, LibBuilderBase)
@@ -467,7 +942,11 @@ class LibBuilderBase:
             elif lb not in self.depbuilders:
                 self.depbuilders.append(lb)
                 lb.is_dependent = True
-                LibBuilderBase._INCLUDE_DIRS_CACHE = None
+                if (
+                    LibBuilderBase._INCLUDE_DIRS_CACHE
+                    and not LibBuilderBase._INCLUDE_DIRS_CACHE.add_dependent(lb)
+                ):
+                    LibBuilderBase._INCLUDE_DIRS_CACHE = None
 
         if recursive:
             lb.search_deps_recursive(search_files)
@@ -1046,6 +1525,13 @@ class ProjectAsLibBuilder(LibBuilderBase):
                 break
 
         # process library dependencies
+        LibBuilderBase.prefetch_implicit_includes(
+            [
+                lb.get_include_scan_task(lb.get_search_files())
+                for lb in found_lbs
+                if lb.lib_ldf_mode.startswith("deep")
+            ]
+        )
         for lb in found_lbs:
             lb.search_deps_recursive()
 
@@ -1065,7 +1551,9 @@ def GetLibSourceDirs(env):
     ]
 
 
-def IsCompatibleLibBuilder(env, lb, verbose=int(ARGUMENTS.get("PIOVERBOSE", 0))):
+def IsCompatibleLibBuilder(env, lb, verbose=None):
+    if verbose is None:
+        verbose = int(ARGUMENTS.get("PIOVERBOSE", 0))
     compat_mode = lb.lib_compat_mode
     if lb.name in env.GetProjectOption("lib_ignore", []):
         if verbose:
@@ -1138,7 +1626,17 @@ def GetLibBuilders(_):  # pylint: disable=too-many-branches
     return env["__PIO_LIB_BUILDERS"]
 
 
-def ConfigureProjectLibBuilder(env):
+def FindLibBuilderByPath(_, path):
+    env = DefaultEnvironment()
+    env.GetLibBuilders()
+    index = env.get("__PIO_LIB_BUILDERS_INDEX", None)
+    if not index or not index.is_valid_for(env["__PIO_LIB_BUILDERS"]):
+        index = LibBuilderPathIndex(env["__PIO_LIB_BUILDERS"])
+        env.Replace(__PIO_LIB_BUILDERS_INDEX=index)
+    return index.find(path)
+
+
+def ConfigureProjectLibBuilder(env):  # pylint: disable=too-many-statements
     _pm_storage = {}
 
     def _get_lib_license(pkg):
@@ -1154,6 +1652,13 @@ def ConfigureProjectLibBuilder(env):
     def _correct_found_libs(lib_builders):
         # build full dependency graph
         found_lbs = [lb for lb in lib_builders if lb.is_dependent]
+        LibBuilderBase.prefetch_implicit_includes(
+            [
+                lb.get_include_scan_task(lb.get_search_files())
+                for lb in found_lbs
+                if lb.lib_ldf_mode != "off"
+            ]
+        )
         for lb in lib_builders:
             if lb in found_lbs:
                 lb.search_deps_recursive(lb.get_search_files())
@@ -1203,10 +1708,15 @@ def ConfigureProjectLibBuilder(env):
     click.echo("Found %d compatible libraries" % len(lib_builders))
 
     click.echo("Scanning dependencies...")
-    project.search_deps_recursive()
+    LibBuilderBase.start_include_scan_executor(project.env)
+    try:
+        project.search_deps_recursive()
+        if ldf_mode.startswith("chain") and project.depbuilders:
+            _correct_found_libs(lib_builders)
+    finally:
+        LibBuilderBase.stop_include_scan_executor()
 
-    if ldf_mode.startswith("chain") and project.depbuilders:
-        _correct_found_libs(lib_builders)
+    LibBuilderBase.get_include_scan_cache(env).save()
 
     if project.depbuilders:
         click.echo("Dependency Graph")
@@ -1225,5 +1735,6 @@ def generate(env):
     env.AddMethod(GetLibSourceDirs)
     env.AddMethod(IsCompatibleLibBuilder)
     env.AddMethod(GetLibBuilders)
+    env.AddMethod(FindLibBuilderByPath)
     env.AddMethod(ConfigureProjectLibBuilder)
     return env
@@ -14,42 +14,71 @@
 
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from os import environ, makedirs, remove
-from os.path import isdir, join, splitdrive
-
-from elftools.elf.descriptions import describe_sh_flags
-from elftools.elf.elffile import ELFFile
+from os.path import isdir, isfile, join, splitdrive
 
+from innaterapluginio import fs
 from innaterapluginio.compat import IS_WINDOWS
 from innaterapluginio.proc import exec_command
 from innaterapluginio.debug_const import DEBUG
 
-def _run_tool(cmd, env, tool_args):
+# the number of addresses/names passed to a single addr2line/c++filt process
+TOOL_CHUNK_SIZE = 4096
+SYMBOLS_CACHE_VERSION = 1
+
+
+def _run_tool(cmd, env, tool_args, chunk_index=0):
     sysenv = environ.copy()
     sysenv["PATH"] = str(env["ENV"]["PATH"])
 
     build_dir = env.subst("$BUILD_DIR")
     if not isdir(build_dir):
-        makedirs(build_dir)
-    tmp_file = join(build_dir, "size-data-longcmd.txt")
+        makedirs(build_dir, exist_ok=True)
+    tmp_file = join(build_dir, "size-data-longcmd-%d.txt" % chunk_index)
 
     with open(tmp_file, mode="w", encoding="utf8") as fp:
         fp.write("\n".join(tool_args))
 
-    cmd.append("@" + tmp_file)
+    cmd = cmd + ["@" + tmp_file]
     result = exec_command(cmd, env=sysenv)
     remove(tmp_file)
 
     return result
 
 
+def _run_tool_chunked(cmd, env, tool_args):
+    """Run a tool in parallel workers, each processes a chunk of arguments.
+
+    Returns output lines in the order of `tool_args`.
+    """
+    chunks = [
+        tool_args[i : i + TOOL_CHUNK_SIZE]
+        for i in range(0, len(tool_args), TOOL_CHUNK_SIZE)
+    ]
+
+    def _process_chunk(chunk_index):
+        result = _run_tool(cmd, env, chunks[chunk_index], chunk_index)
+        lines = [line for line in result["out"].split("\n") if line]
+        assert len(chunks[chunk_index]) == len(lines)
+        return lines
+
+    if len(chunks) < 2:
+        return _process_chunk(0) if chunks else []
+    jobs = max(1, min(len(chunks), env.GetOption("num_jobs") or 1))
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        result = []
+        for lines in executor.map(_process_chunk, range(len(chunks))):
+            result.extend(lines)
+    return result
+
+
 def _get_symbol_locations(env, elf_path, addrs):
     if not addrs:
         return {}
+    addrs = list(dict.fromkeys(addrs))  # unique, keep order
     cmd = [env.subst("$CC").replace("-gcc", "-addr2line"), "-e", elf_path]
-    result = _run_tool(cmd, env, addrs)
-    locations = [line for line in result["out"].split("\n") if line]
-    assert len(addrs) == len(locations)
+    locations = _run_tool_chunked(cmd, env, addrs)
 
     return dict(zip(addrs, [loc.strip() for loc in locations]))
 
@@ -57,11 +86,10 @@ def _get_symbol_locations(env, elf_path, addrs):
 def _get_demangled_names(env, mangled_names):
     if not mangled_names:
         return {}
-    result = _run_tool(
+    mangled_names = list(dict.fromkeys(mangled_names))  # unique, keep order
+    demangled_names = _run_tool_chunked(
         [env.subst("$CC").replace("-gcc", "-c++filt")], env, mangled_names
     )
-    demangled_names = [line for line in result["out"].split("\n") if line]
-    assert len(mangled_names) == len(demangled_names)
 
     return dict(
         zip(
@@ -71,7 +99,51 @@ def _get_demangled_names(env, mangled_names):
     )
 
 
+def _get_elf_build_id(elffile, elf_path):
+    section = elffile.get_section_by_name(".note.gnu.build-id")
+    if section is not None:
+        for note in section.iter_notes():
+            if note["n_type"] == "NT_GNU_BUILD_ID":
+                return note["n_desc"]
+    # linked without `--build-id`
+    return "sha1:" + fs.calculate_file_hashsum("sha1", elf_path)
+
+
+def _get_symbols_cache_key(env, elffile, elf_path):
+    platform = env.PioPlatform()
+    return [
+        SYMBOLS_CACHE_VERSION,
+        _get_elf_build_id(elffile, elf_path),
+        env.subst("$CC"),
+        platform.name,
+        platform.version,
+    ]
+
+
+def _load_cached_symbols(cache_path, key):
+    if not isfile(cache_path):
+        return None
+    try:
+        data = fs.load_json(cache_path)
+    except Exception:  # pylint: disable=broad-except
+        return None
+    if not isinstance(data, dict) or data.get("key") != key:
+        return None
+    return data.get("symbols")
+
+
+def _save_cached_symbols(cache_path, key, symbols):
+    try:
+        with open(cache_path, mode="w", encoding="utf8") as fp:
+            json.dump({"key": key, "symbols": symbols}, fp)
+    except OSError:
+        pass
+
+
 def _collect_sections_info(env, elffile):
+    # pylint: disable=import-outside-toplevel
+    from elftools.elf.descriptions import describe_sh_flags
+
     sections = {}
     for section in elffile.iter_sections():
         if section.is_null() or section.name.startswith(".debug"):
@@ -97,16 +169,26 @@ def _collect_sections_info(env, elffile):
 
 
 def _collect_symbols_info(env, elffile, elf_path, sections):
+    # symbols of unchanged firmware are resolved by the previous run
+    cache_path = join(env.subst("$BUILD_DIR"), "sizedata-symbols.json")
+    cache_key = _get_symbols_cache_key(env, elffile, elf_path)
+    symbols = _load_cached_symbols(cache_path, cache_key)
+    if symbols is not None:
+        return symbols
+
+    symbols = _resolve_symbols_info(env, elffile, elf_path, sections)
+    _save_cached_symbols(cache_path, cache_key, symbols)
+    return symbols
+
+
+def _resolve_symbols_info(env, elffile, elf_path, sections):
     symbols = []
 
     symbol_section = elffile.get_section_by_name(".symtab")
-    if symbol_section.is_null():
+    if symbol_section is None or symbol_section.is_null():
         sys.stderr.write("Couldn't find symbol table. Is ELF file stripped?")
         env.Exit(1)
 
-    sysenv = environ.copy()
-    sysenv["PATH"] = str(env["ENV"]["PATH"])
-
     symbol_addrs = []
     mangled_names = []
     for s in symbol_section.iter_symbols():
@@ -190,6 +272,9 @@ def pioSizeCalculateFirmwareSize(_, sections):
 
 
 def DumpSizeData(_, target, source, env):  # pylint: disable=unused-argument
+    # pylint: disable=import-outside-toplevel
+    from elftools.elf.elffile import ELFFile
+
     data = {"device": {}, "memory": {}, "version": 1}
 
     board = env.BoardConfig()
@@ -11,32 +11,46 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import codecs
 import hashlib
 import os
+import sqlite3
+from contextlib import contextmanager
 from time import time
 
 from innaterapluginio import app, fs
 from innaterapluginio.compat import hashlib_encode_data
-from innaterapluginio.package.lockfile import LockFile
 from innaterapluginio.project.helpers import get_project_cache_dir
 
 
 class ContentCache:
+    """Key-value cache with expiration, backed by an SQLite database.
+
+    Items are looked up by the primary key and expired items are removed
+    periodically within `set()`. When the total size of items exceeds
+    `MAX_SIZE`, the items closest to expiration are evicted. SQLite locking
+    allows several processes to share the same cache.
+    """
+
+    DB_NAME = "db.sqlite"
+    MAX_SIZE = 64 * 1024 * 1024  # bytes
+    PURGE_INTERVAL = 3600  # seconds
+    LOCK_TIMEOUT = 30  # seconds
+
     def __init__(self, namespace=None):
         self.cache_dir = os.path.join(get_project_cache_dir(), namespace or "content")
-        self._db_path = os.path.join(self.cache_dir, "db.data")
-        self._lockfile = None
+        self._db_path = os.path.join(self.cache_dir, self.DB_NAME)
+        self._conn = None
         if not os.path.isdir(self.cache_dir):
             os.makedirs(self.cache_dir)
 
     def __enter__(self):
-        # cleanup obsolete items
-        self.delete()
         return self
 
     def __exit__(self, type_, value, traceback):
-        pass
+        self.close()
+
+    def __del__(self):
+        self.close()
 
     @staticmethod
     def key_from_args(*args):
@@ -46,112 +60,185 @@ class ContentCache:
                 h.update(hashlib_encode_data(arg))
         return h.hexdigest()
 
-    def get_cache_path(self, key):
-        assert "/" not in key and "\\" not in key
-        key = str(key)
-        assert len(key) > 3
-        return os.path.join(self.cache_dir, key)
+    def close(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def _connect(self):
+        if self._conn:
+            return self._conn
+        self._remove_legacy_index()
+        try:
+            self._conn = self._open_db()
+        except sqlite3.OperationalError:
+            raise
+        except sqlite3.DatabaseError:
+            # a corrupted database is replaced with a new one
+            self._remove_db()
+            self._conn = self._open_db()
+        return self._conn
+
+    def _open_db(self):
+        conn = sqlite3.connect(
+            self._db_path, timeout=self.LOCK_TIMEOUT, isolation_level=None
+        )
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.DatabaseError:  # not supported by a file system
+            pass
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS items (
+                key TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expire INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS items_expire ON items (expire);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER);
+            INSERT OR IGNORE INTO meta VALUES ('size', 0), ('purged_at', 0);
+            CREATE TRIGGER IF NOT EXISTS items_insert AFTER INSERT ON items BEGIN
+                UPDATE meta SET value = value + NEW.size WHERE name = 'size';
+            END;
+            CREATE TRIGGER IF NOT EXISTS items_delete AFTER DELETE ON items BEGIN
+                UPDATE meta SET value = value - OLD.size WHERE name = 'size';
+            END;
+            """
+        )
+        return conn
+
+    def _remove_db(self):
+        self.close()
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self._db_path + suffix)
+            except OSError:
+                pass
+
+    def _on_db_error(self, exc):
+        # the cache is optional, a locked database is retried with the next call
+        self.close()
+        if not isinstance(exc, sqlite3.OperationalError):
+            self._remove_db()
+
+    def _remove_legacy_index(self):
+        # items of Core<6.1.16 were kept in files listed by a text index
+        legacy_path = os.path.join(self.cache_dir, "db.data")
+        if not os.path.isfile(legacy_path):
+            return
+        try:
+            with open(legacy_path, encoding="utf8") as fp:
+                for line in fp:
+                    fname = line.strip().partition("=")[2]
+                    path = os.path.join(self.cache_dir, fname)
+                    if fname and os.path.isfile(path):
+                        os.remove(path)
+            os.remove(legacy_path)
+        except OSError:
+            pass
 
     def get(self, key):
-        cache_path = self.get_cache_path(key)
-        if not os.path.isfile(cache_path):
+        try:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT data FROM items WHERE key = ? AND expire > ?",
+                    (str(key), int(time())),
+                )
+                .fetchone()
+            )
+        except sqlite3.DatabaseError as exc:
+            self._on_db_error(exc)
             return None
-        with codecs.open(cache_path, "rb", encoding="utf8") as fp:
-            return fp.read()
+        return row[0] if row else None
 
     def set(self, key, data, valid):
         if not app.get_setting("enable_cache"):
             return False
-        cache_path = self.get_cache_path(key)
-        if os.path.isfile(cache_path):
-            self.delete(key)
         if not data:
+            self.delete(key)
             return False
         tdmap = {"s": 1, "m": 60, "h": 3600, "d": 86400}
         assert valid.endswith(tuple(tdmap))
         expire_time = int(time() + tdmap[valid[-1]] * int(valid[:-1]))
-
-        if not self._lock_dbindex():
+        try:
+            size = len(data.encode("utf8"))
+        except UnicodeError:
             return False
 
-        if not os.path.isdir(os.path.dirname(cache_path)):
-            os.makedirs(os.path.dirname(cache_path))
         try:
-            with codecs.open(cache_path, mode="wb", encoding="utf8") as fp:
-                fp.write(data)
-            with open(self._db_path, mode="a", encoding="utf8") as fp:
-                fp.write("%s=%s\n" % (str(expire_time), os.path.basename(cache_path)))
-        except UnicodeError:
-            if os.path.isfile(cache_path):
-                try:
-                    os.remove(cache_path)
-                except OSError:
-                    pass
+            with _transaction(self._connect()) as conn:
+                conn.execute("DELETE FROM items WHERE key = ?", (str(key),))
+                conn.execute(
+                    "INSERT INTO items VALUES (?, ?, ?, ?)",
+                    (str(key), data, size, expire_time),
+                )
+                self._purge(conn)
+        except sqlite3.DatabaseError as exc:
+            self._on_db_error(exc)
+            return False
+        return True
 
-        return self._unlock_dbindex()
+    def _purge(self, conn):
+        meta = dict(conn.execute("SELECT name, value FROM meta"))
+        now = int(time())
+        if now - meta["purged_at"] > self.PURGE_INTERVAL:
+            conn.execute("DELETE FROM items WHERE expire <= ?", (now,))
+            conn.execute("UPDATE meta SET value = ? WHERE name = 'purged_at'", (now,))
+            meta = dict(conn.execute("SELECT name, value FROM meta"))
+        if meta["size"] <= self.MAX_SIZE:
+            return
+        # evict down to 90% of the limit, so the next items fit without it
+        excess_size = meta["size"] - int(self.MAX_SIZE * 0.9)
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM items ORDER BY expire"):
+            if excess_size <= 0:
+                break
+            keys.append((key,))
+            excess_size -= size
+        conn.executemany("DELETE FROM items WHERE key = ?", keys)
 
     def delete(self, keys=None):
         """Keys=None, delete expired items"""
-        if not os.path.isfile(self._db_path):
+        if not os.path.isfile(self._db_path) and not os.path.isfile(
+            os.path.join(self.cache_dir, "db.data")
+        ):
             return None
-        if not keys:
-            keys = []
-        if not isinstance(keys, list):
-            keys = [keys]
-        paths_for_delete = [self.get_cache_path(k) for k in keys]
-        found = False
-        newlines = []
-        with open(self._db_path, encoding="utf8") as fp:
-            for line in fp.readlines():
-                line = line.strip()
-                if "=" not in line:
-                    continue
-                expire, fname = line.split("=")
-                path = os.path.join(self.cache_dir, fname)
-                try:
-                    if (
-                        time() < int(expire)
-                        and os.path.isfile(path)
-                        and path not in paths_for_delete
-                    ):
-                        newlines.append(line)
-                        continue
-                except ValueError:
-                    pass
-                found = True
-                if os.path.isfile(path):
-                    try:
-                        os.remove(path)
-                        if not os.listdir(os.path.dirname(path)):
-                            fs.rmtree(os.path.dirname(path))
-                    except OSError:
-                        pass
-
-        if found and self._lock_dbindex():
-            with open(self._db_path, mode="w", encoding="utf8") as fp:
-                fp.write("\n".join(newlines) + "\n")
-            self._unlock_dbindex()
-
+        try:
+            with _transaction(self._connect()) as conn:
+                if not keys:
+                    conn.execute("DELETE FROM items WHERE expire <= ?", (int(time()),))
+                else:
+                    conn.executemany(
+                        "DELETE FROM items WHERE key = ?",
+                        [
+                            (str(k),)
+                            for k in (keys if isinstance(keys, list) else [keys])
+                        ],
+                    )
+        except sqlite3.DatabaseError as exc:
+            self._on_db_error(exc)
+            return False
         return True
 
     def clean(self):
+        self.close()
         if not os.path.isdir(self.cache_dir):
             return
         fs.rmtree(self.cache_dir)
 
-    def _lock_dbindex(self):
-        self._lockfile = LockFile(self.cache_dir)
-        try:
-            self._lockfile.acquire()
-        except:  # pylint: disable=bare-except
-            return False
 
-        return True
-
-    def _unlock_dbindex(self):
-        if self._lockfile:
-            self._lockfile.release()
-        return True
+@contextmanager
+def _transaction(conn):
+    # take the write lock at once, avoid deadlocks of upgraded locks
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
 
 
 #
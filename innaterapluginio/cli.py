@@ -11,43 +11,66 @@
 # limitations under the License.
 
 import importlib
+import json
 from pathlib import Path
 
 import click
 
+# precomputed at build time by `save_commands_registry()`, see "setup.py"
+COMMANDS_REGISTRY_NAME = "commands.json"
+COMMAND_ALIASES = dict(package="pkg")
+
+
+def find_commands(root_path=None):
+    root_path = Path(root_path or Path(__file__).parent)
+
+    def _to_module_path(p):
+        return "innaterapluginio." + ".".join(p.relative_to(root_path).parts)[:-3]
+
+    result = {}
+    for p in root_path.rglob("cli.py"):
+        # skip this module
+        if p.parent == root_path:
+            continue
+        cmd_name = p.parent.name
+        result[COMMAND_ALIASES.get(cmd_name, cmd_name)] = _to_module_path(p)
+
+    # find legacy commands
+    for p in (root_path / "commands").iterdir():
+        if p.name.startswith("_"):
+            continue
+        if (p / "command.py").is_file():
+            result[p.name] = _to_module_path(p / "command.py")
+        elif p.name.endswith(".py"):
+            result[p.name[:-3]] = _to_module_path(p)
+
+    return result
+
+
+def load_commands_registry(root_path=None):
+    path = Path(root_path or Path(__file__).parent) / COMMANDS_REGISTRY_NAME
+    try:
+        with path.open(encoding="utf8") as fp:
+            result = json.load(fp)
+    except (OSError, ValueError):
+        return None
+    return result if isinstance(result, dict) else None
+
+
+def save_commands_registry(root_path=None):
+    root_path = Path(root_path or Path(__file__).parent)
+    with (root_path / COMMANDS_REGISTRY_NAME).open(mode="w", encoding="utf8") as fp:
+        json.dump(find_commands(root_path), fp, indent=2, sort_keys=True)
+
 
 class PlatformioCLI(click.MultiCommand):
     leftover_args = []
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._pio_root_path = Path(__file__).parent
-        self._pio_cmd_aliases = dict(package="pkg")
+    _commands = {}
 
     def _find_pio_commands(self):
-        def _to_module_path(p):
-            return (
-                "innaterapluginio." + ".".join(p.relative_to(self._pio_root_path).parts)[:-3]
-            )
-
-        result = {}
-        for p in self._pio_root_path.rglob("cli.py"):
-            # skip this module
-            if p.parent == self._pio_root_path:
-                continue
-            cmd_name = p.parent.name
-            result[self._pio_cmd_aliases.get(cmd_name, cmd_name)] = _to_module_path(p)
-
-        # find legacy commands
-        for p in (self._pio_root_path / "commands").iterdir():
-            if p.name.startswith("_"):
-                continue
-            if (p / "command.py").is_file():
-                result[p.name] = _to_module_path(p / "command.py")
-            elif p.name.endswith(".py"):
-                result[p.name[:-3]] = _to_module_path(p)
-
-        return result
+        if not PlatformioCLI._commands:
+            PlatformioCLI._commands = load_commands_registry() or find_commands()
+        return PlatformioCLI._commands
 
     @staticmethod
     def in_silence():
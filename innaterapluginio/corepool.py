@@ -0,0 +1,159 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import atexit
+import io
+import multiprocessing
+import os
+import sys
+
+from innaterapluginio.compat import aio_to_thread
+
+
+class CoreWorker:
+    """A process with loaded Core which runs CLI commands one by one."""
+
+    def __init__(self):
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        # daemonic, the workers are terminated together with a server
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn,),
+            name="pio-core-worker",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.calls = 0
+
+    def call(self, args, cwd=None, env=None):
+        self.calls += 1
+        self._conn.send(dict(args=args, cwd=cwd, env=env))
+        return self._conn.recv()
+
+    def terminate(self):
+        """Stop a worker which may be still running a command."""
+        self.process.terminate()
+        self.process.join(1)
+
+    def close(self):
+        try:
+            self._conn.send(None)
+        except OSError:
+            pass
+        self._conn.close()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class CoreWorkerPool:
+    """Pre-started worker processes for the inline `core.call` requests.
+
+    Every call is dispatched to an idle worker with own working directory,
+    environment and captured output, so the calls run in parallel without
+    sharing the process-wide state of the server. A worker is replaced
+    after `MAX_CALLS_PER_WORKER` calls to drop the state accumulated by
+    commands.
+    """
+
+    MAX_CALLS_PER_WORKER = 100
+
+    def __init__(self, size=None):
+        self.size = size or max(1, min(4, os.cpu_count() or 1))
+        self._workers = []
+        self._idle = None
+        atexit.register(self.close)
+
+    def start(self):
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._idle.put_nowait(self._new_worker())
+
+    def _new_worker(self):
+        worker = CoreWorker()
+        self._workers.append(worker)
+        return worker
+
+    def _replace_worker(self, worker, busy=False):
+        self._workers.remove(worker)
+        if busy:
+            worker.terminate()
+        else:
+            worker.close()
+        return self._new_worker()
+
+    async def call(self, args, cwd=None, env=None):
+        self.start()
+        worker = await self._idle.get()
+        try:
+            return await aio_to_thread(worker.call, args, cwd, env)
+        except asyncio.CancelledError:
+            # the abandoned command is still running, its result would be
+            # received by the next call
+            worker = self._replace_worker(worker, busy=True)
+            raise
+        except (EOFError, OSError):
+            # the worker has crashed
+            worker = self._replace_worker(worker)
+            raise
+        finally:
+            if worker.calls >= self.MAX_CALLS_PER_WORKER:
+                worker = self._replace_worker(worker)
+            self._idle.put_nowait(worker)
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
+        self._workers = []
+        self._idle = None
+
+
+def _worker_main(conn):
+    # pylint: disable=import-outside-toplevel
+    from innaterapluginio import __main__
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):  # the server has exited
+            break
+        if request is None:
+            break
+        conn.send(_run_command(__main__.main, **request))
+
+
+def _run_command(main, args, cwd=None, env=None):
+    prev_environ = os.environ.copy()
+    prev_cwd = os.getcwd()
+    prev_streams = (sys.stdout, sys.stderr)
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    exit_code = 1
+    try:
+        os.environ.update(env or {})
+        sys.stdout, sys.stderr = stdout, stderr
+        if cwd:
+            os.chdir(cwd)
+        exit_code = main(["-c"] + args)
+    except BaseException as exc:  # pylint: disable=broad-except
+        stderr.write(str(exc))
+    finally:
+        sys.stdout, sys.stderr = prev_streams
+        os.chdir(prev_cwd)
+        os.environ.clear()
+        os.environ.update(prev_environ)
+    return (stdout.getvalue(), stderr.getvalue(), exit_code)
@@ -4,7 +4,6 @@ import socket
 import click
 
 from innaterapluginio.compat import IS_WINDOWS
-from innaterapluginio.custom.run import run_server
 from innaterapluginio.package.manager.core import get_core_package_dir
 
 
@@ -75,6 +74,9 @@ def cli(port, host, no_open, shutdown_timeout, session_id):
             click.launch(custom_url)
         return
 
+    # pylint: disable=import-outside-toplevel
+    from innaterapluginio.custom.run import run_server
+
     run_server(
         host=host,
         port=port,
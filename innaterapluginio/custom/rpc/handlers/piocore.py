@@ -12,16 +12,13 @@
 
 import asyncio
 import functools
-import io
 import json
 import os
-import sys
-import threading
 
 import click
 from ajsonrpc.core import JSONRPC20DispatchException
 
-from innaterapluginio import __main__, __version__, app, fs, proc, util
+from innaterapluginio import __version__, app, proc, util
 from innaterapluginio.compat import (
     IS_WINDOWS,
     aio_create_task,
@@ -30,6 +27,7 @@ from innaterapluginio.compat import (
     get_locale_encoding,
     is_bytes,
 )
+from innaterapluginio.corepool import CoreWorkerPool
 from innaterapluginio.exception import PlatformioException
 from innaterapluginio.custom.rpc.handlers.base import BaseRPCHandler
 
@@ -63,43 +61,14 @@ class PIOCoreProtocol(asyncio.SubprocessProtocol):
         self._is_exited = True
 
 
-class MultiThreadingStdStream:
-    def __init__(self, parent_stream):
-        self._buffers = {threading.get_ident(): parent_stream}
-
-    def __getattr__(self, name):
-        thread_id = threading.get_ident()
-        self._ensure_thread_buffer(thread_id)
-        return getattr(self._buffers[thread_id], name)
-
-    def _ensure_thread_buffer(self, thread_id):
-        if thread_id not in self._buffers:
-            self._buffers[thread_id] = io.StringIO()
-
-    def write(self, value):
-        thread_id = threading.get_ident()
-        self._ensure_thread_buffer(thread_id)
-        return self._buffers[thread_id].write(
-            value.decode() if is_bytes(value) else value
-        )
-
-    def get_value_and_reset(self):
-        result = ""
-        try:
-            result = self.getvalue()
-            self.seek(0)
-            self.truncate(0)
-        except AttributeError:
-            pass
-        return result
-
-
 @util.memoized(expire="60s")
 def get_core_fullpath():
     return proc.where_is_program("platformio" + (".exe" if IS_WINDOWS else ""))
 
 
 class PIOCoreRPC(BaseRPCHandler):
+    worker_pool = None
+
     @staticmethod
     def version():
         return __version__
@@ -139,15 +108,6 @@ class PIOCoreRPC(BaseRPCHandler):
             )
         )
 
-    @staticmethod
-    def setup_multithreading_std_streams():
-        if isinstance(sys.stdout, MultiThreadingStdStream):
-            return
-        PIOCoreRPC.thread_stdout = MultiThreadingStdStream(sys.stdout)
-        PIOCoreRPC.thread_stderr = MultiThreadingStdStream(sys.stderr)
-        sys.stdout = PIOCoreRPC.thread_stdout
-        sys.stderr = PIOCoreRPC.thread_stderr
-
     @staticmethod
     async def call(args, options=None):
         for i, arg in enumerate(args):
@@ -183,20 +143,18 @@ class PIOCoreRPC(BaseRPCHandler):
         return (result["out"], result["err"], result["returncode"])
 
     @staticmethod
-    async def _call_inline(args, options):
-        PIOCoreRPC.setup_multithreading_std_streams()
-
-        def _thread_safe_call(args, cwd):
-            with fs.cd(cwd):
-                exit_code = __main__.main(["-c"] + args)
-            return (
-                PIOCoreRPC.thread_stdout.get_value_and_reset(),
-                PIOCoreRPC.thread_stderr.get_value_and_reset(),
-                exit_code,
-            )
+    def start_worker_pool():
+        if not PIOCoreRPC.worker_pool:
+            PIOCoreRPC.worker_pool = CoreWorkerPool()
+        PIOCoreRPC.worker_pool.start()
 
-        return await aio_to_thread(
-            _thread_safe_call, args=args, cwd=options.get("cwd") or os.getcwd()
+    @staticmethod
+    async def _call_inline(args, options):
+        PIOCoreRPC.start_worker_pool()
+        if args[0] != "--caller" and app.get_session_var("caller_id"):
+            args = ["--caller", app.get_session_var("caller_id")] + args
+        return await PIOCoreRPC.worker_pool.call(
+            args, cwd=options.get("cwd") or os.getcwd(), env=options.get("env")
         )
 
     @staticmethod
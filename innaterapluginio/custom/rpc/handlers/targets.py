@@ -1,13 +1,31 @@
 import asyncio
-import subprocess
-from ajsonrpc.core import JSONRPC20DispatchException
+import codecs
 import logging
 import os
+import uuid
+
+from ajsonrpc.core import JSONRPC20DispatchException
+
+from innaterapluginio.compat import get_locale_encoding
+from innaterapluginio.custom.rpc.handlers.base import BaseRPCHandler
+
+
+class PIOTargets(BaseRPCHandler):
+    """Runs project targets without blocking the event loop.
+
+    The output of a target is streamed to the frontend with
+    `OUTPUT_NOTIFICATION_METHOD` notifications while the target runs,
+    a running target is stopped by `cancel()`.
+    """
 
+    OUTPUT_NOTIFICATION_METHOD = "targets.output"
+    READ_CHUNK_SIZE = 4096
 
-class PIOTargets:
-    @staticmethod
-    async def fetch(targets):
+    def __init__(self):
+        self._processes = {}  # run_id -> {index: (target, process)}
+        self._cancelled = set()
+
+    async def fetch(self, targets, options=None):
         if not targets:
             return []
 
@@ -20,16 +38,103 @@ class PIOTargets:
         if not targets:
             raise JSONRPC20DispatchException("No valid targets specified.")
 
+        options = options or {}
+        run_id = options.get("runId") or str(uuid.uuid4())
+        self._processes[run_id] = {}
+        try:
+            if options.get("concurrent"):
+                await asyncio.gather(
+                    *[
+                        self._run_target(run_id, index, target, options)
+                        for index, target in enumerate(targets)
+                    ]
+                )
+            else:
+                for index, target in enumerate(targets):
+                    if run_id in self._cancelled:
+                        break
+                    await self._run_target(run_id, index, target, options)
+        finally:
+            del self._processes[run_id]
+            self._cancelled.discard(run_id)
+        return targets
+
+    def cancel(self, run_id=None):
+        """Terminate the running targets of `run_id` or of all runs."""
+        run_ids = [run_id] if run_id else list(self._processes)
+        result = []
+        for rid in run_ids:
+            if rid not in self._processes:
+                continue
+            self._cancelled.add(rid)
+            for target, process in self._processes[rid].values():
+                if process.returncode is None:
+                    process.terminate()
+                    result.append(target)
+        return result
+
+    async def _run_target(self, run_id, index, target, options):
         pio = os.path.expanduser("~") + "/.innatera/penv/bin/pio"
-        for target in targets:
-            result = subprocess.call(
-                [
-                    pio,
-                    "run",
-                    "--target",
-                    target,
+        process = await asyncio.create_subprocess_exec(
+            pio,
+            "run",
+            "--target",
+            target,
+            cwd=options.get("cwd"),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        # the same target may be requested more than once
+        self._processes[run_id][index] = (target, process)
+        try:
+            await asyncio.gather(
+                *[
+                    self._stream_output(
+                        run_id,
+                        target,
+                        getattr(process, pipe),
+                        pipe,
+                        options.get(f"{pipe}NotificationMethod")
+                        or self.OUTPUT_NOTIFICATION_METHOD,
+                    )
+                    for pipe in ("stdout", "stderr")
                 ]
             )
-            if result != 0:
-                logging.error("Failed to run target %s" % target)
-        return targets
+            returncode = await process.wait()
+        except asyncio.CancelledError:
+            # a request has been cancelled, do not leave a target running
+            if process.returncode is None:
+                process.terminate()
+            raise
+        if run_id in self._cancelled:
+            logging.info("Target %s has been cancelled", target)
+        elif returncode != 0:
+            logging.error("Failed to run target %s", target)
+        return returncode
+
+    async def _stream_output(  # pylint: disable=too-many-arguments
+        self, run_id, target, stream, pipe, method
+    ):
+        decoder = codecs.getincrementaldecoder(get_locale_encoding())("replace")
+        while True:
+            data = await stream.read(self.READ_CHUNK_SIZE)
+            text = decoder.decode(data, final=not data)
+            if text and self.factory:
+                try:
+                    await self.factory.notify_clients(
+                        method=method,
+                        params=[
+                            {
+                                "runId": run_id,
+                                "target": target,
+                                "pipe": pipe,
+                                "data": text,
+                            }
+                        ],
+                        actor="frontend",
+                    )
+                except Exception as exc:  # pylint: disable=broad-except
+                    logging.info("Could not send the output of %s: %s", target, exc)
+            if not data:
+                break
@@ -82,6 +82,8 @@ def run_server(host, port, no_open, shutdown_timeout, home_url):
                     "Innatera Home has been started. Press Ctrl+C to shutdown."
                 ),
                 lambda: None if no_open else click.launch(home_url),
+                # warm up the workers of `core.call` requests
+                PIOCoreRPC.start_worker_pool,
             ],
         ),
         host=host,
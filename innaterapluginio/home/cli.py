@@ -16,7 +16,6 @@ import socket
 import click
 
 from innaterapluginio.compat import IS_WINDOWS
-from innaterapluginio.home.run import run_server
 from innaterapluginio.package.manager.core import get_core_package_dir
 
 
@@ -87,6 +86,9 @@ def cli(port, host, no_open, shutdown_timeout, session_id):
             click.launch(home_url)
         return
 
+    # pylint: disable=import-outside-toplevel
+    from innaterapluginio.home.run import run_server
+
     run_server(
         host=host,
         port=port,
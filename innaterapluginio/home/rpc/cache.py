@@ -0,0 +1,130 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import functools
+import inspect
+import json
+import os
+
+from innaterapluginio.compat import aio_get_running_loop, aio_to_thread
+from innaterapluginio.package.manager.platform import PlatformPackageManager
+
+
+class RPCResultCache:
+    """Results of idempotent RPC methods.
+
+    A result is keyed by a method with its arguments and stays valid while
+    the files it was computed from keep the same modification time and size.
+    Identical requests which arrive while a result is being computed wait
+    for that computation instead of starting a new one.
+    """
+
+    MAX_ITEMS = 256
+
+    def __init__(self):
+        self._items = {}
+        self._pending = {}
+
+    def wrap(self, method, func, get_dependencies):
+        """Cache `func` if `get_dependencies` returns the paths for a call.
+
+        `get_dependencies` accepts the arguments of `func` and returns None
+        when a call is not idempotent and must not be cached.
+        """
+
+        @functools.wraps(func)
+        async def _wrapper(*args, **kwargs):
+            # dependencies are collected from installed packages on disk
+            dependencies = await aio_to_thread(get_dependencies, *args, **kwargs)
+            if dependencies is None:
+                return await self._call(func, args, kwargs)
+            return await self.call(
+                [method, args, kwargs], dependencies, func, *args, **kwargs
+            )
+
+        return _wrapper
+
+    async def call(self, key, dependencies, func, *args, **kwargs):
+        key = json.dumps(key, sort_keys=True, default=str)
+        if key in self._pending:
+            return await asyncio.shield(self._pending[key])
+
+        future = aio_get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            result = await self._get_or_call(key, dependencies, func, args, kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # nobody may wait for it
+            raise
+        finally:
+            del self._pending[key]
+        future.set_result(result)
+        return result
+
+    async def _get_or_call(self, key, dependencies, func, args, kwargs):
+        fingerprint = await aio_to_thread(self.get_fingerprint, dependencies)
+        item = self._items.get(key)
+        if item and item[0] == fingerprint:
+            return item[1]
+
+        result = await self._call(func, args, kwargs)
+        self._items.pop(key, None)
+        self._items[key] = (fingerprint, result)
+        while len(self._items) > self.MAX_ITEMS:
+            del self._items[next(iter(self._items))]
+        return result
+
+    @staticmethod
+    async def _call(func, args, kwargs):
+        result = func(*args, **kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    @staticmethod
+    def get_fingerprint(paths):
+        result = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                result.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                result.append((path, None, None))
+        return result
+
+    def clear(self):
+        self._items = {}
+
+
+def get_platforms_dependencies(platform_spec=None):
+    """Paths which the boards of the installed platforms are loaded from."""
+    pm = PlatformPackageManager()
+    result = [pm.package_dir]
+    if platform_spec:
+        pkg = pm.get_package(platform_spec)
+        pkgs = [pkg] if pkg else []
+    else:
+        pkgs = pm.get_installed()
+    for pkg in pkgs:
+        boards_dir = os.path.join(pkg.path, "boards")
+        result.extend([pkg.path, os.path.join(pkg.path, "platform.json"), boards_dir])
+        if os.path.isdir(boards_dir):
+            result.extend(
+                os.path.join(boards_dir, name)
+                for name in sorted(os.listdir(boards_dir))
+            )
+    return result
@@ -13,6 +13,7 @@
 import os.path
 
 from innaterapluginio.compat import aio_to_thread
+from innaterapluginio.home.rpc.cache import get_platforms_dependencies
 from innaterapluginio.home.rpc.handlers.base import BaseRPCHandler
 from innaterapluginio.package.manager.platform import PlatformPackageManager
 from innaterapluginio.package.manifest.parser import ManifestParserFactory
@@ -21,6 +22,8 @@ from innaterapluginio.platform.factory import PlatformFactory
 
 
 class PlatformRPC(BaseRPCHandler):
+    CACHED_METHODS = {"fetch_boards": "_get_boards_dependencies"}
+
     async def fetch_platforms(self, search_query=None, page=0, force_installed=False):
         if force_installed:
             return {
@@ -98,6 +101,16 @@ class PlatformRPC(BaseRPCHandler):
             )
         return await aio_to_thread(self._load_installed_boards, spec)
 
+    @staticmethod
+    def _get_boards_dependencies(platform_spec):
+        spec = PackageSpec(platform_spec)
+        if spec.owner:  # the registry responses have own cache
+            return None
+        return get_platforms_dependencies(spec) + [
+            os.path.join(os.getcwd(), "conf.ini"),
+            os.path.join(os.getcwd(), "boards"),
+        ]
+
     @staticmethod
     def _load_installed_boards(platform_spec):
         p = PlatformFactory.new(platform_spec)
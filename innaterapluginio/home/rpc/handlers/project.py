@@ -19,6 +19,7 @@ import semantic_version
 from ajsonrpc.core import JSONRPC20DispatchException
 
 from innaterapluginio import app, exception, fs
+from innaterapluginio.home.rpc.cache import get_platforms_dependencies
 from innaterapluginio.home.rpc.handlers.app import AppRPC
 from innaterapluginio.home.rpc.handlers.base import BaseRPCHandler
 from innaterapluginio.home.rpc.handlers.piocore import PIOCoreRPC
@@ -32,6 +33,8 @@ from innaterapluginio.project.options import get_config_options_schema
 
 
 class ProjectRPC(BaseRPCHandler):
+    CACHED_METHODS = {"get_projects": "_get_projects_dependencies"}
+
     @staticmethod
     def config_call(init_kwargs, method, *args):
         assert isinstance(init_kwargs, dict)
@@ -148,6 +151,19 @@ class ProjectRPC(BaseRPCHandler):
             )
         return result
 
+    @staticmethod
+    def _get_projects_dependencies():
+        result = [app.resolve_state_path("core_dir", "homestate.json")]
+        for project_dir in AppRPC.load_state()["storage"]["recentProjects"]:
+            result.extend(
+                [
+                    project_dir,
+                    os.path.join(project_dir, "conf.ini"),
+                    os.path.join(project_dir, ".snp", "libdeps"),
+                ]
+            )
+        return result + get_platforms_dependencies()
+
     @staticmethod
     def get_project_examples():
         result = []
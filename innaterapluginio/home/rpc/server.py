@@ -20,6 +20,7 @@ from ajsonrpc.manager import AsyncJSONRPCResponseManager, JSONRPC20Response
 from starlette.endpoints import WebSocketEndpoint
 
 from innaterapluginio.compat import aio_create_task, aio_get_running_loop
+from innaterapluginio.home.rpc.cache import RPCResultCache
 from innaterapluginio.http import InternetConnectionError
 from innaterapluginio.proc import force_exit
 
@@ -38,6 +39,7 @@ class JSONRPCServerFactoryBase:
             Dispatcher(), is_server_error_verbose=True
         )
         self._clients = {}
+        self.result_cache = RPCResultCache()
 
     def __call__(self, *args, **kwargs):
         raise NotImplementedError
@@ -45,6 +47,14 @@ class JSONRPCServerFactoryBase:
     def add_object_handler(self, handler, namespace):
         handler.factory = self
         self.manager.dispatcher.add_object(handler, prefix="%s." % namespace)
+        # idempotent methods, see `RPCResultCache`
+        for name, get_dependencies in getattr(handler, "CACHED_METHODS", {}).items():
+            method = "%s.%s" % (namespace, name)
+            self.manager.dispatcher[method] = self.result_cache.wrap(
+                method,
+                self.manager.dispatcher[method],
+                getattr(handler, get_dependencies),
+            )
 
     def on_client_connect(self, connection, actor=None):
         self._clients[connection] = {"actor": actor}
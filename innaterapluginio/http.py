@@ -12,6 +12,7 @@
 
 import json
 import socket
+import threading
 from urllib.parse import urljoin
 
 import requests.adapters
@@ -43,10 +44,52 @@ class InternetConnectionError(UserSideException):
     )
 
 
+class PooledHTTPAdapter(requests.adapters.HTTPAdapter):
+    """A transport adapter shared by the sessions of a process.
+
+    Connections are kept alive per host, so the next request to the same
+    host skips TCP and TLS handshakes even if it is sent by another session.
+    """
+
+    def close(self):
+        # a session is closed, keep the connections for other sessions
+        pass
+
+
+_POOLED_ADAPTERS = {}
+_POOLED_ADAPTERS_LOCK = threading.Lock()
+
+# https://urllib3.readthedocs.io/en/stable/reference/urllib3.util.html
+DEFAULT_RETRY = Retry(
+    total=5,
+    backoff_factor=1,  # [0, 2, 4, 8, 16] secs
+    # method_whitelist=list(Retry.DEFAULT_METHOD_WHITELIST) + ["POST"],
+    status_forcelist=[413, 429, 500, 502, 503, 504],
+)
+
+
+def get_pooled_http_adapter(with_retry=False):
+    with _POOLED_ADAPTERS_LOCK:
+        if with_retry not in _POOLED_ADAPTERS:
+            try:
+                pool_connections = int(app.get_setting("http_pool_connections"))
+                pool_maxsize = int(app.get_setting("http_pool_maxsize"))
+            except (PlatformioException, ValueError):
+                pool_connections = pool_maxsize = requests.adapters.DEFAULT_POOLSIZE
+            _POOLED_ADAPTERS[with_retry] = PooledHTTPAdapter(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                max_retries=DEFAULT_RETRY if with_retry else 0,
+            )
+        return _POOLED_ADAPTERS[with_retry]
+
+
 class HTTPSession(requests.Session):
     def __init__(self, *args, **kwargs):
         self._x_base_url = kwargs.pop("x_base_url") if "x_base_url" in kwargs else None
         super().__init__(*args, **kwargs)
+        for prefix in ("https://", "http://"):
+            self.mount(prefix, get_pooled_http_adapter())
         self.headers.update({"User-Agent": app.get_user_agent()})
         try:
             self.verify = app.get_setting("enable_proxy_strict_ssl")
@@ -77,13 +120,6 @@ class HTTPSessionIterator:
             endpoints = [endpoints]
         self.endpoints = endpoints
         self.endpoints_iter = iter(endpoints)
-        # https://urllib3.readthedocs.io/en/stable/reference/urllib3.util.html
-        self.retry = Retry(
-            total=5,
-            backoff_factor=1,  # [0, 2, 4, 8, 16] secs
-            # method_whitelist=list(Retry.DEFAULT_METHOD_WHITELIST) + ["POST"],
-            status_forcelist=[413, 429, 500, 502, 503, 504],
-        )
 
     def __iter__(self):  # pylint: disable=non-iterator-returned
         return self
@@ -91,8 +127,7 @@ class HTTPSessionIterator:
     def __next__(self):
         base_url = next(self.endpoints_iter)
         session = HTTPSession(x_base_url=base_url)
-        adapter = requests.adapters.HTTPAdapter(max_retries=self.retry)
-        session.mount(base_url, adapter)
+        session.mount(base_url, get_pooled_http_adapter(with_retry=True))
         return session
 
 
@@ -18,13 +18,8 @@ import click
 import semantic_version
 
 from innaterapluginio import __version__, app, exception, fs, telemetry
-from innaterapluginio.cache import cleanup_content_cache
 from innaterapluginio.cli import PlatformioCLI
-from innaterapluginio.commands.upgrade import get_latest_version
-from innaterapluginio.http import HTTPClientError, InternetConnectionError, ensure_internet_on
-from innaterapluginio.package.manager.core import update_core_packages
 from innaterapluginio.package.version import pepver_to_semver
-from innaterapluginio.system.prune import calculate_unnecessary_system_data
 
 
 def on_cmd_start(ctx, caller):
@@ -40,6 +35,9 @@ def on_cmd_end():
     if PlatformioCLI.in_silence():
         return
 
+    # pylint: disable=import-outside-toplevel
+    from innaterapluginio.http import HTTPClientError, InternetConnectionError
+
     try:
         check_platformio_upgrade()
         check_prune_system()
@@ -143,6 +141,10 @@ def after_upgrade(ctx):
 
     click.secho("Please wait while upgrading Innatera...", fg="yellow")
 
+    # pylint: disable=import-outside-toplevel
+    from innaterapluginio.cache import cleanup_content_cache
+    from innaterapluginio.package.manager.core import update_core_packages
+
     # Update PlatformIO's Core packages
     cleanup_content_cache("http")
     update_core_packages()
@@ -183,6 +185,11 @@ def check_platformio_upgrade():
     if not last_checked_time:
         return
 
+    # pylint: disable=import-outside-toplevel
+    from innaterapluginio.commands.upgrade import get_latest_version
+    from innaterapluginio.http import ensure_internet_on
+    from innaterapluginio.package.manager.core import update_core_packages
+
     ensure_internet_on(raise_exception=True)
 
     # Update PlatformIO Core packages
@@ -221,6 +228,9 @@ def check_prune_system():
     if threshold_mb <= 0:
         return
 
+    # pylint: disable=import-outside-toplevel
+    from innaterapluginio.system.prune import calculate_unnecessary_system_data
+
     unnecessary_size = calculate_unnecessary_system_data()
     if (unnecessary_size / 1024) < threshold_mb:
         return
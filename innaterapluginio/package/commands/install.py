@@ -26,6 +26,7 @@ from innaterapluginio.package.meta import PackageCompatibility, PackageSpec
 from innaterapluginio.platform.exception import UnknownPlatform
 from innaterapluginio.platform.factory import PlatformFactory
 from innaterapluginio.project.config import ProjectConfig
+from innaterapluginio.project.pkglock import ProjectPackageLock
 from innaterapluginio.project.savedeps import pkg_to_save_spec, save_project_dependencies
 from innaterapluginio.test.result import TestSuite
 from innaterapluginio.test.runners.factory import TestRunnerFactory
@@ -126,14 +127,18 @@ def install_project_env_dependencies(project_env, options=None):
         )
     # declared dependencies
     if not installed_conds:
+        package_lock = ProjectPackageLock(os.getcwd(), project_env)
         installed_conds = [
-            _install_project_env_platform(project_env, options),
-            _install_project_env_libraries(project_env, options),
+            _install_project_env_platform(project_env, options, package_lock),
+            _install_project_env_libraries(project_env, options, package_lock),
         ]
+        # skipped dependencies would lose their entries
+        if not options.get("skip_dependencies"):
+            package_lock.save()
     return any(installed_conds)
 
 
-def _install_project_env_platform(project_env, options):
+def _install_project_env_platform(project_env, options, package_lock=None):
     config = ProjectConfig.get_instance()
     pm = PlatformPackageManager()
     if options.get("silent"):
@@ -144,7 +149,9 @@ def _install_project_env_platform(project_env, options):
     already_up_to_date = not options.get("force")
     if not pm.get_package(spec):
         already_up_to_date = False
-    PlatformPackageManager().install(
+    installer = PlatformPackageManager()
+    installer.package_lock = package_lock
+    installer.install(
         spec,
         project_env=project_env,
         project_targets=options.get("project_targets"),
@@ -201,7 +208,7 @@ def _install_project_env_custom_tools(project_env, options):
     return not already_up_to_date
 
 
-def _install_project_env_libraries(project_env, options):
+def _install_project_env_libraries(project_env, options, package_lock=None):
     _uninstall_project_unused_libdeps(project_env, options)
     already_up_to_date = not options.get("force")
     config = ProjectConfig.get_instance()
@@ -229,6 +236,7 @@ def _install_project_env_libraries(project_env, options):
     private_lm = LibraryPackageManager(
         os.path.join(config.get("platformio", "lib_dir"))
     )
+    env_lm.package_lock = package_lock
     if options.get("silent"):
         env_lm.set_log_level(logging.WARN)
         private_lm.set_log_level(logging.WARN)
@@ -240,6 +248,7 @@ def _install_project_env_libraries(project_env, options):
         )
         lib_deps.extend(test_runner.EXTRA_LIB_DEPS or [])
 
+    specs = []
     for library in lib_deps:
         spec = PackageSpec(library)
         # skip built-in dependencies
@@ -247,8 +256,11 @@ def _install_project_env_libraries(project_env, options):
             continue
         if not env_lm.get_package(spec):
             already_up_to_date = False
-        env_lm.install(
-            spec,
+        specs.append(spec)
+    if specs:
+        # the resolved packages are downloaded concurrently
+        env_lm.install_many(
+            specs,
             skip_dependencies=options.get("skip_dependencies"),
             force=options.get("force"),
         )
@@ -10,23 +10,38 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
 import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from email.utils import parsedate
-from os.path import getsize, join
+from os.path import join
 from time import mktime
 
 import click
+import requests
 
 from innaterapluginio import fs
 from innaterapluginio.compat import is_terminal
 from innaterapluginio.http import HTTPSession
 from innaterapluginio.package.exception import PackageException
 
+CHUNK_SIZE = 256 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024
+RESUME_RETRIES = 5
+SEGMENT_MIN_SIZE = 16 * 1024 * 1024
 
-class FileDownloader:
+
+class FileDownloader:  # pylint: disable=too-many-instance-attributes
     def __init__(self, url, dest_dir=None):
+        self.url = url
         self._http_session = HTTPSession()
         self._http_response = None
+        self._checksum_hash = None
+        self._received_size = 0
+        self._resumed = False
         # make connection
         self._http_response = self._http_session.get(
             url,
@@ -38,8 +53,10 @@ class FileDownloader:
                     self._http_response.status_code, url
                 )
             )
+        # the headers of a full content, the partial responses differ
+        self._headers = self._http_response.headers
 
-        disposition = self._http_response.headers.get("content-disposition")
+        disposition = self._headers.get("content-disposition")
         if disposition and "filename=" in disposition:
             self._fname = (
                 disposition[disposition.index("filename=") + 9 :]
@@ -60,66 +77,269 @@ class FileDownloader:
         return self._destination
 
     def get_lmtime(self):
-        return self._http_response.headers.get("last-modified")
+        return self._headers.get("last-modified")
 
     def get_size(self):
-        if "content-length" not in self._http_response.headers:
+        if "content-length" not in self._headers:
             return -1
-        return int(self._http_response.headers["content-length"])
+        return int(self._headers["content-length"])
+
+    def is_resumed(self):
+        return self._resumed
+
+    def accepts_ranges(self):
+        return (
+            self.get_size() > 0
+            and self._headers.get("accept-ranges", "").lower() == "bytes"
+            and not self._headers.get("content-encoding")
+        )
 
-    def start(self, with_progress=True, silent=False):
+    def set_checksum(self, checksum):
+        """Hash the content incrementally while it is being received."""
+        self._checksum_hash = hashlib.new(self.get_checksum_algo(checksum))
+
+    def request_range(self, start, end=None, session=None):
+        """Request a part of the content.
+
+        Returns `None` if a server does not honor the range or the content
+        has been changed since the first request.
+        """
+        headers = {"Range": "bytes=%d-%s" % (start, "" if end is None else end)}
+        validator = self._headers.get("etag") or self.get_lmtime()
+        if validator:
+            headers["If-Range"] = validator
+        response = (session or self._http_session).get(
+            self.url, stream=True, headers=headers
+        )
+        content_range = response.headers.get("content-range", "")
+        if response.status_code != 206 or not content_range.startswith(
+            "bytes %d-" % start
+        ):
+            response.close()
+            return None
+        return response
+
+    def _iter_body(self):
+        retries = 0
+        while True:
+            try:
+                for chunk in self._http_response.iter_content(chunk_size=CHUNK_SIZE):
+                    yield self._on_chunk(chunk)
+                if self.get_size() == -1 or self._received_size >= self.get_size():
+                    return
+                # the server has closed a connection before the end of content
+                if not self._can_resume(retries):
+                    return  # a size mismatch is reported by `verify()`
+            except requests.exceptions.RequestException:
+                if not self._can_resume(retries):
+                    raise
+            retries += 1
+            time.sleep(0.5 * retries)
+            self._http_response.close()
+            response = self.request_range(self._received_size)
+            if not response:
+                raise PackageException("Could not resume the download of %s" % self.url)
+            self._http_response = response
+
+    def _can_resume(self, retries):
+        return retries < RESUME_RETRIES and self.accepts_ranges()
+
+    def iter_content(self, with_progress=True, silent=False):
         label = "Downloading"
         file_size = self.get_size()
-        itercontent = self._http_response.iter_content(
-            chunk_size=io.DEFAULT_BUFFER_SIZE
-        )
+        itercontent = self._iter_body()
         try:
-            with open(self._destination, "wb") as fp:
-                if file_size == -1 or not with_progress or silent:
-                    if not silent:
-                        click.echo(f"{label}...")
-                    for chunk in itercontent:
-                        fp.write(chunk)
+            if file_size == -1 or not with_progress or silent:
+                if not silent:
+                    click.echo(f"{label}...")
+                yield from itercontent
 
-                elif not is_terminal():
-                    click.echo(f"{label} 0%", nl=False)
-                    print_percent_step = 10
-                    printed_percents = 0
-                    downloaded_size = 0
+            elif not is_terminal():
+                click.echo(f"{label} 0%", nl=False)
+                print_percent_step = 10
+                printed_percents = 0
+                for chunk in itercontent:
+                    yield chunk
+                    while (self._received_size / file_size * 100) >= (
+                        printed_percents + print_percent_step
+                    ):
+                        printed_percents += print_percent_step
+                        click.echo(f" {printed_percents}%", nl=False)
+                click.echo("")
+
+            else:
+                with click.progressbar(
+                    length=file_size,
+                    label=label,
+                    update_min_steps=min(
+                        256 * 1024, file_size / 100
+                    ),  # every 256Kb or less
+                ) as pb:
+                    pb.update(self._received_size)
                     for chunk in itercontent:
-                        fp.write(chunk)
-                        downloaded_size += len(chunk)
-                        if (downloaded_size / file_size * 100) >= (
-                            printed_percents + print_percent_step
-                        ):
-                            printed_percents += print_percent_step
-                            click.echo(f" {printed_percents}%", nl=False)
-                    click.echo("")
-
-                else:
-                    with click.progressbar(
-                        length=file_size,
-                        iterable=itercontent,
-                        label=label,
-                        update_min_steps=min(
-                            256 * 1024, file_size / 100
-                        ),  # every 256Kb or less
-                    ) as pb:
-                        for chunk in pb:
-                            pb.update(len(chunk))
-                            fp.write(chunk)
+                        pb.update(len(chunk))
+                        yield chunk
         finally:
             self._http_response.close()
             self._http_session.close()
 
-        if self.get_lmtime():
-            self._preserve_filemtime(self.get_lmtime())
+    def _on_chunk(self, chunk):
+        self._received_size += len(chunk)
+        if self._checksum_hash:
+            self._checksum_hash.update(chunk)
+        return chunk
+
+    def start(self, with_progress=True, silent=False, resume=False, segments=1):
+        """Download the content to a destination file.
+
+        With `resume`, the content of an existing destination file is kept
+        and only the rest is requested. Large files are fetched by
+        `segments` parallel range requests if a server supports them.
+        """
+        offset = self._get_resume_offset() if resume else 0
+        if offset:
+            response = self.request_range(offset)
+            if response:
+                self._http_response.close()
+                self._http_response = response
+                self._resumed = True
+                self._received_size = offset
+                if self._checksum_hash:
+                    with open(self._destination, "rb") as fp:
+                        for chunk in iter(lambda: fp.read(WRITE_BUFFER_SIZE), b""):
+                            self._checksum_hash.update(chunk)
+        elif (
+            segments > 1
+            and self.accepts_ranges()
+            and self.get_size() >= SEGMENT_MIN_SIZE * 2
+        ):
+            return self._start_segmented(with_progress, silent, segments)
+
+        with open(
+            self._destination,
+            "ab" if self._resumed else "wb",
+            buffering=WRITE_BUFFER_SIZE,
+        ) as fp:
+            for chunk in self.iter_content(with_progress, silent):
+                fp.write(chunk)
+
+        self.preserve_filemtime()
+        return True
+
+    def _get_resume_offset(self):
+        if not self.accepts_ranges() or not os.path.isfile(self._destination):
+            return 0
+        size = os.path.getsize(self._destination)
+        return size if size < self.get_size() else 0
+
+    def _start_segmented(self, with_progress, silent, segments):
+        file_size = self.get_size()
+        segments = min(segments, file_size // SEGMENT_MIN_SIZE)
+        segment_size = file_size // segments
+        bounds = [
+            (
+                i * segment_size,
+                file_size - 1 if i == segments - 1 else (i + 1) * segment_size - 1,
+            )
+            for i in range(segments)
+        ]
+        # a content is written out of order, the checksum is computed later
+        self._checksum_hash = None
+        self._http_response.close()
+        with open(self._destination, "wb") as fp:
+            fp.truncate(file_size)
+
+        lock = threading.Lock()
+        label = "Downloading"
+        with ThreadPoolExecutor(max_workers=segments) as executor:
+            futures = [
+                executor.submit(self._fetch_segment, start, end, lock)
+                for start, end in bounds
+            ]
+            if not with_progress or silent:
+                if not silent:
+                    click.echo(f"{label}...")
+                wait(futures)
+            else:
+                with click.progressbar(length=file_size, label=label) as pb:
+                    reported_size = 0
+                    while wait(futures, timeout=0.5).not_done:
+                        pb.update(self._received_size - reported_size)
+                        reported_size = self._received_size
+                    pb.update(self._received_size - reported_size)
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                # the segments are not contiguous, do not resume such a file
+                with open(self._destination, "wb"):
+                    pass
+                raise
 
+        self._http_session.close()
+        self.preserve_filemtime()
         return True
 
+    def _fetch_segment(self, start, end, lock):
+        session = HTTPSession()
+        retries = 0
+        try:
+            with open(self._destination, "r+b", buffering=0) as fp:
+                fp.seek(start)
+                while start <= end:
+                    response = self.request_range(start, end, session)
+                    if not response:
+                        raise PackageException(
+                            "Could not download a segment of %s" % self.url
+                        )
+                    received = 0
+                    try:
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            chunk = chunk[: end - start + 1]
+                            fp.write(chunk)
+                            start += len(chunk)
+                            received += len(chunk)
+                            with lock:
+                                self._received_size += len(chunk)
+                    except requests.exceptions.RequestException:
+                        if retries >= RESUME_RETRIES:
+                            raise
+                        received = 0
+                    finally:
+                        response.close()
+                    if start > end or received:
+                        continue
+                    # a failed attempt, also a connection closed without content
+                    retries += 1
+                    if retries > RESUME_RETRIES:
+                        raise PackageException(
+                            "Could not download a segment of %s" % self.url
+                        )
+                    time.sleep(0.5 * retries)
+        finally:
+            session.close()
+
+    def preserve_filemtime(self, path=None):
+        if self.get_lmtime():
+            self._preserve_filemtime(self.get_lmtime(), path)
+
+    @staticmethod
+    def get_checksum_algo(checksum):
+        algo = {32: "md5", 40: "sha1", 64: "sha256"}.get(len(checksum))
+        if not algo:
+            raise PackageException(
+                "Could not determine checksum algorithm by %s" % checksum
+            )
+        return algo
+
     def verify(self, checksum=None):
-        _dlsize = getsize(self._destination)
-        if self.get_size() != -1 and _dlsize != self.get_size():
+        _dlsize = self._received_size
+        # the length of an encoded content differs from the decoded one
+        if (
+            self.get_size() != -1
+            and not self._headers.get("content-encoding")
+            and _dlsize != self.get_size()
+        ):
             raise PackageException(
                 (
                     "The size ({0:d} bytes) of downloaded file '{1}' "
@@ -129,21 +349,11 @@ class FileDownloader:
         if not checksum:
             return True
 
-        checksum_len = len(checksum)
-        hash_algo = None
-        if checksum_len == 32:
-            hash_algo = "md5"
-        elif checksum_len == 40:
-            hash_algo = "sha1"
-        elif checksum_len == 64:
-            hash_algo = "sha256"
-
-        if not hash_algo:
-            raise PackageException(
-                "Could not determine checksum algorithm by %s" % checksum
-            )
-
-        dl_checksum = fs.calculate_file_hashsum(hash_algo, self._destination)
+        hash_algo = self.get_checksum_algo(checksum)
+        if self._checksum_hash and self._checksum_hash.name == hash_algo:
+            dl_checksum = self._checksum_hash.hexdigest()
+        else:
+            dl_checksum = fs.calculate_file_hashsum(hash_algo, self._destination)
         if checksum.lower() != dl_checksum.lower():
             raise PackageException(
                 "The checksum '{0}' of the downloaded file '{1}' "
@@ -153,11 +363,48 @@ class FileDownloader:
             )
         return True
 
-    def _preserve_filemtime(self, lmdate):
+    def _preserve_filemtime(self, lmdate, path=None):
         lmtime = mktime(parsedate(lmdate))
-        fs.change_filemtime(self._destination, lmtime)
+        fs.change_filemtime(path or self._destination, lmtime)
 
     def __del__(self):
         self._http_session.close()
         if self._http_response:
             self._http_response.close()
+
+
+class DownloadStream(io.RawIOBase):
+    """A read-only file object over the chunks of a download."""
+
+    def __init__(self, chunks):
+        super().__init__()
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buffer = chunk
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def peek(self, size):
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        return self._buffer[:size]
+
+    def drain(self):
+        """Read the rest of the content, e.g. the padding after TAR members."""
+        self._buffer = b""
+        for _ in self._chunks:
+            pass
@@ -11,20 +11,26 @@
 # limitations under the License.
 
 import hashlib
+import itertools
 import logging
 import os
 import tempfile
+import threading
 import time
 
 import click
 
-from innaterapluginio import app, compat, util
-from innaterapluginio.package.download import FileDownloader
+from innaterapluginio import app, compat, fs, util
+from innaterapluginio.package.download import DownloadStream, FileDownloader
+from innaterapluginio.package.exception import PackageException
 from innaterapluginio.package.lockfile import LockFile
+from innaterapluginio.package.unpack import StreamUnpacker
 
 
 class PackageManagerDownloadMixin:
     DOWNLOAD_CACHE_EXPIRE = 86400 * 30  # keep package in a local cache for 1 month
+    DOWNLOAD_SEGMENTS = 4  # parallel range requests for large files
+    _DOWNLOAD_USAGEDB_LOCK = threading.Lock()
 
     def compute_download_path(self, *args):
         request_hash = hashlib.new("sha1")
@@ -37,8 +43,12 @@ class PackageManagerDownloadMixin:
         return os.path.join(self.get_download_dir(), "usage.db")
 
     def set_download_utime(self, path, utime=None):
-        with app.State(self.get_download_usagedb_path(), lock=True) as state:
-            state[os.path.basename(path)] = int(time.time() if not utime else utime)
+        # a file lock does not protect the state from concurrent threads
+        with self._DOWNLOAD_USAGEDB_LOCK:
+            with app.State(self.get_download_usagedb_path(), lock=True) as state:
+                state[os.path.basename(path)] = int(
+                    time.time() if not utime else utime
+                )
 
     @util.memoized(DOWNLOAD_CACHE_EXPIRE)
     def cleanup_expired_downloads(self, _=None):
@@ -52,47 +62,152 @@ class PackageManagerDownloadMixin:
                 if os.path.isfile(dl_path):
                     os.remove(dl_path)
 
-    def download(self, url, checksum=None):
-        silent = not self.log.isEnabledFor(logging.INFO)
+    def download(self, url, checksum=None, silent=False):
+        silent = silent or not self.log.isEnabledFor(logging.INFO)
         dl_path = self.compute_download_path(url, checksum or "")
         if os.path.isfile(dl_path):
             self.set_download_utime(dl_path)
             return dl_path
 
         with_progress = not app.is_disabled_progressbar()
-        tmp_fd, tmp_path = tempfile.mkstemp(dir=self.get_download_dir())
+        # a partial download is resumed only if it can be validated later
+        tmp_path = dl_path + ".tmp"
+        keep_partial = False
+        with LockFile(dl_path):
+            if not checksum and os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+            try:
+                fd = self._download_file_with_fallback(
+                    url, tmp_path, checksum, with_progress, silent
+                )
+                try:
+                    fd.verify(checksum)
+                except PackageException:
+                    if not fd.is_resumed():
+                        raise
+                    # the partial file is outdated, start from scratch
+                    os.remove(tmp_path)
+                    fd = self._download_file(
+                        url, tmp_path, checksum, with_progress, silent
+                    )
+                    fd.verify(checksum)
+                os.rename(tmp_path, dl_path)
+            except (IOError, KeyboardInterrupt):
+                keep_partial = bool(checksum)
+                raise
+            finally:
+                if os.path.isfile(tmp_path):
+                    if keep_partial:
+                        self.set_download_utime(tmp_path)
+                    else:
+                        os.remove(tmp_path)
+
+        assert os.path.isfile(dl_path)
+        self.set_download_utime(dl_path)
+        return dl_path
+
+    def _download_file_with_fallback(self, url, path, checksum, with_progress, silent):
         try:
-            with LockFile(dl_path):
+            return self._download_file(url, path, checksum, with_progress, silent)
+        except IOError as exc:
+            fd = None
+            if with_progress:
                 try:
-                    fd = FileDownloader(url)
-                    fd.set_destination(tmp_path)
-                    fd.start(with_progress=with_progress, silent=silent)
-                except IOError as exc:
-                    raise_error = not silent
-                    if with_progress:
-                        try:
-                            fd = FileDownloader(url)
-                            fd.set_destination(tmp_path)
-                            fd.start(with_progress=False, silent=silent)
-                        except IOError:
-                            raise_error = True
-                    if raise_error:
-                        self.log.error(
-                            click.style(
-                                "Error: Please read https://bit.ly/package-manager-ioerror",
-                                fg="red",
-                            )
-                        )
-                        raise exc
-            if checksum:
-                fd.verify(checksum)
-            os.close(tmp_fd)
+                    fd = self._download_file(url, path, checksum, False, silent)
+                except IOError:
+                    pass
+            if not silent or not fd:
+                self.log.error(
+                    click.style(
+                        "Error: Please read https://bit.ly/package-manager-ioerror",
+                        fg="red",
+                    )
+                )
+                raise exc
+            return fd
+
+    def _download_file(self, url, path, checksum, with_progress, silent):
+        fd = FileDownloader(url)
+        fd.set_destination(path)
+        if checksum:
+            fd.set_checksum(checksum)
+        fd.start(
+            with_progress=with_progress,
+            silent=silent,
+            resume=True,
+            segments=self.DOWNLOAD_SEGMENTS,
+        )
+        return fd
+
+    def download_unpack(self, url, dst, checksum=None, silent=False):
+        """Download and unpack an archive in one pass.
+
+        TAR archives are extracted to `dst` directly from the HTTP stream
+        while the content is hashed and, optionally, saved to the download
+        cache. Cached and ZIP archives are unpacked from a file.
+        """
+        dl_path = self.compute_download_path(url, checksum or "")
+        if not os.path.isfile(dl_path):
+            try:
+                if self._stream_unpack(url, dl_path, dst, checksum, silent):
+                    return True
+            except IOError:
+                # start from scratch, the regular download reports an error
+                fs.rmtree(dst)
+                os.makedirs(dst)
+        dl_path = self.download(url, checksum, silent=silent)
+        try:
+            return self.unpack(dl_path, dst, silent=silent)
+        finally:
+            if not app.get_setting("enable_download_cache"):
+                os.remove(dl_path)
+
+    def _stream_unpack(self, url, dl_path, dst, checksum, silent):
+        tmp_fd, tmp_path = tempfile.mkstemp(dir=self.get_download_dir())
+        try:
+            with open(tmp_fd, "wb") as fp, LockFile(dl_path):
+                fd, streaming = self._stream_download(url, fp, dst, checksum, silent)
+            if streaming and not app.get_setting("enable_download_cache"):
+                return True
+            fd.preserve_filemtime(tmp_path)
             os.rename(tmp_path, dl_path)
         finally:
             if os.path.isfile(tmp_path):
-                os.close(tmp_fd)
                 os.remove(tmp_path)
 
-        assert os.path.isfile(dl_path)
         self.set_download_utime(dl_path)
-        return dl_path
+        return streaming
+
+    def _stream_download(self, url, fp, dst, checksum, silent):
+        """Download `url` to `fp` and extract a TAR archive on the fly.
+
+        Returns a downloader and whether the archive has been extracted.
+        """
+        silent = silent or not self.log.isEnabledFor(logging.INFO)
+        with_progress = not app.is_disabled_progressbar()
+        use_cache = app.get_setting("enable_download_cache")
+        fd = FileDownloader(url)
+        if checksum:
+            fd.set_checksum(checksum)
+        chunks = fd.iter_content(with_progress, silent)
+        head = next(chunks, b"")
+        streaming = StreamUnpacker.is_supported(head)
+
+        def _iter_content():
+            for chunk in itertools.chain([head], chunks):
+                if use_cache or not streaming:
+                    fp.write(chunk)
+                yield chunk
+
+        stream = DownloadStream(_iter_content())
+        try:
+            if streaming:
+                StreamUnpacker(stream).unpack(dst)
+        except Exception:  # pylint: disable=broad-except
+            # report a corrupted download rather than a broken archive
+            stream.drain()
+            fd.verify(checksum)
+            raise
+        stream.drain()
+        fd.verify(checksum)
+        return fd, streaming
@@ -11,28 +11,58 @@
 # limitations under the License.
 
 import hashlib
+import logging
 import os
 import shutil
 import tempfile
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import click
 
 from innaterapluginio import app, compat, fs, util
 from innaterapluginio.package.exception import PackageException, UnknownPackageError
 from innaterapluginio.package.meta import PackageCompatibility, PackageItem
+from innaterapluginio.package.store import PackageStore
 from innaterapluginio.package.unpack import FileUnpacker
 from innaterapluginio.package.vcsclient import VCSClientFactory
+from innaterapluginio.project.config import ProjectConfig
+
+
+class PackageInstallPlanItem:  # pylint: disable=too-many-instance-attributes
+    def __init__(self, spec, compatibility=None, dependency=None, parent=None):
+        self.spec = spec
+        self.compatibility = compatibility
+        self.dependency = dependency
+        self.parent = parent
+        self.pkg = None  # already installed
+        self.with_dependencies = True
+        self.install_spec = spec
+        self.sources = None
+        self.tmp_dir = None
+        self.vcs_revision = None
+        self.error = None
+
+    def __repr__(self):
+        return "PackageInstallPlanItem <%s>" % self.spec.humanize()
+
+    @property
+    def is_fetchable(self):
+        return self.sources is not None and not self.spec.symlink
+
 
 class PackageManagerInstallMixin:
     _INSTALL_HISTORY = None  # avoid circle dependencies
+    INSTALL_JOBS = 4
+    _SOURCES_LOCK = threading.Lock()
 
     @staticmethod
-    def unpack(src, dst):
-        with_progress = not app.is_disabled_progressbar()
+    def unpack(src, dst, silent=False):
+        with_progress = not app.is_disabled_progressbar() and not silent
         try:
             with FileUnpacker(src) as fu:
-                return fu.unpack(dst, with_progress=with_progress)
+                return fu.unpack(dst, with_progress=with_progress, silent=silent)
         except IOError as exc:
             if not with_progress:
                 raise exc
@@ -49,16 +79,256 @@ class PackageManagerInstallMixin:
         finally:
             self.unlock()
 
-    def _install(
-        self,
-        spec,
-        skip_dependencies=False,
-        force=False,
-        compatibility: PackageCompatibility = None,
-    ):
-        spec = self.ensure_spec(spec)
-        self.spec = spec
+    def install_many(self, specs, skip_dependencies=False, force=False, jobs=None):
+        """Install packages and their dependencies using an install plan.
+
+        Packages are resolved first, then downloaded and unpacked concurrently,
+        and finally installed one by one in the order of `specs`. Dependencies
+        are declared in manifests of packages, so they are processed by the
+        next plan after their dependents are installed.
+        """
+        try:
+            self.lock()
+            result = self._install_many(
+                specs, skip_dependencies=skip_dependencies, force=force, jobs=jobs
+            )
+            self.memcache_reset()
+            self.cleanup_expired_downloads()
+            return result
+        finally:
+            self.unlock()
+
+    def _install_many(self, specs, skip_dependencies=False, force=False, jobs=None):
+        result = None
+        items = [PackageInstallPlanItem(self.ensure_spec(spec)) for spec in specs]
+        while items:
+            plan = self.resolve_install_plan(items, force=force and result is None)
+            self.fetch_install_plan(plan, jobs=jobs)
+            pkgs = self.commit_install_plan(plan)
+            if result is None:
+                result = pkgs
+            if skip_dependencies:
+                break
+            items = []
+            for item, pkg in zip(plan, pkgs):
+                # ensure dependencies of already installed packages too
+                if item.with_dependencies:
+                    items.extend(self._get_dependency_plan_items(pkg))
+        return result or []
+
+    def _get_dependency_plan_items(self, pkg):
+        items = []
+        for dependency in self.get_pkg_dependencies(pkg) or []:
+            dependency_compatibility = PackageCompatibility.from_dependency(
+                dependency
+            )
+            if self.compatibility and not dependency_compatibility.is_compatible(
+                self.compatibility
+            ):
+                self.log.debug(
+                    click.style(
+                        "Skip incompatible `%s` dependency with `%s`"
+                        % (dependency, self.compatibility),
+                        fg="yellow",
+                    )
+                )
+                continue
+            items.append(
+                PackageInstallPlanItem(
+                    self.dependency_to_spec(dependency),
+                    compatibility=dependency_compatibility,
+                    dependency=dependency,
+                    parent=pkg,
+                )
+            )
+        return items
+
+    def _get_history_package(self, spec):
+        if not self._INSTALL_HISTORY:
+            self._INSTALL_HISTORY = {}
+        pkg = self._INSTALL_HISTORY.get(spec)
+        # a dependency could be removed by a forced installation
+        return pkg if pkg and os.path.isdir(pkg.path) else None
+
+    def resolve_install_plan(self, items, force=False):
+        plan = []
+        visited = set()
+        for item in items:
+            spec = self.override_spec_uri(item.spec)
+            if spec in visited:
+                continue
+            visited.add(spec)
+            history_pkg = self._get_history_package(spec)
+            if history_pkg and not force:
+                # dependencies have been already processed
+                if not item.dependency:
+                    item.pkg = history_pkg
+                    item.with_dependencies = False
+                    plan.append(item)
+                continue
+
+            pkg = self.get_package(spec)
+            if pkg and force:
+                self.uninstall(pkg)
+                pkg = None
+            if pkg:
+                self._INSTALL_HISTORY[spec] = pkg
+                if self.package_lock and not spec.external:
+                    self.lock_installed_package(spec, pkg)
+                self.log.debug(
+                    click.style(
+                        "{name}@{version} is already installed".format(
+                            **pkg.metadata.as_dict()
+                        ),
+                        fg="yellow",
+                    )
+                )
+                item.pkg = pkg
+                plan.append(item)
+                continue
+
+            try:
+                if spec.external:
+                    item.sources = iter([(spec.uri, None)])
+                else:
+                    item.install_spec, item.sources = (
+                        self.fetch_registry_package_sources(
+                            spec,
+                            search_qualifiers=(
+                                item.compatibility.to_search_qualifiers(
+                                    ["platforms", "frameworks", "authors"]
+                                )
+                                if item.compatibility
+                                else None
+                            ),
+                        )
+                    )
+            except UnknownPackageError:
+                if not item.dependency:
+                    raise
+                if item.dependency.get("owner"):
+                    self.log.warning(
+                        click.style(
+                            "Warning! Could not install `%s` dependency "
+                            "for the`%s` package"
+                            % (item.dependency, item.parent.metadata.name),
+                            fg="yellow",
+                        )
+                    )
+                continue
+            self.log.info("Installing %s" % click.style(spec.humanize(), fg="cyan"))
+            plan.append(item)
+        return plan
+
+    def fetch_install_plan(self, plan, jobs=None):
+        items = [item for item in plan if not item.pkg and item.is_fetchable]
+        if not items:
+            return
+        # a single package is fetched with own progress
+        if len(items) == 1:
+            self._fetch_install_plan_item(items[0])
+            return
 
+        jobs = max(1, min(jobs or self.INSTALL_JOBS, len(items)))
+        with_progress = not app.is_disabled_progressbar() and self.log.isEnabledFor(
+            logging.INFO
+        )
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                executor.submit(self._fetch_install_plan_item, item, silent=True): item
+                for item in items
+            }
+            if not with_progress:
+                for future in as_completed(futures):
+                    future.result()
+                return
+            with click.progressbar(
+                length=len(futures),
+                label="Fetching %d packages" % len(futures),
+                item_show_func=lambda item: item.spec.humanize() if item else None,
+            ) as pb:
+                for future in as_completed(futures):
+                    future.result()
+                    pb.update(1, futures[future])
+
+    def _fetch_install_plan_item(self, item, silent=False):
+        while True:
+            with self._SOURCES_LOCK:
+                source = next(item.sources, None)
+            if not source:
+                break
+            url, checksum = source
+            tmp_dir = tempfile.mkdtemp(
+                prefix="pkg-installing-", dir=self.get_tmp_dir()
+            )
+            try:
+                item.vcs_revision = self.fetch_from_uri(
+                    url, item.spec, tmp_dir, checksum, silent=silent
+                )
+                item.tmp_dir = tmp_dir
+                item.error = None
+                return
+            except Exception as exc:  # pylint: disable=broad-except
+                item.error = exc
+                fs.rmtree(tmp_dir)
+                if item.spec.external:
+                    break
+
+    def commit_install_plan(self, plan):
+        result = []
+        try:
+            for item in plan:
+                if item.pkg:
+                    result.append(item.pkg)
+                    continue
+                result.append(self._commit_install_plan_item(item))
+        finally:
+            for item in plan:
+                if item.tmp_dir and os.path.isdir(item.tmp_dir):
+                    try:
+                        fs.rmtree(item.tmp_dir)
+                    except:  # pylint: disable=bare-except
+                        pass
+        return result
+
+    def _commit_install_plan_item(self, item):
+        spec = item.spec
+        pkg = None
+        if spec.symlink:
+            pkg = self.install_symlink(spec)
+        elif item.tmp_dir:
+            pkg = self._install_tmp_dir(
+                item.tmp_dir, item.install_spec, item.vcs_revision
+            )
+        elif item.error and spec.external:
+            raise item.error
+        elif item.error:
+            self.log.warning(
+                click.style("Warning! Package Mirror: %s" % item.error, fg="yellow")
+            )
+
+        if not pkg or not pkg.metadata:
+            raise PackageException(
+                "Could not install package '%s' for '%s' system"
+                % (spec.humanize(), util.get_systype())
+            )
+
+        self.call_pkg_script(pkg, "postinstall")
+
+        self.log.info(
+            click.style(
+                "{name}@{version} has been installed!".format(**pkg.metadata.as_dict()),
+                fg="green",
+            )
+        )
+
+        self.memcache_reset()
+        # avoid RecursionError for circular_dependencies
+        self._INSTALL_HISTORY[spec] = pkg
+        return pkg
+
+    @staticmethod
+    def override_spec_uri(spec):
         if spec.name == "contrib-piohome":
             spec.uri = (
                 "https://github.com/Ineshmcw/Innatera_home_build"
@@ -74,6 +344,17 @@ class PackageManagerInstallMixin:
                 + spec.name
                 + ".tar.xz"
             )
+        return spec
+
+    def _install(
+        self,
+        spec,
+        skip_dependencies=False,
+        force=False,
+        compatibility: PackageCompatibility = None,
+    ):
+        spec = self.override_spec_uri(self.ensure_spec(spec))
+        self.spec = spec
 
         # avoid circle dependencies
         if not self._INSTALL_HISTORY:
@@ -92,6 +373,8 @@ class PackageManagerInstallMixin:
         if pkg:
             # avoid RecursionError for circular_dependencies
             self._INSTALL_HISTORY[spec] = pkg
+            if self.package_lock and not spec.external:
+                self.lock_installed_package(spec, pkg)
 
             self.log.debug(
                 click.style(
@@ -191,39 +474,9 @@ class PackageManagerInstallMixin:
             return self.install_symlink(spec)
 
         tmp_dir = tempfile.mkdtemp(prefix="pkg-installing-", dir=self.get_tmp_dir())
-        vcs = None
         try:
-            if spec.name == "contrib-piohome" or spec.name == "talamo":
-                repo_dir = os.path.join(tmp_dir, spec.name)
-                if not os.path.isdir(repo_dir):
-                    subprocess.check_call(["git", "clone", uri, repo_dir])
-            else:
-                if uri.startswith("file://"):
-                    _uri = uri[7:]
-                    if os.path.isfile(_uri):
-                        self.unpack(_uri, tmp_dir)
-                    else:
-                        fs.rmtree(tmp_dir)
-                        shutil.copytree(_uri, tmp_dir, symlinks=True)
-                elif uri.startswith(("http://", "https://")):
-                    dl_path = self.download(uri, checksum)
-                    if not os.path.isfile(dl_path):
-                        raise FileNotFoundError(f"Downloaded file not found: {dl_path}")
-                    self.unpack(dl_path, tmp_dir)
-                else:
-                    vcs = VCSClientFactory.new(tmp_dir, uri)
-                    if not vcs.export():
-                        raise PackageException("Failed to export VCS repository")
-            
-            root_dir = self.find_pkg_root(tmp_dir, spec)
-            pkg_item = PackageItem(
-                root_dir,
-                self.build_metadata(
-                    root_dir, spec, vcs.get_current_revision() if vcs else None
-                ),
-            )
-            pkg_item.dump_meta()
-            return self._install_tmp_pkg(pkg_item)
+            vcs_revision = self.fetch_from_uri(uri, spec, tmp_dir, checksum)
+            return self._install_tmp_dir(tmp_dir, spec, vcs_revision)
         finally:
             if os.path.isdir(tmp_dir):
                 try:
@@ -231,6 +484,40 @@ class PackageManagerInstallMixin:
                 except:  # pylint: disable=bare-except
                     pass
 
+    def fetch_from_uri(self, uri, spec, tmp_dir, checksum=None, silent=False):
+        """Download and unpack a package to a temporary directory.
+
+        Returns a revision for the packages exported from VCS.
+        """
+        if spec.name == "contrib-piohome" or spec.name == "talamo":
+            repo_dir = os.path.join(tmp_dir, spec.name)
+            if not os.path.isdir(repo_dir):
+                subprocess.check_call(["git", "clone", uri, repo_dir])
+            return None
+        if uri.startswith("file://"):
+            _uri = uri[7:]
+            if os.path.isfile(_uri):
+                self.unpack(_uri, tmp_dir, silent=silent)
+            else:
+                fs.rmtree(tmp_dir)
+                shutil.copytree(_uri, tmp_dir, symlinks=True)
+            return None
+        if uri.startswith(("http://", "https://")):
+            self.download_unpack(uri, tmp_dir, checksum, silent=silent)
+            return None
+        vcs = VCSClientFactory.new(tmp_dir, uri)
+        if not vcs.export():
+            raise PackageException("Failed to export VCS repository")
+        return vcs.get_current_revision()
+
+    def _install_tmp_dir(self, tmp_dir, spec, vcs_revision=None):
+        root_dir = self.find_pkg_root(tmp_dir, spec)
+        pkg_item = PackageItem(
+            root_dir, self.build_metadata(root_dir, spec, vcs_revision)
+        )
+        pkg_item.dump_meta()
+        return self._install_tmp_pkg(pkg_item)
+
     def _install_tmp_pkg(self, tmp_pkg):
         assert isinstance(tmp_pkg, PackageItem)
         # validate package version and declared requirements
@@ -293,8 +580,7 @@ class PackageManagerInstallMixin:
             shutil.copytree(dst_pkg.path, pkg_dir, symlinks=True)
             # move new source to the destination location
             _cleanup_dir(dst_pkg.path)
-            shutil.copytree(tmp_pkg.path, dst_pkg.path, symlinks=True)
-            return PackageItem(dst_pkg.path)
+            return self._copy_tmp_pkg(tmp_pkg, dst_pkg.path)
 
         if action == "detach-new":
             target_dirname = "%s@%s" % (
@@ -310,10 +596,29 @@ class PackageManagerInstallMixin:
                 )
             pkg_dir = os.path.join(self.package_dir, target_dirname)
             _cleanup_dir(pkg_dir)
-            shutil.copytree(tmp_pkg.path, pkg_dir, symlinks=True)
-            return PackageItem(pkg_dir)
+            return self._copy_tmp_pkg(tmp_pkg, pkg_dir)
 
         # otherwise, overwrite existing
         _cleanup_dir(dst_pkg.path)
-        shutil.copytree(tmp_pkg.path, dst_pkg.path, symlinks=True)
-        return PackageItem(dst_pkg.path)
+        return self._copy_tmp_pkg(tmp_pkg, dst_pkg.path)
+
+    def get_package_store_mode(self):
+        """How packages are materialized from the shared package store.
+
+        The "copy" mode does not use the store.
+        """
+        return "copy"
+
+    def _copy_tmp_pkg(self, tmp_pkg, dst_dir):
+        store_mode = self.get_package_store_mode()
+        # the packages from VCS/URL sources could be changed in place
+        if store_mode == "copy" or tmp_pkg.metadata.spec.external:
+            shutil.copytree(tmp_pkg.path, dst_dir, symlinks=True)
+            return PackageItem(dst_dir)
+        store = PackageStore(
+            ProjectConfig.get_instance().get("platformio", "package_store_dir")
+        )
+        key = store.add(tmp_pkg.path)
+        return store.materialize(
+            key, PackageItem(dst_dir, tmp_pkg.metadata), store_mode
+        )
@@ -14,6 +14,7 @@ import time
 
 import click
 
+from innaterapluginio.http import HTTPClientError, InternetConnectionError
 from innaterapluginio.package.exception import UnknownPackageError
 from innaterapluginio.package.meta import PackageSpec
 from innaterapluginio.package.version import cast_version_to_semver
@@ -23,47 +24,155 @@ from innaterapluginio.registry.mirror import RegistryFileMirrorIterator
 
 class PackageManagerRegistryMixin:
     def install_from_registry(self, spec, search_qualifiers=None):
-        package = version = None
+        pkg_spec, sources = self.fetch_registry_package_sources(
+            spec, search_qualifiers
+        )
+        for url, checksum in sources:
+            try:
+                return self.install_from_uri(url, pkg_spec, checksum)
+            except Exception as exc:  # pylint: disable=broad-except
+                self.log.warning(
+                    click.style("Warning! Package Mirror: %s" % exc, fg="yellow")
+                )
+                self.log.warning(
+                    click.style("Looking for another mirror...", fg="yellow")
+                )
+
+        return None
+
+    def fetch_registry_package_sources(self, spec, search_qualifiers=None):
+        """Resolve a registry package to a spec and a list of download sources.
+
+        Every source is a tuple of URL (a mirror) and SHA256 checksum.
+        A spec locked by `package_lock` for the current system is resolved
+        without the registry API.
+        """
+        locked = (
+            self.package_lock.get(self.pkg_type, spec) if self.package_lock else None
+        )
+        if locked:
+            return (
+                PackageSpec(
+                    owner=locked["owner"], id=locked["id"], name=locked["name"]
+                ),
+                # the locked checksum wins over the one reported by a mirror
+                (
+                    (url, locked["checksum"])
+                    for url, _ in RegistryFileMirrorIterator(locked["url"])
+                ),
+            )
+
+        package, version = self.find_registry_version(
+            spec,
+            search_qualifiers,
+            locked_version=(
+                self.package_lock.get_version(self.pkg_type, spec)
+                if self.package_lock
+                else None
+            ),
+        )
+        if not package or not version:
+            raise UnknownPackageError(spec.humanize())
+
+        pkgfile = self.pick_compatible_pkg_file(version["files"]) if version else None
+        if not pkgfile:
+            raise UnknownPackageError(spec.humanize())
+
+        if self.package_lock:
+            self.package_lock.set(
+                self.pkg_type,
+                spec,
+                self._make_package_lock_entry(package, version, pkgfile),
+            )
+
+        return (
+            PackageSpec(
+                owner=package["owner"]["username"],
+                id=package["id"],
+                name=package["name"],
+            ),
+            # mirrors are requested lazily, only when a previous one fails
+            (
+                (url, checksum or pkgfile["checksum"]["sha256"])
+                for url, checksum in RegistryFileMirrorIterator(
+                    pkgfile["download_url"]
+                )
+            ),
+        )
+
+    def find_registry_version(self, spec, search_qualifiers=None, locked_version=None):
+        specs = [spec]
+        if locked_version:
+            # keep the version locked on another system if it is available here
+            specs.insert(
+                0,
+                PackageSpec(
+                    owner=spec.owner,
+                    id=spec.id,
+                    name=spec.name,
+                    requirements=locked_version,
+                ),
+            )
         if spec.owner and spec.name and not search_qualifiers:
             package = self.fetch_registry_package(spec)
             if not package:
                 raise UnknownPackageError(spec.humanize())
-            version = self.pick_best_registry_version(package["versions"], spec)
+            for item in specs:
+                version = self.pick_best_registry_version(package["versions"], item)
+                if version:
+                    return (package, version)
         elif spec.id or spec.name:
             packages = self.search_registry_packages(spec, search_qualifiers)
             if not packages:
                 raise UnknownPackageError(spec.humanize())
             if len(packages) > 1:
                 self.print_multi_package_issue(self.log.warning, packages, spec)
-            package, version = self.find_best_registry_version(packages, spec)
+            for item in specs:
+                package, version = self.find_best_registry_version(packages, item)
+                if version:
+                    return (package, version)
+        return (None, None)
 
-        if not package or not version:
-            raise UnknownPackageError(spec.humanize())
+    def lock_installed_package(self, spec, pkg):
+        """Record an installed registry package in `package_lock`.
 
+        A package installed before the lock existed is looked up in the
+        registry by its exact version. Without the Internet connection the
+        package stays unlocked until the next installation.
+        """
+        if self.package_lock.keep(self.pkg_type, spec, pkg):
+            return
+        if not pkg.metadata or pkg.metadata.spec.external:
+            return
+        try:
+            package = self.fetch_registry_package(pkg.metadata.spec)
+        except (HTTPClientError, InternetConnectionError) as exc:
+            self.log.debug("Could not lock %s: %s", spec.humanize(), exc)
+            return
+        version = None
+        for item in (package or {}).get("versions", []):
+            if cast_version_to_semver(item["name"]) == pkg.metadata.version:
+                version = item
+                break
         pkgfile = self.pick_compatible_pkg_file(version["files"]) if version else None
-        if not pkgfile:
-            raise UnknownPackageError(spec.humanize())
-
-        for url, checksum in RegistryFileMirrorIterator(pkgfile["download_url"]):
-            try:
-                return self.install_from_uri(
-                    url,
-                    PackageSpec(
-                        owner=package["owner"]["username"],
-                        id=package["id"],
-                        name=package["name"],
-                    ),
-                    checksum or pkgfile["checksum"]["sha256"],
-                )
-            except Exception as exc:  # pylint: disable=broad-except
-                self.log.warning(
-                    click.style("Warning! Package Mirror: %s" % exc, fg="yellow")
-                )
-                self.log.warning(
-                    click.style("Looking for another mirror...", fg="yellow")
-                )
+        if pkgfile:
+            self.package_lock.set(
+                self.pkg_type,
+                spec,
+                self._make_package_lock_entry(package, version, pkgfile),
+            )
 
-        return None
+    @staticmethod
+    def _make_package_lock_entry(package, version, pkgfile):
+        return dict(
+            owner=package["owner"]["username"],
+            id=package["id"],
+            name=package["name"],
+            version=version["name"],
+            system=pkgfile.get("system") or "*",
+            url=pkgfile["download_url"],
+            checksum=pkgfile["checksum"]["sha256"],
+        )
 
     def get_registry_client_instance(self):
         if not self._registry_client:
@@ -119,6 +119,7 @@ class PackageManagerUpdateMixin:
             assert vcs.update()
             pkg.metadata.version = self._fetch_vcs_latest_version(pkg)
             pkg.dump_meta()
+            self.memcache_reset()
             return pkg
 
         # uninstall existing version
@@ -10,9 +10,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+import json
 import logging
 import os
 import subprocess
+import time
 from datetime import datetime
 
 import click
@@ -20,7 +23,7 @@ import semantic_version
 
 from innaterapluginio import fs, util
 from innaterapluginio.cli import PlatformioCLI
-from innaterapluginio.compat import ci_strings_are_equal
+from innaterapluginio.compat import ci_strings_are_equal, hashlib_encode_data
 from innaterapluginio.package.exception import ManifestException, MissingPackageManifestError
 from innaterapluginio.package.lockfile import LockFile
 from innaterapluginio.package.manager._download import PackageManagerDownloadMixin
@@ -56,6 +59,8 @@ class BasePackageManager(  # pylint: disable=too-many-public-methods,too-many-in
     PackageManagerLegacyMixin,
 ):
     _MEMORY_CACHE = {}
+    INSTALLED_INDEX_VERSION = 2
+    INSTALLED_INDEX_RACY_WINDOW = 2  # seconds
 
     def __init__(self, pkg_type, package_dir, compatibility=None):
         self.pkg_type = pkg_type
@@ -68,6 +73,7 @@ class BasePackageManager(  # pylint: disable=too-many-public-methods,too-many-in
         self._download_dir = None
         self._tmp_dir = None
         self._registry_client = None
+        self.package_lock = None
 
     def __repr__(self):
         return (
@@ -112,6 +118,8 @@ class BasePackageManager(  # pylint: disable=too-many-public-methods,too-many-in
 
     def memcache_reset(self):
         self._MEMORY_CACHE.clear()
+        # packages have been installed, updated or removed
+        self.reset_installed_index()
 
     @staticmethod
     def is_system_compatible(value, custom_system=None):
@@ -214,7 +222,7 @@ class BasePackageManager(  # pylint: disable=too-many-public-methods,too-many-in
             metadata.version = self.generate_rand_version()
         return metadata
 
-    def get_installed(self):  # pylint: disable=too-many-branches
+    def get_installed(self):
         if not os.path.isdir(self.package_dir):
             return []
 
@@ -222,15 +230,30 @@ class BasePackageManager(  # pylint: disable=too-many-public-methods,too-many-in
         if self.memcache_get(cache_key):
             return self.memcache_get(cache_key)
 
+        result = self._load_installed_index()
+        if result is None:
+            result = self._scan_installed()
+
+        self.memcache_set(cache_key, result)
+        return result
+
+    def _scan_installed(self):
+        # read before listing, so the changes made while scanning are not lost
+        package_dir_mtime = os.stat(self.package_dir).st_mtime_ns
+        latest_mtime = package_dir_mtime
         result = []
+        index_items = []
         for name in sorted(os.listdir(self.package_dir)):
             if name.startswith("_tmp_installing"):  # legacy tmp folder
                 continue
             pkg = None
             path = os.path.join(self.package_dir, name)
+            is_link = self.is_symlink(path)
             if os.path.isdir(path):
                 pkg = PackageItem(path)
-            elif self.is_symlink(path):
+            elif is_link:
+                # a linked package may be changed outside, resolve it every time
+                index_items.append(dict(name=name, link=True))
                 pkg = self.get_symlinked_package(path)
             if not pkg:
                 continue
@@ -242,19 +265,119 @@ class BasePackageManager(  # pylint: disable=too-many-public-methods,too-many-in
                     pass
             if not pkg.metadata:
                 continue
+            system = None
             if self.pkg_type == PackageType.TOOL:
                 try:
-                    if not self.is_system_compatible(
-                        self.load_manifest(pkg).get("system")
-                    ):
-                        continue
+                    system = self.load_manifest(pkg).get("system")
                 except MissingPackageManifestError:
                     pass
+            if not is_link:
+                stamp = self._get_installed_index_stamp(path)
+                latest_mtime = max([latest_mtime] + [item[1] for item in stamp])
+                index_items.append(
+                    dict(
+                        name=name,
+                        metadata=pkg.metadata.as_dict(),
+                        system=system,
+                        stamp=stamp,
+                    )
+                )
+            if not self.is_system_compatible(system):
+                continue
             result.append(pkg)
 
-        self.memcache_set(cache_key, result)
+        self._save_installed_index(package_dir_mtime, latest_mtime, index_items)
         return result
 
+    def get_installed_index_path(self):
+        # keep the index out of the package directory, it may be a source tree
+        return os.path.join(
+            get_project_cache_dir(),
+            "installed",
+            "%s.json"
+            % hashlib.sha1(
+                hashlib_encode_data(os.path.abspath(self.package_dir))
+            ).hexdigest(),
+        )
+
+    def _get_installed_index_stamp(self, pkg_dir):
+        # the metadata of a package is built from these files
+        result = []
+        for name in [PackageItem.METAFILE_NAME] + list(self.manifest_names):
+            try:
+                stat = os.stat(os.path.join(pkg_dir, name))
+            except OSError:
+                continue
+            result.append([name, stat.st_mtime_ns, stat.st_size])
+        return result
+
+    def reset_installed_index(self):
+        path = self.get_installed_index_path()
+        if os.path.isfile(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _load_installed_index(self):
+        path = self.get_installed_index_path()
+        if not os.path.isfile(path):
+            return None
+        try:
+            data = fs.load_json(path)
+            if (
+                data.get("version") != self.INSTALLED_INDEX_VERSION
+                or data.get("type") != self.pkg_type
+                or data.get("mtime") != os.stat(self.package_dir).st_mtime_ns
+            ):
+                return None
+            result = []
+            for item in data["items"]:
+                path = os.path.join(self.package_dir, item["name"])
+                if item.get("link"):
+                    pkg = (
+                        self.get_symlinked_package(path)
+                        if self.is_symlink(path)
+                        else None
+                    )
+                    if pkg and pkg.metadata:
+                        result.append(pkg)
+                    continue
+                if item["stamp"] != self._get_installed_index_stamp(path):
+                    return None
+                if not self.is_system_compatible(item.get("system")):
+                    continue
+                result.append(
+                    PackageItem(path, PackageMetadata.from_dict(item["metadata"]))
+                )
+            return result
+        except Exception:  # pylint: disable=broad-except
+            return None
+
+    def _save_installed_index(self, package_dir_mtime, latest_mtime, items):
+        # a file modified within this window may be modified again
+        # without a visible change of its mtime
+        if time.time() - latest_mtime / 1e9 < self.INSTALLED_INDEX_RACY_WINDOW:
+            return
+        path = self.get_installed_index_path()
+        tmp_path = "%s.%d.tmp" % (path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, mode="w", encoding="utf8") as fp:
+                json.dump(
+                    dict(
+                        version=self.INSTALLED_INDEX_VERSION,
+                        type=self.pkg_type,
+                        mtime=package_dir_mtime,
+                        items=items,
+                    ),
+                    fp,
+                )
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+
     def get_package(self, spec):
         if isinstance(spec, PackageItem):
             return spec
@@ -34,6 +34,9 @@ class LibraryPackageManager(BasePackageManager):  # pylint: disable=too-many-anc
     def manifest_names(self):
         return PackageType.get_manifest_map()[PackageType.LIBRARY]
 
+    def get_package_store_mode(self):
+        return ProjectConfig.get_instance().get("platformio", "package_store")
+
     def find_pkg_root(self, path, spec):
         try:
             return super().find_pkg_root(path, spec)
@@ -89,6 +92,16 @@ class LibraryPackageManager(BasePackageManager):  # pylint: disable=too-many-anc
             return super().install_dependency(dependency)
         return None
 
+    def _get_dependency_plan_items(self, pkg):
+        # skip built-in dependencies
+        return [
+            item
+            for item in super()._get_dependency_plan_items(pkg)
+            if item.spec.external
+            or item.spec.owner
+            or not self.is_builtin_lib(item.spec.name)
+        ]
+
     @staticmethod
     @util.memoized(expire="60s")
     def get_builtin_libs(storage_names=None):
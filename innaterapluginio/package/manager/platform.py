@@ -44,11 +44,11 @@ class PlatformPackageManager(
         return PackageType.get_manifest_map()[PackageType.PLATFORM]
 
     @staticmethod
-    def unpack(src, dst):
-        with_progress = not app.is_disabled_progressbar()
+    def unpack(src, dst, silent=False):
+        with_progress = not app.is_disabled_progressbar() and not silent
         try:
             with FileUnpacker(src) as fu:
-                return fu.unpack(dst, with_progress=with_progress)
+                return fu.unpack(dst, with_progress=with_progress, silent=silent)
         except IOError as exc:
             if not with_progress:
                 raise exc
@@ -69,6 +69,8 @@ class PlatformPackageManager(
             p = PlatformFactory.new(pkg)
             # set logging level for underlying tool manager
             p.pm.set_log_level(self.log.getEffectiveLevel())
+            # tool packages are locked together with the platform
+            p.pm.package_lock = self.package_lock
             p.ensure_engine_compatible()
         except IncompatiblePlatform as exc:
             super().uninstall(pkg, skip_dependencies=True)
@@ -0,0 +1,250 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+
+from innaterapluginio import fs
+from innaterapluginio.package.lockfile import LockFile
+from innaterapluginio.package.meta import PackageItem
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+# ioctl(2) request to share the extents of a file (Btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+STORE_MODES = ("copy", "auto", "reflink", "hardlink", "symlink")
+READ_ONLY_MASK = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+
+
+class PackageStore:
+    """Content-addressed storage of package trees shared across projects.
+
+    A package is kept once per content and is materialized into package
+    directories by reflinks, hard links or symbolic links. The files in
+    the store are read-only. Every entry records the directories which
+    reference it, an entry without existing references is removed by
+    `prune()`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def compute_key(pkg_dir):
+        tree_hash = hashlib.sha256()
+        for root, dirs, files in os.walk(pkg_dir):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                relpath = os.path.relpath(path, pkg_dir).replace(os.sep, "/")
+                if relpath == PackageItem.METAFILE_NAME:
+                    continue  # metadata is specific to every installation
+                if os.path.islink(path):
+                    entry = "L:%s:%s" % (relpath, os.readlink(path))
+                else:
+                    entry = "F:%s:%d:%s" % (
+                        relpath,
+                        os.stat(path).st_mode & stat.S_IXUSR,
+                        fs.calculate_file_hashsum("sha256", path),
+                    )
+                tree_hash.update(entry.encode("utf-8") + b"\0")
+        return tree_hash.hexdigest()
+
+    def get_entry_dir(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def get_refs_path(self, key):
+        return self.get_entry_dir(key) + ".json"
+
+    def add(self, pkg_dir):
+        """Copy a package tree to the store unless the same content exists."""
+        key = self.compute_key(pkg_dir)
+        entry_dir = self.get_entry_dir(key)
+        if os.path.isdir(entry_dir):
+            return key
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        tmp_dir = "%s.%d.tmp" % (entry_dir, os.getpid())
+        if os.path.isdir(tmp_dir):
+            fs.rmtree(tmp_dir)
+        shutil.copytree(
+            pkg_dir,
+            tmp_dir,
+            symlinks=True,
+            ignore=lambda src, names: (
+                [PackageItem.METAFILE_NAME] if src == pkg_dir else []
+            ),
+        )
+        for root, _, files in os.walk(tmp_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                if not os.path.islink(path):
+                    mode = os.stat(path).st_mode
+                    os.chmod(path, mode & ~READ_ONLY_MASK)
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # added by a concurrent process
+            fs.rmtree(tmp_dir)
+            if not os.path.isdir(entry_dir):
+                raise
+        return key
+
+    def materialize(self, key, pkg, mode="auto"):
+        """Create a package directory with the files of a store entry.
+
+        Directories are always created, files are linked according to
+        `mode`. Falls back to copying if the links are not supported by
+        a file system. The metadata file of `pkg` is copied as well.
+        """
+        assert mode in STORE_MODES
+        src_dir = self.get_entry_dir(key)
+        dst_dir = pkg.path
+        methods = {
+            "copy": [_copy_file],
+            "auto": [_reflink_file, _hardlink_file, _copy_file],
+            "reflink": [_reflink_file, _copy_file],
+            "hardlink": [_hardlink_file, _copy_file],
+            "symlink": [_symlink_file, _copy_file],
+        }[mode]
+        for root, dirs, files in os.walk(src_dir):
+            relroot = os.path.relpath(root, src_dir)
+            dst_root = os.path.normpath(os.path.join(dst_dir, relroot))
+            os.makedirs(dst_root, exist_ok=True)
+            for name in dirs:
+                src = os.path.join(root, name)
+                if os.path.islink(src):
+                    os.symlink(os.readlink(src), os.path.join(dst_root, name))
+            for name in files:
+                src = os.path.join(root, name)
+                dst = os.path.join(dst_root, name)
+                if os.path.islink(src):
+                    os.symlink(os.readlink(src), dst)
+                    continue
+                while True:
+                    try:
+                        methods[0](src, dst)
+                        break
+                    except OSError:
+                        if len(methods) == 1:
+                            raise
+                        # not supported, do not try it for the next files
+                        methods = methods[1:]
+                        if os.path.lexists(dst):
+                            os.remove(dst)
+        pkg.dump_meta()
+        self.add_ref(key, pkg)
+        return pkg
+
+    def load_refs(self, key):
+        path = self.get_refs_path(key)
+        if not os.path.isfile(path):
+            return {}
+        try:
+            return fs.load_json(path).get("refs") or {}
+        except Exception:  # pylint: disable=broad-except
+            return {}
+
+    def save_refs(self, key, refs):
+        path = self.get_refs_path(key)
+        tmp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp_path, mode="w", encoding="utf8") as fp:
+            json.dump(dict(refs=refs), fp)
+        os.replace(tmp_path, path)
+
+    def add_ref(self, key, pkg):
+        with LockFile(self.get_refs_path(key)):
+            refs = self.load_refs(key)
+            refs[os.path.abspath(pkg.path)] = self._get_ref_id(pkg)
+            self.save_refs(key, refs)
+
+    @staticmethod
+    def _get_ref_id(pkg):
+        return "%s@%s" % (pkg.metadata.name, pkg.metadata.version)
+
+    def get_live_refs(self, key):
+        """References which still contain the same package.
+
+        A package directory could be removed or reused by another package.
+        """
+        result = {}
+        for path, ref_id in self.load_refs(key).items():
+            pkg = PackageItem(path) if os.path.isdir(path) else None
+            if pkg and pkg.metadata and self._get_ref_id(pkg) == ref_id:
+                result[path] = ref_id
+        return result
+
+    def iter_keys(self):
+        if not os.path.isdir(self.path):
+            return
+        for prefix in sorted(os.listdir(self.path)):
+            prefix_dir = os.path.join(self.path, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in sorted(os.listdir(prefix_dir)):
+                if os.path.isdir(os.path.join(prefix_dir, name)) and "." not in name:
+                    yield name
+
+    def prune(self, dry_run=False):
+        """Remove the entries without live references.
+
+        Returns a list of `(key, size)` items.
+        """
+        result = []
+        for key in self.iter_keys():
+            with LockFile(self.get_refs_path(key)):
+                refs = self.get_live_refs(key)
+                if refs:
+                    if not dry_run:
+                        self.save_refs(key, refs)
+                    continue
+                entry_dir = self.get_entry_dir(key)
+                result.append((key, fs.calculate_folder_size(entry_dir)))
+                if dry_run:
+                    continue
+                fs.rmtree(entry_dir)
+                if os.path.isfile(self.get_refs_path(key)):
+                    os.remove(self.get_refs_path(key))
+            try:
+                os.rmdir(os.path.dirname(self.get_entry_dir(key)))
+            except OSError:  # not empty
+                pass
+        return result
+
+
+def _copy_file(src, dst):
+    shutil.copy2(src, dst)
+    # a copy is owned by a package directory, allow modifications
+    os.chmod(dst, os.stat(dst).st_mode | stat.S_IWUSR)
+
+
+def _reflink_file(src, dst):
+    if not fcntl:
+        raise OSError("Reflinks are not supported")
+    with open(src, "rb") as src_fp, open(dst, "wb") as dst_fp:
+        fcntl.ioctl(dst_fp.fileno(), FICLONE, src_fp.fileno())
+    shutil.copystat(src, dst)
+    os.chmod(dst, os.stat(dst).st_mode | stat.S_IWUSR)
+
+
+def _hardlink_file(src, dst):
+    os.link(src, dst)
+
+
+def _symlink_file(src, dst):
+    os.symlink(src, dst)
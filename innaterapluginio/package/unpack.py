@@ -11,7 +11,11 @@
 # limitations under the License.
 
 import os
+import queue
 import sys
+import tarfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tarfile import open as tarfile_open
 from time import mktime
 from zipfile import ZipFile
@@ -22,6 +26,12 @@ from innaterapluginio import fs
 from innaterapluginio.compat import is_terminal
 from innaterapluginio.package.exception import PackageException
 
+MAGIC_SIZE = 6
+# archives with fewer items are extracted sequentially
+PARALLEL_MIN_ITEMS = 256
+# larger TAR members are extracted by a decompressor thread itself
+PIPELINE_MAX_ITEM_SIZE = 1024 * 1024
+
 
 class ExtractArchiveItemError(PackageException):
     MESSAGE = (
@@ -47,6 +57,16 @@ class BaseArchiver:
         self._afo.extract(item, dest_dir)
         self.after_extract(item, dest_dir)
 
+    def iter_extract(self, items, dest_dir, jobs=1):  # pylint: disable=unused-argument
+        """Extract items and yield them once they are on disk.
+
+        Archivers that support concurrent extraction use `jobs` workers,
+        so the items may be yielded out of order.
+        """
+        for item in items:
+            self.extract_item(item, dest_dir)
+            yield item
+
     def after_extract(self, item, dest_dir):
         pass
 
@@ -55,12 +75,20 @@ class BaseArchiver:
 
 
 class TARArchiver(BaseArchiver):
-    def __init__(self, archpath):
-        super().__init__(tarfile_open(archpath))  # pylint: disable=consider-using-with
+    def __init__(self, archpath=None, fileobj=None):
+        # a stream is read only once, members are extracted in archive order
+        super().__init__(
+            tarfile_open(  # pylint: disable=consider-using-with
+                archpath, mode="r|*" if fileobj else "r", fileobj=fileobj
+            )
+        )
 
     def get_items(self):
         return self._afo.getmembers()
 
+    def iter_items(self):
+        return iter(self._afo)
+
     def get_item_filename(self, item):
         return item.name
 
@@ -80,6 +108,117 @@ class TARArchiver(BaseArchiver):
             os.path.join(os.path.join(base, os.path.dirname(item.name)), item.linkname)
         ).startswith(base)
 
+    def iter_extract(self, items, dest_dir, jobs=1):
+        """Extract items in a pipeline.
+
+        A decompressor thread reads members in archive order and passes
+        the content of small regular files to `jobs` writer threads. Other
+        members are extracted by the decompressor, links are extracted
+        at the end when their targets exist.
+        """
+        if jobs < 2:
+            yield from super().iter_extract(items, dest_dir)
+            return
+        dest_dir = self.resolve_path(dest_dir)
+        pending = queue.Queue(maxsize=jobs * 4)
+        results = queue.Queue()
+        deferred = []
+        stopped = threading.Event()
+
+        def _decompress():
+            try:
+                for item in items:
+                    if stopped.is_set():
+                        break
+                    if self.is_link(item):
+                        deferred.append(item)
+                    elif (
+                        item.isreg()
+                        and item.size <= PIPELINE_MAX_ITEM_SIZE
+                        and not self.is_bad_path(item.name, dest_dir)
+                    ):
+                        with self._afo.extractfile(item) as fp:
+                            pending.put((item, fp.read()))
+                    else:
+                        # directories, large files and blocked items
+                        self.extract_item(item, dest_dir)
+                        results.put((item, None))
+            except Exception as exc:  # pylint: disable=broad-except
+                results.put((None, exc))
+            finally:
+                for _ in range(jobs):
+                    pending.put(None)
+
+        def _write():
+            while True:
+                task = pending.get()
+                if task is None:
+                    return
+                if stopped.is_set():
+                    continue
+                try:
+                    self._write_item(task[0], task[1], dest_dir)
+                    results.put((task[0], None))
+                except Exception as exc:  # pylint: disable=broad-except
+                    results.put((None, exc))
+
+        threads = [threading.Thread(target=_decompress, daemon=True)] + [
+            threading.Thread(target=_write, daemon=True) for _ in range(jobs)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                # checked before waiting, so the results which have been
+                # put by the last finished thread are still drained
+                alive = any(thread.is_alive() for thread in threads)
+                try:
+                    item, exc = results.get(timeout=0.1)
+                except queue.Empty:
+                    if not alive:
+                        break
+                    continue
+                if exc:
+                    raise exc
+                yield item
+        finally:
+            stopped.set()
+            for thread in threads:
+                thread.join()
+
+        for item in deferred:
+            self.extract_item(item, dest_dir)
+            yield item
+
+    def check_stream_end(self):
+        """Raise an error if a compressed stream has been truncated.
+
+        A truncated stream could end on a member boundary, which looks like
+        the end of an archive for `tarfile`.
+        """
+        stream = self._afo.fileobj
+        decompressor = getattr(stream, "cmp", None)
+        if not hasattr(decompressor, "eof"):
+            return
+        # the end-of-archive blocks and the padding of a record
+        while stream.read(tarfile.RECORDSIZE):
+            pass
+        if not decompressor.eof:
+            raise tarfile.ReadError("unexpected end of data")
+
+    def _write_item(self, item, data, dest_dir):
+        if sys.version_info >= (3, 12):
+            item = tarfile.data_filter(item, dest_dir)
+        path = os.path.join(dest_dir, item.name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.islink(path):
+            os.remove(path)
+        with open(path, "wb") as fp:
+            fp.write(data)
+        if item.mode is not None:
+            os.chmod(path, item.mode)
+        os.utime(path, (item.mtime, item.mtime))
+
     def extract_item(self, item, dest_dir):
         if sys.version_info >= (3, 12):
             self._afo.extract(item, dest_dir, filter="data")
@@ -103,6 +242,45 @@ class TARArchiver(BaseArchiver):
 class ZIPArchiver(BaseArchiver):
     def __init__(self, archpath):
         super().__init__(ZipFile(archpath))  # pylint: disable=consider-using-with
+        self._archpath = archpath
+
+    def iter_extract(self, items, dest_dir, jobs=1):
+        """Extract items by a pool of `jobs` workers.
+
+        Every worker reads the archive with own file object, so members
+        are decompressed and written concurrently.
+        """
+        if jobs < 2:
+            yield from super().iter_extract(items, dest_dir)
+            return
+        local = threading.local()
+        opened = []
+
+        def _extract(item):
+            if not hasattr(local, "afo"):
+                # pylint: disable=consider-using-with
+                local.afo = ZipFile(self._archpath)
+                opened.append(local.afo)
+            try:
+                local.afo.extract(item, dest_dir)
+            except FileExistsError:
+                # a parent directory has been created by another worker
+                local.afo.extract(item, dest_dir)
+            self.after_extract(item, dest_dir)
+            return item
+
+        try:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                futures = [executor.submit(_extract, item) for item in items]
+                try:
+                    for future in as_completed(futures):
+                        yield future.result()
+                finally:
+                    for future in futures:
+                        future.cancel()
+        finally:
+            for afo in opened:
+                afo.close()
 
     @staticmethod
     def preserve_permissions(item, dest_dir):
@@ -133,8 +311,11 @@ class ZIPArchiver(BaseArchiver):
 
 
 class FileUnpacker:
-    def __init__(self, path):
+    JOBS = min(8, os.cpu_count() or 1)
+
+    def __init__(self, path, jobs=None):
         self.path = path
+        self.jobs = jobs or self.JOBS
         self._archiver = None
 
     def __enter__(self):
@@ -146,20 +327,25 @@ class FileUnpacker:
             self._archiver.close()
 
     @staticmethod
-    def new_archiver(path):
+    def detect_archiver(data):
         magic_map = {
             b"\x1f\x8b\x08": TARArchiver,
             b"\x42\x5a\x68": TARArchiver,
             b"\x50\x4b\x03\x04": ZIPArchiver,
             b"\xfd\x37\x7a\x58\x5a\x00": TARArchiver,
         }
-        magic_len = max(len(k) for k in magic_map)
+        for magic, archiver in magic_map.items():
+            if data.startswith(magic):
+                return archiver
+        return None
+
+    @staticmethod
+    def new_archiver(path):
         with open(path, "rb") as fp:
-            data = fp.read(magic_len)
-            for magic, archiver in magic_map.items():
-                if data.startswith(magic):
-                    return archiver(path)
-        raise PackageException("Unknown archive type '%s'" % path)
+            archiver = FileUnpacker.detect_archiver(fp.read(MAGIC_SIZE))
+        if not archiver:
+            raise PackageException("Unknown archive type '%s'" % path)
+        return archiver(path)
 
     def unpack(
         self, dest_dir=None, with_progress=True, check_unpacked=True, silent=False
@@ -170,18 +356,20 @@ class FileUnpacker:
         if not dest_dir:
             dest_dir = os.getcwd()
 
+        jobs = self.jobs if len(items) >= PARALLEL_MIN_ITEMS else 1
+        extracted = self._archiver.iter_extract(items, dest_dir, jobs)
+
         if not with_progress or silent:
             if not silent:
                 click.echo(f"{label}...")
-            for item in items:
-                self._archiver.extract_item(item, dest_dir)
+            for _ in extracted:
+                pass
         elif not is_terminal():
             click.echo(f"{label} 0%", nl=False)
             print_percent_step = 10
             printed_percents = 0
             unpacked_nums = 0
-            for item in items:
-                self._archiver.extract_item(item, dest_dir)
+            for _ in extracted:
                 unpacked_nums += 1
                 if (unpacked_nums / len(items) * 100) >= (
                     printed_percents + print_percent_step
@@ -191,23 +379,56 @@ class FileUnpacker:
             click.echo("")
         else:
             with click.progressbar(
-                items,
+                length=len(items),
                 label=label,
                 update_min_steps=min(50, len(items) / 100),  # every 50 files or less
             ) as pb:
-                for item in pb:
-                    self._archiver.extract_item(item, dest_dir)
+                for _ in extracted:
+                    pb.update(1)
 
         if not check_unpacked:
             return True
+        check_unpacked_items(self._archiver, self._archiver.get_items(), dest_dir)
+        return True
 
-        # check on disk
-        for item in self._archiver.get_items():
-            filename = self._archiver.get_item_filename(item)
-            item_path = os.path.join(dest_dir, filename)
-            try:
-                if not self._archiver.is_link(item) and not os.path.exists(item_path):
-                    raise ExtractArchiveItemError(filename, dest_dir)
-            except NotImplementedError:
-                pass
+
+class StreamUnpacker:
+    """Unpack a TAR archive while it is being read from a stream.
+
+    ZIP archives keep the list of items at the end of a file and require
+    a seekable file object, use `FileUnpacker` for them.
+    """
+
+    def __init__(self, fileobj, jobs=None):
+        self.fileobj = fileobj
+        self.jobs = jobs or FileUnpacker.JOBS
+
+    @staticmethod
+    def is_supported(data):
+        return FileUnpacker.detect_archiver(data) is TARArchiver
+
+    def unpack(self, dest_dir, check_unpacked=True):
+        archiver = TARArchiver(fileobj=self.fileobj)
+        items = []
+        try:
+            for item in archiver.iter_extract(
+                archiver.iter_items(), dest_dir, self.jobs
+            ):
+                items.append(item)
+            archiver.check_stream_end()
+        finally:
+            archiver.close()
+        if check_unpacked:
+            check_unpacked_items(archiver, items, dest_dir)
         return True
+
+
+def check_unpacked_items(archiver, items, dest_dir):
+    for item in items:
+        filename = archiver.get_item_filename(item)
+        item_path = os.path.join(dest_dir, filename)
+        try:
+            if not archiver.is_link(item) and not os.path.exists(item_path):
+                raise ExtractArchiveItemError(filename, dest_dir)
+        except NotImplementedError:
+            pass
@@ -68,10 +68,14 @@ class PlatformPackagesMixin:
         return self.pm.install(spec or self.get_package_spec(name), force=force)
 
     def install_required_packages(self, force=False):
-        for name, options in self.packages.items():
-            if options.get("optional"):
-                continue
-            self.install_package(name, force=force)
+        self.pm.install_many(
+            [
+                self.get_package_spec(name)
+                for name, options in self.packages.items()
+                if not options.get("optional")
+            ],
+            force=force,
+        )
 
     def uninstall_packages(self):
         for pkg in self.get_installed_packages():
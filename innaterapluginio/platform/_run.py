@@ -19,11 +19,13 @@ from urllib.parse import quote
 
 import click
 
-from innaterapluginio import app, fs, proc, telemetry
+from innaterapluginio import app, exception, fs, proc, telemetry
 from innaterapluginio.compat import hashlib_encode_data
 from innaterapluginio.package.manager.core import get_core_package_dir
 from innaterapluginio.platform.exception import BuildScriptNotFound
 from innaterapluginio.run.helpers import KNOWN_CLEAN_TARGETS, KNOWN_FULLCLEAN_TARGETS
+from innaterapluginio.run.server import BuildServerClient, is_build_server_enabled
+from innaterapluginio.run.snapshot import BuildSnapshot
 
 
 class PlatformRunMixin:
@@ -59,10 +61,27 @@ class PlatformRunMixin:
             raise BuildScriptNotFound(variables["build_script"])
 
         telemetry.log_platform_run(self, self.config, variables["pioenv"], targets)
+
+        snapshot = None
+        if BuildSnapshot.is_applicable(self, variables, targets):
+            snapshot = BuildSnapshot(self, variables, targets)
+            if snapshot.is_up_to_date():
+                if not self.silent:
+                    click.secho(
+                        "Nothing changed since the last successful build, "
+                        "skipping (fast no-op)",
+                        fg="green",
+                    )
+                return {"out": None, "err": None, "returncode": 0}
+            snapshot.delete()
+
         result = self._run_scons(variables, targets, jobs)
 
         assert "returncode" in result
 
+        if snapshot and result["returncode"] == 0:
+            snapshot.save()
+
         return result
 
     def _run_scons(self, variables, targets, jobs):
@@ -110,8 +129,9 @@ class PlatformRunMixin:
                 except IOError:
                     pass
 
-            return proc.exec_command(
+            return self._exec_scons(
                 args,
+                variables,
                 stdout=proc.BuildAsyncPipe(
                     line_callback=self._on_stdout_line,
                     data_callback=lambda data: (
@@ -124,12 +144,35 @@ class PlatformRunMixin:
                 ),
             )
 
-        return proc.exec_command(
+        return self._exec_scons(
             args,
+            variables,
             stdout=proc.LineBufferedAsyncPipe(line_callback=self._on_stdout_line),
             stderr=proc.LineBufferedAsyncPipe(line_callback=self._on_stderr_line),
         )
 
+    @staticmethod
+    def _exec_scons(args, variables, stdout, stderr):
+        if not is_build_server_enabled():
+            return proc.exec_command(args, stdout=stdout, stderr=stderr)
+        client = BuildServerClient()
+        try:
+            returncode = client.run(args[1], args[2:], variables, stdout, stderr)
+        except KeyboardInterrupt as exc:
+            stdout.close()
+            stderr.close()
+            raise exception.AbortedByUser() from exc
+        if returncode is None:
+            # start a server for the next builds
+            if not client.is_running():
+                client.spawn_server()
+            return proc.exec_command(args, stdout=stdout, stderr=stderr)
+        result = {"returncode": returncode}
+        for name, pipe in (("out", stdout), ("err", stderr)):
+            pipe.close()
+            result[name] = pipe.get_buffer().strip()
+        return result
+
     def _on_stdout_line(self, line):
         if "`buildprog' is up to date." in line:
             return
@@ -24,19 +24,30 @@ from innaterapluginio.project.exception import UndefinedEnvPlatformError
 
 
 class PlatformFactory:
+    _MODULES_CACHE = {}
+    # platform instances of the projects preloaded by the long-living process
+    # (build server), a forked build takes over an instance of own project
+    _INSTANCES_CACHE = {}
+
     @staticmethod
     def get_clsname(name):
         name = re.sub(r"[^\da-z\_]+", "", name, flags=re.I)
         return "%sPlatform" % name.lower().capitalize()
 
-    @staticmethod
-    def load_platform_module(name, path):
+    @classmethod
+    def load_platform_module(cls, name, path):
         # backward compatibiility with the legacy dev-platforms
         sys.modules["platformio.managers.platform"] = base
+        # reuse a module loaded by the long-living process (build server)
+        key = (name, os.path.realpath(path), os.path.getmtime(path))
+        if key in cls._MODULES_CACHE:
+            return cls._MODULES_CACHE[key]
         try:
-            return load_python_module("platformio.platform.%s" % name, path)
+            module = load_python_module("platformio.platform.%s" % name, path)
         except ImportError as exc:
             raise UnknownPlatform(name) from exc
+        cls._MODULES_CACHE[key] = module
+        return module
 
     @classmethod
     def new(cls, pkg_or_spec, autoinstall=False) -> base.PlatformBase:
@@ -89,13 +100,46 @@ class PlatformFactory:
         assert isinstance(_instance, base.PlatformBase)
         return _instance
 
+    @staticmethod
+    def _get_instance_stamp(config, platform_dir):
+        paths = [
+            config.get("platformio", "platforms_dir"),
+            os.path.join(platform_dir, "platform.json"),
+            os.path.join(platform_dir, "platform.py"),
+        ]
+        return [os.path.getmtime(path) if os.path.exists(path) else 0 for path in paths]
+
+    @classmethod
+    def preload(cls, spec):
+        """Keep a platform instance of the current project in memory."""
+        config = ProjectConfig.get_instance()
+        key = (config.path, spec)
+        item = cls._INSTANCES_CACHE.get(key)
+        if (
+            item
+            and item["platform"].config is config
+            and item["stamp"]
+            == cls._get_instance_stamp(config, item["platform"].get_dir())
+        ):
+            return item["platform"]
+        p = cls.new(spec)
+        cls._INSTANCES_CACHE[key] = dict(
+            platform=p, stamp=cls._get_instance_stamp(config, p.get_dir())
+        )
+        return p
+
     @classmethod
     def from_env(cls, env, targets=None, autoinstall=False):
         config = ProjectConfig.get_instance()
         spec = config.get(f"env:{env}", "platform", None)
         if not spec:
             raise UndefinedEnvPlatformError(env)
-        p = cls.new(spec, autoinstall=autoinstall)
+        # a preloaded instance is configured by a single build
+        item = cls._INSTANCES_CACHE.pop((config.path, spec), None)
+        if item and item["platform"].config is config:
+            p = item["platform"]
+        else:
+            p = cls.new(spec, autoinstall=autoinstall)
         p.project_env = env
         p.configure_project_packages(env, targets)
         return p
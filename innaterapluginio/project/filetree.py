@@ -0,0 +1,117 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import time
+
+from innaterapluginio import exception, fs
+
+# a directory modified within this window may be modified again without
+# a visible change of its mtime (coarse timestamps of network/FAT volumes)
+RACY_MTIME_WINDOW = 2  # seconds
+
+
+class ProjectFileTreeIndex:
+    """Persistent index of project directory trees.
+
+    For every directory the index keeps its modification time, the names
+    of files and sub-directories. Adding, removing or renaming an entry
+    updates the mtime of its parent directory, so only the directories with
+    a changed mtime are listed again, others are just checked with `stat`.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path=None):
+        self.path = path
+        self._dirs = {}
+        self._used = set()
+        self._modified = False
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.isfile(self.path):
+            return
+        try:
+            data = fs.load_json(self.path)
+        except (ValueError, UnicodeDecodeError, exception.InvalidJSONFile):
+            return
+        if isinstance(data, dict) and data.get("version") == self.VERSION:
+            self._dirs = data.get("dirs") or {}
+
+    def save(self):
+        if not self.path:
+            return
+        # drop directories that were not visited (removed from the project)
+        if set(self._dirs) != self._used:
+            self._dirs = {d: v for d, v in self._dirs.items() if d in self._used}
+            self._modified = True
+        if not self._modified:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = "%s.%d.tmp" % (self.path, os.getpid())
+            with open(tmp_path, mode="w", encoding="utf8") as fp:
+                json.dump(dict(version=self.VERSION, dirs=self._dirs), fp)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            return
+        self._modified = False
+
+    def _list_dir(self, path):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return [], []
+        self._used.add(path)
+        item = self._dirs.get(path)
+        if item and item[0] is not None and item[0] == mtime:
+            return item[1], item[2]
+
+        files = []
+        dirs = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    # the same classification as `os.walk()` does
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if not is_dir:
+                        files.append(entry.name)
+                    elif not entry.is_symlink():
+                        dirs.append(entry.name)
+        except OSError:
+            return [], []
+        files.sort()
+        dirs.sort()
+        if time.time() - mtime / 1e9 < RACY_MTIME_WINDOW:
+            mtime = None  # do not trust, list it again the next time
+        self._dirs[path] = [mtime, files, dirs]
+        self._modified = True
+        return files, dirs
+
+    def get_files(self, root, suffixes=None):
+        result = []
+        queue = [root]
+        while queue:
+            path = queue.pop()
+            files, dirs = self._list_dir(path)
+            result.extend(
+                os.path.join(path, name)
+                for name in files
+                if not suffixes or name.endswith(suffixes)
+            )
+            queue.extend(os.path.join(path, name) for name in dirs)
+        return result
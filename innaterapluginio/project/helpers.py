@@ -20,6 +20,7 @@ from click.testing import CliRunner
 from innaterapluginio import __version__, exception, fs
 from innaterapluginio.compat import IS_MACOS, IS_WINDOWS, hashlib_encode_data
 from innaterapluginio.project.config import ProjectConfig
+from innaterapluginio.project.filetree import ProjectFileTreeIndex
 
 
 def get_project_dir():
@@ -106,6 +107,12 @@ def compute_project_checksum(config):
 
     # project file structure
     check_suffixes = (".c", ".cc", ".cpp", ".h", ".hpp", ".s", ".S")
+    # keep the index outside of the build dir which is removed on changes
+    index = ProjectFileTreeIndex(
+        os.path.join(config.get("platformio", "workspace_dir"), "filetree.json")
+        if config.path
+        else None
+    )
     for d in (
         config.get("platformio", "include_dir"),
         config.get("platformio", "src_dir"),
@@ -113,18 +120,14 @@ def compute_project_checksum(config):
     ):
         if not os.path.isdir(d):
             continue
-        chunks = []
-        for root, _, files in os.walk(d):
-            for f in files:
-                path = os.path.join(root, f)
-                if path.endswith(check_suffixes):
-                    chunks.append(path)
+        chunks = index.get_files(d, check_suffixes)
         if not chunks:
             continue
         chunks_to_str = ",".join(sorted(chunks))
         if IS_WINDOWS:  # case insensitive OS
             chunks_to_str = chunks_to_str.lower()
         checksum.update(hashlib_encode_data(chunks_to_str))
+    index.save()
 
     return checksum.hexdigest()
 
@@ -180,6 +180,30 @@ ProjectOptions = OrderedDict(
                 default=os.path.join("${platformio.core_dir}", "packages"),
                 validate=validate_dir,
             ),
+            ConfigPlatformioOption(
+                group="directory",
+                name="package_store_dir",
+                description=(
+                    "A location of the package store shared by projects and "
+                    "environments, see the `package_store` option"
+                ),
+                sysenvvar="PLATFORMIO_PACKAGE_STORE_DIR",
+                default=os.path.join("${platformio.core_dir}", "store"),
+                validate=validate_dir,
+            ),
+            ConfigPlatformioOption(
+                group="directory",
+                name="package_store",
+                description=(
+                    "Keep registry libraries once in the shared package store and "
+                    "link them to the library storages by `reflink`, `hardlink` "
+                    "or `symlink`, `auto` picks the first supported method. The "
+                    "linked files are read-only. The `copy` mode disables the store"
+                ),
+                sysenvvar="PLATFORMIO_PACKAGE_STORE",
+                type=click.Choice(["copy", "auto", "reflink", "hardlink", "symlink"]),
+                default="copy",
+            ),
             ConfigPlatformioOption(
                 group="directory",
                 name="cache_dir",
@@ -203,6 +227,18 @@ ProjectOptions = OrderedDict(
                 sysenvvar="PLATFORMIO_BUILD_CACHE_DIR",
                 validate=validate_dir,
             ),
+            ConfigPlatformioOption(
+                group="directory",
+                name="build_cache_size",
+                description=(
+                    "A maximum size of the build cache in megabytes, the least "
+                    "recently used entries are evicted when the size is exceeded "
+                    "(0 = unlimited)"
+                ),
+                sysenvvar="PLATFORMIO_BUILD_CACHE_SIZE",
+                type=click.IntRange(min=0),
+                default=4096,
+            ),
             ConfigPlatformioOption(
                 group="directory",
                 name="workspace_dir",
@@ -427,6 +463,17 @@ ProjectOptions = OrderedDict(
                 buildenvvar="SRC_FILTER",
                 default="+<*> -<.git/> -<.svn/>",
             ),
+            ConfigEnvOption(
+                group="build",
+                name="build_fast_noop",
+                description=(
+                    "Skip launching the build system when the configuration, "
+                    "sources, libraries, and packages have not changed since "
+                    "the last successful build"
+                ),
+                type=click.BOOL,
+                default=False,
+            ),
             ConfigEnvOption(
                 group="build",
                 name="targets",
@@ -590,6 +637,16 @@ ProjectOptions = OrderedDict(
                 type=click.Choice(["off", "chain", "deep", "chain+", "deep+"]),
                 default="chain",
             ),
+            ConfigEnvOption(
+                group="library",
+                name="lib_ldf_parallel",
+                description=(
+                    "Scan source files of libraries in a pool of worker processes "
+                    "sized by the number of build jobs (`--jobs`)"
+                ),
+                type=click.BOOL,
+                default=False,
+            ),
             ConfigEnvOption(
                 group="library",
                 name="lib_compat_mode",
@@ -0,0 +1,149 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import threading
+
+from innaterapluginio import exception, fs, util
+from innaterapluginio.package.lockfile import LockFile
+from innaterapluginio.package.version import cast_version_to_semver
+
+LOCK_FILE_NAME = "conf.lock"
+
+
+class ProjectPackageLock:
+    """Registry packages resolved for a project environment.
+
+    Every entry maps a requested spec to the exact package version, its
+    download URL and checksum, so the next installation skips the registry
+    API. A package file built for specific systems is locked per system
+    type, a universal one is shared by all systems ("*"). The entries which
+    were not used by the last installation are dropped on `save()`, the
+    entries of other systems are kept while their spec is used.
+    """
+
+    VERSION = 2
+    ANY_SYSTEM = "*"
+
+    def __init__(self, project_dir, env):
+        self.path = os.path.join(project_dir, LOCK_FILE_NAME)
+        self.env = env
+        self.systype = util.get_systype()
+        self._locked = self.load().get(env) or {}
+        self._used = {}
+        self._thread_lock = threading.Lock()
+
+    def load(self):
+        if not os.path.isfile(self.path):
+            return {}
+        try:
+            data = fs.load_json(self.path)
+        except (ValueError, UnicodeDecodeError, exception.InvalidJSONFile):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return {}
+        return data.get("envs") or {}
+
+    def save(self):
+        with LockFile(self.path):
+            envs = self.load()
+            used = self._merge_other_systems(envs.get(self.env) or {})
+            if envs.get(self.env, {}) == used:
+                return
+            if used:
+                envs[self.env] = used
+            else:
+                envs.pop(self.env, None)
+            if not envs:
+                if os.path.isfile(self.path):
+                    os.remove(self.path)
+                return
+            tmp_path = "%s.%d.tmp" % (self.path, os.getpid())
+            with open(tmp_path, mode="w", encoding="utf8") as fp:
+                json.dump(
+                    dict(version=self.VERSION, envs=envs), fp, indent=2, sort_keys=True
+                )
+                fp.write("\n")
+            os.replace(tmp_path, self.path)
+
+    def _merge_other_systems(self, locked):
+        result = {}
+        for pkg_type, items in self._used.items():
+            for key, systems in items.items():
+                systems = dict(systems)
+                used = systems.get(self.systype)
+                for system, entry in locked.get(pkg_type, {}).get(key, {}).items():
+                    # the other systems are kept while they lock the same version
+                    if (
+                        used
+                        and system != self.ANY_SYSTEM
+                        and entry["version"] == used["version"]
+                    ):
+                        systems.setdefault(system, entry)
+                result.setdefault(pkg_type, {})[key] = systems
+        return result
+
+    @staticmethod
+    def _get_key(spec):
+        return spec.humanize()
+
+    def _get_system_key(self, entry):
+        system = entry.get("system")
+        return self.ANY_SYSTEM if not system or "*" in system else self.systype
+
+    def _find(self, pkg_type, key):
+        # the caller holds `_thread_lock`
+        for items in (self._used, self._locked):
+            systems = items.get(pkg_type, {}).get(key, {})
+            entry = systems.get(self.systype) or systems.get(self.ANY_SYSTEM)
+            if entry:
+                return entry
+        return None
+
+    def _use(self, pkg_type, key, entry):
+        # the caller holds `_thread_lock`
+        systems = self._used.setdefault(pkg_type, {}).setdefault(key, {})
+        systems.clear()
+        systems[self._get_system_key(entry)] = entry
+
+    def get(self, pkg_type, spec):
+        """Return an entry locked for the current system."""
+        key = self._get_key(spec)
+        with self._thread_lock:
+            entry = self._find(pkg_type, key)
+            if entry:
+                self._use(pkg_type, key, entry)
+            return entry
+
+    def get_version(self, pkg_type, spec):
+        """Return a version locked for the other systems, if any."""
+        systems = self._locked.get(pkg_type, {}).get(self._get_key(spec), {})
+        return next((entry["version"] for entry in systems.values()), None)
+
+    def set(self, pkg_type, spec, entry):
+        with self._thread_lock:
+            self._use(pkg_type, self._get_key(spec), entry)
+
+    def keep(self, pkg_type, spec, pkg):
+        """Keep an entry of the installed package if it is still actual."""
+        key = self._get_key(spec)
+        with self._thread_lock:
+            entry = self._find(pkg_type, key)
+            if (
+                not entry
+                or not pkg.metadata
+                or cast_version_to_semver(entry["version"]) != pkg.metadata.version
+            ):
+                return False
+            self._use(pkg_type, key, entry)
+            return True
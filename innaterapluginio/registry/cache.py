@@ -0,0 +1,129 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import time
+
+from innaterapluginio import app, fs
+from innaterapluginio.project.helpers import get_project_cache_dir
+
+TIME_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class RegistryMetadataCache:
+    """Registry API responses with their validators.
+
+    A fresh entry answers a query without the network. An expired entry
+    is revalidated with a conditional request (`If-None-Match` and
+    `If-Modified-Since` headers), so unchanged metadata is not transferred
+    again. Entries live within the "http" content cache and are removed
+    together with it.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.path.join(
+            get_project_cache_dir(), "http", "registry"
+        )
+
+    @staticmethod
+    def key_from_request(path, params=None, account=None):
+        """`account` identifies the account of an authorized request."""
+        return hashlib.sha1(
+            json.dumps([path, params, account], sort_keys=True).encode()
+        ).hexdigest()
+
+    @staticmethod
+    def get_account_identity():
+        """The username of the logged-in account or a hash of its token.
+
+        Authorized responses differ between accounts (private packages),
+        so they are never shared.
+        """
+        token = os.environ.get("PLATFORMIO_AUTH_TOKEN")
+        if not token:
+            account = app.get_state_item("account") or {}
+            if account.get("username"):
+                return "user:%s" % account["username"]
+            token = (account.get("auth") or {}).get("refresh_token")
+        if not token:
+            return "anonymous"
+        return "token:%s" % hashlib.sha1(token.encode()).hexdigest()
+
+    def get_entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key):
+        if not app.get_setting("enable_cache"):
+            return None
+        path = self.get_entry_path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            entry = fs.load_json(path)
+        except Exception:  # pylint: disable=broad-except
+            return None
+        return entry if isinstance(entry, dict) and "data" in entry else None
+
+    @staticmethod
+    def is_fresh(entry):
+        return entry.get("expires", 0) > time.time()
+
+    @staticmethod
+    def get_validators(entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def set(self, key, data, headers, valid):
+        """Store a response body with the `ETag`/`Last-Modified` headers."""
+        return self._save(
+            key,
+            dict(
+                data=data,
+                etag=headers.get("ETag"),
+                last_modified=headers.get("Last-Modified"),
+            ),
+            valid,
+        )
+
+    def touch(self, key, entry, valid):
+        """Extend the lifetime of a revalidated entry."""
+        return self._save(key, entry, valid)
+
+    def _save(self, key, entry, valid):
+        if not app.get_setting("enable_cache"):
+            return False
+        assert valid.endswith(tuple(TIME_UNITS))
+        entry = dict(
+            entry, expires=int(time.time() + TIME_UNITS[valid[-1]] * int(valid[:-1]))
+        )
+        path = self.get_entry_path(key)
+        tmp_path = "%s.%d.tmp" % (path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, mode="w", encoding="utf8") as fp:
+                json.dump(entry, fp)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError):
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+            return False
+        return True
+
+    def clean(self):
+        if os.path.isdir(self.cache_dir):
+            fs.rmtree(self.cache_dir)
@@ -15,6 +15,10 @@
 from innaterapluginio import __registry_mirror_hosts__, fs
 from innaterapluginio.account.client import AccountClient, AccountError
 from innaterapluginio.http import HTTPClient, HTTPClientError
+from innaterapluginio.registry.cache import RegistryMetadataCache
+
+# metadata younger than this is used without revalidation
+METADATA_CACHE_VALID = "1h"
 
 
 class RegistryClient(HTTPClient):
@@ -40,6 +44,34 @@ class RegistryClient(HTTPClient):
             pass
         return False
 
+    def fetch_metadata(self, path, params=None, x_with_authorization=False):
+        """Fetch JSON metadata using `RegistryMetadataCache`.
+
+        A fresh cached response does not require the Internet connection.
+        """
+        cache = RegistryMetadataCache()
+        cache_key = cache.key_from_request(
+            path,
+            params,
+            cache.get_account_identity() if x_with_authorization else None,
+        )
+        entry = cache.get(cache_key)
+        if entry and cache.is_fresh(entry):
+            return entry["data"]
+        response = self.send_request(
+            "get",
+            path,
+            params=params,
+            headers=cache.get_validators(entry) if entry else {},
+            x_with_authorization=x_with_authorization,
+        )
+        if entry and response.status_code == 304:
+            cache.touch(cache_key, entry, METADATA_CACHE_VALID)
+            return entry["data"]
+        data = self._parse_json_response(response)
+        cache.set(cache_key, data, response.headers, METADATA_CACHE_VALID)
+        return data
+
     def publish_package(  # pylint: disable=redefined-builtin
         self, owner, type, archive_path, released_at=None, private=False, notify=True
     ):
@@ -132,18 +164,15 @@ class RegistryClient(HTTPClient):
             params["page"] = int(page)
         if sort:
             params["sort"] = sort
-        return self.fetch_json_data(
-            "get",
+        return self.fetch_metadata(
             "/v3/search",
             params=params,
-            x_cache_valid="1h",
             x_with_authorization=self.allowed_private_packages(),
         )
 
     def get_package(self, typex, owner, name, version=None, extra_path=None):
         try:
-            return self.fetch_json_data(
-                "get",
+            return self.fetch_metadata(
                 "/v3/packages/{owner}/{type}/{name}{extra_path}".format(
                     type=typex,
                     owner=owner.lower(),
@@ -151,7 +180,6 @@ class RegistryClient(HTTPClient):
                     extra_path=extra_path or "",
                 ),
                 params=dict(version=version) if version else None,
-                x_cache_valid="1h",
                 x_with_authorization=self.allowed_private_packages(),
             )
         except HTTPClientError as exc:
@@ -13,13 +13,16 @@
 import operator
 import os
 import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from multiprocessing import cpu_count
 from time import time
 
 import click
 from tabulate import tabulate
 
-from innaterapluginio import app, exception, fs, util
+from innaterapluginio import app, exception, fs, proc, util
 from innaterapluginio.device.monitor.command import device_monitor_cmd
 from innaterapluginio.project.config import ProjectConfig
 from innaterapluginio.project.exception import ProjectError
@@ -35,6 +38,9 @@ try:
 except NotImplementedError:
     DEFAULT_JOB_NUMS = 1
 
+# the targets which are not processed with `--parallel-envs`
+SERIAL_TARGETS = ("upload", "monitor")
+
 
 @click.command("run", short_help="Run project targets (build, upload, clean, etc.)")
 @click.option("-e", "--environment", multiple=True)
@@ -62,6 +68,15 @@ except NotImplementedError:
         "Default is a number of CPUs in a system (N=%d)" % DEFAULT_JOB_NUMS
     ),
 )
+@click.option(
+    "--parallel-envs",
+    type=click.IntRange(min=1),
+    default=1,
+    help=(
+        "Process N environments at once in separate processes. "
+        "The `--jobs` budget is split between them"
+    ),
+)
 @click.option(
     "-a",
     "--program-arg",
@@ -70,6 +85,7 @@ except NotImplementedError:
     help="A program argument (multiple are allowed)",
 )
 @click.option("--disable-auto-clean", is_flag=True)
+@click.option("--disable-summary", is_flag=True, hidden=True)
 @click.option("--list-targets", is_flag=True)
 @click.option("-s", "--silent", is_flag=True)
 @click.option("-v", "--verbose", is_flag=True)
@@ -83,8 +99,10 @@ def cli(
     project_dir,
     project_conf,
     jobs,
+    parallel_envs,
     program_args,
     disable_auto_clean,
+    disable_summary,
     list_targets,
     silent,
     verbose,
@@ -123,15 +141,48 @@ def cli(
                 )
 
         default_envs = config.default_envs()
+        start_time = time()
         results = []
-        for env in config.envs():
-            skipenv = any(
+        selected_envs = [
+            env
+            for env in config.envs()
+            if not any(
                 [
                     environment and env not in environment,
                     not environment and default_envs and env not in default_envs,
                 ]
             )
-            if skipenv:
+        ]
+        processed_results = {}
+        if (
+            parallel_envs > 1
+            and len(selected_envs) > 1
+            and not is_test_running
+            # a monitor needs the terminal of the current process, parallel
+            # uploads could use the same (auto-detected) port at once
+            and not any(
+                set(SERIAL_TARGETS)
+                & set(targets or config.get(f"env:{env}", "targets", []))
+                for env in selected_envs
+            )
+        ):
+            processed_results = process_envs_in_parallel(
+                selected_envs,
+                project_conf=project_conf,
+                targets=targets,
+                upload_port=upload_port,
+                monitor_port=monitor_port,
+                jobs=jobs,
+                parallel_envs=parallel_envs,
+                program_args=program_args,
+                silent=silent,
+                verbose=verbose,
+            )
+        for env in config.envs():
+            if env in processed_results:
+                results.append(processed_results[env])
+                continue
+            if env not in selected_envs:
                 results.append({"env": env})
                 continue
 
@@ -155,13 +206,10 @@ def cli(
                 )
             )
         command_failed = any(r.get("succeeded") is False for r in results)
-        if (
-            not is_test_running
-            and not only_monitor
-            and (command_failed or not silent)
-            and len(results) > 1
-        ):
-            print_processing_summary(results, verbose)
+        # a parallel environment leaves the summary to the parent process
+        with_summary = not (is_test_running or only_monitor or disable_summary)
+        if with_summary and (command_failed or not silent) and len(results) > 1:
+            print_processing_summary(results, time() - start_time, verbose)
 
     # Reset custom project config
     app.set_session_var("custom_project_conf", None)
@@ -225,6 +273,86 @@ def process_env(
     return result
 
 
+def process_envs_in_parallel(
+    names,
+    *,
+    project_conf,
+    targets,
+    upload_port,
+    monitor_port,
+    jobs,
+    parallel_envs,
+    program_args,
+    silent,
+    verbose,
+):
+    workers = min(parallel_envs, len(names))
+    env_jobs = max(1, jobs // workers)
+    click.echo(
+        "Processing %d environments, %d at once with %d jobs each"
+        % (len(names), workers, env_jobs)
+    )
+
+    base_args = [
+        proc.get_pythonexe_path(),
+        "-m",
+        "innaterapluginio",
+        "run",
+        "--project-dir",
+        os.getcwd(),
+        "--jobs",
+        str(env_jobs),
+        "--disable-auto-clean",
+        "--disable-summary",
+    ]
+    if project_conf:
+        base_args.extend(["--project-conf", project_conf])
+    for target in targets:
+        base_args.extend(["--target", target])
+    if upload_port:
+        base_args.extend(["--upload-port", upload_port])
+    if monitor_port:
+        base_args.extend(["--monitor-port", monitor_port])
+    for program_arg in program_args:
+        base_args.extend(["--program-arg", program_arg])
+    if silent:
+        base_args.append("--silent")
+    if verbose:
+        base_args.append("--verbose")
+
+    sysenv = os.environ.copy()
+    # pylint: disable=protected-access
+    if click._compat.isatty(sys.stdout):
+        sysenv["PLATFORMIO_FORCE_ANSI"] = "true"
+
+    def _process_env(name):
+        result = {"env": name, "duration": time()}
+        output = proc.exec_command(
+            base_args + ["--environment", name],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=sysenv,
+        )
+        result["duration"] = time() - result["duration"]
+        result["succeeded"] = output["returncode"] == 0
+        result["output"] = output["out"]
+        return result
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_process_env, name) for name in names]
+        # print buffered output of each environment as soon as it is done
+        for future in as_completed(futures):
+            result = future.result()
+            if results and not silent:
+                click.echo()
+            output = result.pop("output")
+            if output:
+                click.echo(output)
+            results[result["env"]] = result
+    return results
+
+
 def print_processing_header(env, config, verbose=False):
     env_dump = []
     for k, v in config.items(env=env):
@@ -254,14 +382,12 @@ def print_processing_footer(result):
     )
 
 
-def print_processing_summary(results, verbose=False):
+def print_processing_summary(results, duration, verbose=False):
     tabular_data = []
     succeeded_nums = 0
     failed_nums = 0
-    duration = 0
 
     for result in results:
-        duration += result.get("duration", 0)
         if result.get("succeeded") is False:
             failed_nums += 1
             status_str = click.style("FAILED", fg="red")
@@ -0,0 +1,420 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import glob
+import importlib
+import json
+import os
+import runpy
+import select
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from innaterapluginio import __version__, app, fs, proc
+from innaterapluginio.compat import IS_WINDOWS
+from innaterapluginio.project.config import ProjectConfig
+
+SOCKET_FILE_NAME = "build-server.sock"
+MAX_REQUEST_SIZE = 1024 * 1024
+
+
+def get_default_socket_path():
+    return os.path.join(
+        ProjectConfig.get_instance().get("platformio", "core_dir"), SOCKET_FILE_NAME
+    )
+
+
+def is_build_server_enabled():
+    return not IS_WINDOWS and app.get_setting("enable_build_server")
+
+
+def _recv_message(sock, fds_nums=0):
+    data = b""
+    fds = []
+    while not data.endswith(b"\n"):
+        if fds_nums and not fds:
+            chunk, fds, _, _ = socket.recv_fds(sock, MAX_REQUEST_SIZE, fds_nums)
+        else:
+            chunk = sock.recv(MAX_REQUEST_SIZE)
+        if not chunk:
+            break
+        data += chunk
+        if len(data) > MAX_REQUEST_SIZE:
+            break
+    if not data.endswith(b"\n"):
+        for fd in fds:
+            os.close(fd)
+        return None, []
+    return json.loads(data.decode()), fds
+
+
+def _send_message(sock, data, fds=None):
+    payload = (json.dumps(data) + "\n").encode()
+    if fds:
+        socket.send_fds(sock, [payload], fds)
+    else:
+        sock.sendall(payload)
+
+
+class BuildServer:
+    """A warm pool for build processes.
+
+    The server imports the build system, the builder tools and their
+    dependencies once and keeps the parsed project configurations and the
+    development platform instances of projects in memory. Every build request is processed
+    by a forked child, which inherits the warm state and writes build output
+    directly to the file descriptors passed by a client. Cached objects are
+    validated by modification times, so the changes to `conf.ini` or
+    installed packages are picked up by the next build.
+
+    Connections are served by a single-threaded event loop, so a child is
+    never forked while other threads of the server hold locks.
+    """
+
+    WARM_UP_MODULES = ["SCons.Script", "SCons.Tool"]
+    # the tools of the build environment (see `builder/main.py`)
+    WARM_UP_TOOLS = [
+        "ar",
+        "cc",
+        "c++",
+        "link",
+        "piohooks",
+        "piocache",
+        "pioasm",
+        "piobuild",
+        "pioproject",
+        "pioplatform",
+        "piotest",
+        "piotarget",
+        "piolib",
+        "pioupload",
+        "piosize",
+        "pioino",
+        "piomisc",
+        "piointegration",
+        "piomaxlen",
+    ]
+
+    def __init__(self, socket_path, scons_dir, idle_timeout=0):
+        self.socket_path = socket_path
+        self.scons_script = os.path.join(scons_dir, "scons.py")
+        self.idle_timeout = idle_timeout
+        self._sock = None
+        # a connection sends a request and then waits for a build in a child
+        self._connections = {}
+        self._last_activity = time.time()
+        self._stopped = False
+
+    def warm_up(self):
+        scons_dir = os.path.dirname(self.scons_script)
+        for path in [scons_dir] + glob.glob(os.path.join(scons_dir, "scons*")):
+            if os.path.isdir(os.path.join(path, "SCons")) and path not in sys.path:
+                sys.path.insert(0, path)
+        for name in self.WARM_UP_MODULES:
+            importlib.import_module(name)
+        # SCons imports the tools as top-level modules and reuses the loaded
+        # ones with the same origin
+        toolpath = [os.path.join(fs.get_source_dir(), "builder", "tools")]
+        for name in self.WARM_UP_TOOLS:
+            sys.modules["SCons.Tool"].Tool(name, toolpath=toolpath)
+
+    @staticmethod
+    def warm_up_project(request):
+        # pylint: disable=import-outside-toplevel
+        from innaterapluginio.platform.factory import PlatformFactory
+
+        try:
+            with fs.cd(request["cwd"]):
+                config = ProjectConfig.get_instance(request["project_config"])
+                app.set_session_var("custom_project_conf", config.path)
+                spec = config.get("env:" + request["env"], "platform", None)
+                if spec:
+                    PlatformFactory.preload(spec)
+        except Exception:  # pylint: disable=broad-except
+            # a child will report a real error
+            pass
+        finally:
+            app.set_session_var("custom_project_conf", None)
+
+    def is_compatible(self, request):
+        return (
+            request.get("version") == __version__
+            and request.get("python") == proc.get_pythonexe_path()
+            and request.get("scons_script") == self.scons_script
+        )
+
+    def is_idle(self):
+        return (
+            self.idle_timeout
+            and not self._connections
+            and time.time() - self._last_activity > self.idle_timeout
+        )
+
+    def serve_forever(self):
+        self.warm_up()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self._sock.listen()
+        try:
+            while not self._stopped and not self.is_idle():
+                self.process_events()
+        finally:
+            self._sock.close()
+            self._sock = None
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            for conn, state in list(self._connections.items()):
+                if not state["pid"]:
+                    self._drop_connection(conn)
+        # report the results of the running builds
+        while self._connections:
+            self.process_events()
+
+    def process_events(self, timeout=0.2):
+        rlist = [
+            conn for conn, state in self._connections.items() if not state["aborted"]
+        ]
+        if self._sock:
+            rlist.append(self._sock)
+        for conn in select.select(rlist, [], [], timeout)[0]:
+            if conn is self._sock:
+                self._connections[self._sock.accept()[0]] = dict(
+                    data=b"", fds=[], pid=None, aborted=False
+                )
+                self._last_activity = time.time()
+            elif self._connections[conn]["pid"]:
+                self.check_client(conn)
+            else:
+                self.receive(conn)
+        self.reap_builds()
+
+    def receive(self, conn):
+        state = self._connections[conn]
+        try:
+            if state["fds"]:
+                chunk = conn.recv(MAX_REQUEST_SIZE)
+            else:
+                chunk, state["fds"], _, _ = socket.recv_fds(conn, MAX_REQUEST_SIZE, 2)
+        except OSError:
+            chunk = b""
+        state["data"] += chunk
+        if not chunk or len(state["data"]) > MAX_REQUEST_SIZE:
+            self._drop_connection(conn)
+            return
+        if not state["data"].endswith(b"\n"):
+            return
+        try:
+            request = json.loads(state["data"].decode())
+            state["data"] = b""
+            self.handle(conn, request, state["fds"])
+        except (OSError, ValueError):
+            self._drop_connection(conn)
+
+    def _drop_connection(self, conn):
+        for fd in self._connections.pop(conn)["fds"]:
+            os.close(fd)
+        conn.close()
+
+    def handle(self, conn, request, fds):
+        if request.get("command") == "stop":
+            self._stopped = True
+            _send_message(conn, {"result": "stopped"})
+            self._drop_connection(conn)
+            return
+        if len(fds) != 2 or not self.is_compatible(request):
+            _send_message(conn, {"error": "incompatible"})
+            self._drop_connection(conn)
+            return
+
+        self.warm_up_project(request)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:  # child
+            self._close_inherited(fds)
+            os._exit(self.run_build(request, fds))  # pylint: disable=protected-access
+        for fd in fds:
+            os.close(fd)
+        self._connections[conn].update(fds=[], pid=pid)
+
+    def _close_inherited(self, fds):
+        # a child must not hold the connections and the pipes of other clients
+        self._sock.close()
+        for conn, state in self._connections.items():
+            for fd in state["fds"]:
+                if fd not in fds:
+                    os.close(fd)
+            conn.close()
+
+    def check_client(self, conn):
+        try:
+            gone = not conn.recv(1)
+        except OSError:
+            gone = True
+        if not gone:
+            return
+        # a client has gone (aborted by a user), stop the build
+        state = self._connections[conn]
+        state["aborted"] = True
+        try:
+            os.killpg(state["pid"], signal.SIGINT)
+        except OSError:
+            pass
+
+    def reap_builds(self):
+        for conn, state in list(self._connections.items()):
+            if not state["pid"]:
+                continue
+            try:
+                pid, status = os.waitpid(state["pid"], os.WNOHANG)
+            except ChildProcessError:
+                pid, status = state["pid"], None
+            if not pid:
+                continue
+            self._last_activity = time.time()
+            try:
+                if status is not None:
+                    _send_message(
+                        conn, {"returncode": os.waitstatus_to_exitcode(status)}
+                    )
+            except OSError:
+                pass
+            finally:
+                self._drop_connection(conn)
+
+    def run_build(self, request, fds):
+        returncode = 1
+        try:
+            os.setpgid(0, 0)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            os.dup2(fds[0], 1)
+            os.dup2(fds[1], 2)
+            sys.stdout = open(  # pylint: disable=consider-using-with
+                1, "w", encoding="utf-8", errors="backslashreplace", closefd=False
+            )
+            sys.stderr = open(  # pylint: disable=consider-using-with
+                2, "w", encoding="utf-8", errors="backslashreplace", closefd=False
+            )
+            os.chdir(request["cwd"])
+            os.environ.clear()
+            os.environ.update(request["environ"])
+            sys.argv = [self.scons_script] + request["args"]
+            runpy.run_path(self.scons_script, run_name="__main__")
+            returncode = 0
+        except SystemExit as exc:
+            returncode = exc.code if isinstance(exc.code, int) else int(bool(exc.code))
+        except KeyboardInterrupt:
+            returncode = 2
+        except BaseException:  # pylint: disable=broad-except
+            import traceback  # pylint: disable=import-outside-toplevel
+
+            traceback.print_exc()
+        finally:
+            for stream in (sys.stdout, sys.stderr):
+                try:
+                    stream.flush()
+                except (OSError, ValueError):
+                    pass
+        return returncode
+
+
+class BuildServerClient:
+    def __init__(self, socket_path=None):
+        self.socket_path = socket_path or get_default_socket_path()
+
+    def connect(self):
+        if not os.path.exists(self.socket_path):
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            return None
+        return sock
+
+    def is_running(self):
+        sock = self.connect()
+        if not sock:
+            return False
+        sock.close()
+        return True
+
+    def run(self, scons_script, args, variables, stdout, stderr):
+        """Process a build by the server.
+
+        Returns `None` when the server is not available or is not compatible
+        with the current installation, so the caller could fall back to a
+        regular build process.
+        """
+        sock = self.connect()
+        if not sock:
+            return None
+        try:
+            _send_message(
+                sock,
+                dict(
+                    version=__version__,
+                    python=proc.get_pythonexe_path(),
+                    scons_script=scons_script,
+                    cwd=os.getcwd(),
+                    environ=dict(os.environ),
+                    env=variables["pioenv"],
+                    project_config=variables["project_config"],
+                    args=args,
+                ),
+                fds=[stdout.fileno(), stderr.fileno()],
+            )
+            response, _ = _recv_message(sock)
+        except OSError:
+            return None
+        finally:
+            sock.close()
+        if not response or "returncode" not in response:
+            return None
+        return response["returncode"]
+
+    def stop(self):
+        sock = self.connect()
+        if not sock:
+            return False
+        try:
+            _send_message(sock, {"command": "stop"})
+            _recv_message(sock)
+        finally:
+            sock.close()
+        return True
+
+    @staticmethod
+    def spawn_server():
+        # pylint: disable=consider-using-with
+        subprocess.Popen(
+            [
+                proc.get_pythonexe_path(),
+                "-m",
+                "innaterapluginio",
+                "system",
+                "build-server",
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
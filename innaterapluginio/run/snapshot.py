@@ -0,0 +1,172 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+from hashlib import sha1
+
+from innaterapluginio import exception, fs
+from innaterapluginio.compat import hashlib_encode_data
+from innaterapluginio.project.filetree import ProjectFileTreeIndex
+from innaterapluginio.project.helpers import compute_project_checksum
+
+
+class BuildSnapshot:
+    """Fingerprint of a resolved build used to detect no-op builds.
+
+    The fingerprint covers the project configuration, the state of project
+    sources, libraries, extra scripts, and used packages. When it matches
+    the fingerprint of the last successful build and the build artifacts
+    are untouched, there is no reason to launch the build system.
+    """
+
+    FILE_NAME = "snapshot.json"
+    VERSION = 2
+
+    def __init__(self, platform, variables, targets):
+        self.platform = platform
+        self.env_name = variables["pioenv"]
+        self.variables = variables
+        self.targets = targets
+        self.build_dir = os.path.join(
+            self.config.get("platformio", "build_dir"), self.env_name
+        )
+        self.path = os.path.join(self.build_dir, self.FILE_NAME)
+        self._fingerprint = None
+
+    @property
+    def config(self):
+        return self.platform.config
+
+    @staticmethod
+    def is_applicable(platform, variables, targets):
+        return (
+            not targets
+            and "piotest_running_name" not in variables
+            and platform.config.get(
+                "env:" + variables["pioenv"], "build_fast_noop", False
+            )
+        )
+
+    @property
+    def fingerprint(self):
+        if not self._fingerprint:
+            self._fingerprint = self.compute_fingerprint()
+        return self._fingerprint
+
+    def get_watched_dirs(self):
+        section = "env:" + self.env_name
+        result = [
+            self.config.get("platformio", "include_dir"),
+            self.config.get("platformio", "src_dir"),
+            self.config.get("platformio", "lib_dir"),
+            self.config.get("platformio", "boards_dir"),
+            os.path.join(self.config.get("platformio", "libdeps_dir"), self.env_name),
+            self.config.get("platformio", "globallib_dir"),
+            os.path.join(self.platform.get_dir(), "builder"),
+        ]
+        result.extend(
+            fs.expanduser(d) if d.startswith("~") else d
+            for d in self.config.get(section, "lib_extra_dirs", [])
+        )
+        for script in self.config.get(section, "extra_scripts", []):
+            if ":" in script and script.split(":", 1)[0] in ("pre", "post"):
+                script = script.split(":", 1)[1]
+            result.append(script)
+        return result
+
+    @staticmethod
+    def _stat_path(index, path):
+        result = []
+        # only the directories with a changed mtime are listed again
+        for item_path in [path] if os.path.isfile(path) else index.get_files(path):
+            try:
+                st = os.stat(item_path)
+            except OSError:
+                continue
+            result.append([item_path, st.st_mtime, st.st_size])
+        return sorted(result)
+
+    def compute_fingerprint(self):
+        # the watched directories differ per environment, keep own index
+        index = ProjectFileTreeIndex(
+            os.path.join(
+                self.config.get("platformio", "workspace_dir"),
+                "filetree-%s.json" % self.env_name,
+            )
+        )
+        files = [self._stat_path(index, path) for path in self.get_watched_dirs()]
+        index.save()
+        data = dict(
+            version=self.VERSION,
+            project=compute_project_checksum(self.config),
+            variables=self.variables,
+            targets=sorted(self.targets),
+            platform=[self.platform.name, self.platform.version],
+            packages=sorted(
+                [pkg.path, str(pkg.metadata.version) if pkg.metadata else None]
+                for pkg in self.platform.get_installed_packages(with_optional=False)
+            ),
+            sysenv=sorted(
+                (key, value)
+                for key, value in os.environ.items()
+                if key.startswith("PLATFORMIO_")
+            ),
+            files=files,
+        )
+        return sha1(hashlib_encode_data(json.dumps(data, sort_keys=True))).hexdigest()
+
+    def get_artifacts(self):
+        result = {}
+        if not os.path.isdir(self.build_dir):
+            return result
+        for name in os.listdir(self.build_dir):
+            path = os.path.join(self.build_dir, name)
+            # service files are updated by every run of the build system
+            if (
+                name.endswith(".json")
+                or name.startswith(".sconsign")
+                or not os.path.isfile(path)
+            ):
+                continue
+            st = os.stat(path)
+            result[name] = [st.st_mtime, st.st_size]
+        return result
+
+    def is_up_to_date(self):
+        # take the fingerprint before the build on every path, so sources
+        # changed while the build is running are not recorded as built
+        fingerprint = self.fingerprint
+        if not os.path.isfile(self.path):
+            return False
+        try:
+            data = fs.load_json(self.path)
+        except (ValueError, UnicodeDecodeError, exception.InvalidJSONFile):
+            return False
+        return (
+            isinstance(data, dict)
+            and data.get("artifacts")
+            and data.get("fingerprint") == fingerprint
+            and data.get("artifacts") == self.get_artifacts()
+        )
+
+    def save(self):
+        if not os.path.isdir(self.build_dir):
+            return
+        with open(self.path, mode="w", encoding="utf8") as fp:
+            json.dump(
+                dict(fingerprint=self.fingerprint, artifacts=self.get_artifacts()), fp
+            )
+
+    def delete(self):
+        if os.path.isfile(self.path):
+            os.remove(self.path)
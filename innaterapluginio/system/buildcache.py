@@ -0,0 +1,137 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+from innaterapluginio import exception, fs
+from innaterapluginio.package.lockfile import LockFile
+
+# keep cache usage below the limit after eviction to avoid evicting
+# on every build
+EVICTION_TARGET_RATIO = 0.9
+
+
+class BuildCacheStorage:
+    """Statistics and eviction for a shared build cache directory.
+
+    Entries are stored by the build system in sub-directories named by a
+    prefix of the entry signature. Every retrieved entry is touched, so the
+    modification time reflects the last use of an entry.
+    """
+
+    STATS_FILE_NAME = "pio-stats.json"
+    COUNTERS = (
+        "requests",
+        "hits",
+        "bytes_saved",
+        "pushes",
+        "bytes_pushed",
+        "evictions",
+        "bytes_evicted",
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self.stats_path = os.path.join(path, self.STATS_FILE_NAME)
+
+    def _load_stats(self):
+        data = {}
+        if os.path.isfile(self.stats_path):
+            try:
+                data = fs.load_json(self.stats_path)
+            except (ValueError, UnicodeDecodeError, exception.InvalidJSONFile):
+                pass
+        if not isinstance(data, dict):
+            data = {}
+        for name in self.COUNTERS:
+            data[name] = int(data.get(name, 0))
+        return data
+
+    def _save_stats(self, data):
+        tmp_path = "%s.%d.tmp" % (self.stats_path, os.getpid())
+        with open(tmp_path, mode="w", encoding="utf8") as fp:
+            json.dump(data, fp)
+        os.replace(tmp_path, self.stats_path)
+
+    def get_stats(self):
+        data = self._load_stats()
+        data["misses"] = data["requests"] - data["hits"]
+        data["hit_rate"] = (
+            100.0 * data["hits"] / data["requests"] if data["requests"] else 0.0
+        )
+        data["entries"], data["size"] = self.get_usage()
+        return data
+
+    def iter_entries(self):
+        if not os.path.isdir(self.path):
+            return
+        for name in os.listdir(self.path):
+            subdir = os.path.join(self.path, name)
+            # top level files are service files (config, stats, locks)
+            if not os.path.isdir(subdir):
+                continue
+            for entry in os.scandir(subdir):
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                yield entry.path, st.st_mtime, st.st_size
+
+    def get_usage(self):
+        entries = 0
+        size = 0
+        for _, _, entry_size in self.iter_entries():
+            entries += 1
+            size += entry_size
+        return entries, size
+
+    def commit(self, size_limit=0, **counters):
+        """Merge counters of a finished build and evict outdated entries."""
+        if not os.path.isdir(self.path):
+            return None
+        with LockFile(self.stats_path):
+            data = self._load_stats()
+            for name, value in counters.items():
+                data[name] += value
+            # an approximate size avoids walking the whole cache on each build
+            if "size" not in data:
+                data["size"] = self.get_usage()[1]
+            else:
+                data["size"] = int(data["size"]) + counters.get("bytes_pushed", 0)
+            if size_limit and data["size"] > size_limit:
+                evictions, bytes_evicted, data["size"] = self.evict(size_limit)
+                data["evictions"] += evictions
+                data["bytes_evicted"] += bytes_evicted
+            self._save_stats(data)
+        return data
+
+    def evict(self, size_limit):
+        entries = sorted(self.iter_entries(), key=lambda item: item[1])
+        size = sum(item[2] for item in entries)
+        target_size = int(size_limit * EVICTION_TARGET_RATIO)
+        evictions = 0
+        bytes_evicted = 0
+        # the least recently used entries go first
+        for path, _, entry_size in entries:
+            if size <= target_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+            evictions += 1
+            bytes_evicted += entry_size
+        return evictions, bytes_evicted, size
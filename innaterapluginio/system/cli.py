@@ -12,6 +12,8 @@
 
 import click
 
+from innaterapluginio.system.commands.buildserver import system_build_server_cmd
+from innaterapluginio.system.commands.cache import system_cache_cmd
 from innaterapluginio.system.commands.completion import system_completion_cmd
 from innaterapluginio.system.commands.info import system_info_cmd
 from innaterapluginio.system.commands.prune import system_prune_cmd
@@ -20,6 +22,8 @@ from innaterapluginio.system.commands.prune import system_prune_cmd
 @click.group(
     "system",
     commands=[
+        system_build_server_cmd,
+        system_cache_cmd,
         system_completion_cmd,
         system_info_cmd,
         system_prune_cmd,
@@ -0,0 +1,53 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import click
+
+from innaterapluginio.compat import IS_WINDOWS
+from innaterapluginio.package.manager.core import get_core_package_dir
+from innaterapluginio.run.server import (
+    BuildServer,
+    BuildServerClient,
+    get_default_socket_path,
+)
+
+
+@click.command("build-server", short_help="Keep a warm build server between builds")
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False),
+    help="A path to the server socket",
+)
+@click.option(
+    "--idle-timeout",
+    type=click.IntRange(min=0),
+    default=3600,
+    show_default=True,
+    help="Shut down the server after N seconds without builds (0 = never)",
+)
+@click.option("--stop", is_flag=True, help="Stop the running server")
+def system_build_server_cmd(socket_path, idle_timeout, stop):
+    if IS_WINDOWS:
+        raise click.ClickException("The build server is not supported on Windows")
+    socket_path = socket_path or get_default_socket_path()
+    if stop:
+        if not BuildServerClient(socket_path).stop():
+            raise click.ClickException("The build server is not running")
+        return click.secho("The build server has been stopped", fg="green")
+    if BuildServerClient(socket_path).is_running():
+        raise click.ClickException("The build server is already running")
+    click.echo("Build server is listening on %s" % socket_path)
+    BuildServer(
+        socket_path, get_core_package_dir("tool-scons"), idle_timeout=idle_timeout
+    ).serve_forever()
+    return None
@@ -0,0 +1,85 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+import click
+from tabulate import tabulate
+
+from innaterapluginio import fs
+from innaterapluginio.project.config import ProjectConfig
+from innaterapluginio.system.buildcache import BuildCacheStorage
+
+
+@click.group("cache", short_help="Manage the shared build cache")
+def system_cache_cmd():
+    pass
+
+
+@system_cache_cmd.command("stats", short_help="Display build cache statistics")
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, resolve_path=True),
+    help="A build cache directory (default is `build_cache_dir` option)",
+)
+@click.option("--json-output", is_flag=True)
+def system_cache_stats_cmd(cache_dir, json_output):
+    config = ProjectConfig.get_instance()
+    cache_dir = cache_dir or config.get("platformio", "build_cache_dir")
+    if not cache_dir:
+        raise click.UsageError(
+            "The build cache is not configured, please set `build_cache_dir` option"
+        )
+    if not os.path.isdir(cache_dir):
+        raise click.BadParameter("The build cache directory does not exist")
+
+    stats = BuildCacheStorage(cache_dir).get_stats()
+    size_limit = int(config.get("platformio", "build_cache_size") or 0) * 1024 * 1024
+    if json_output:
+        return click.echo(
+            json.dumps(dict(stats, path=cache_dir, size_limit=size_limit))
+        )
+
+    click.echo(
+        tabulate(
+            [
+                ("Directory", cache_dir),
+                ("Entries", stats["entries"]),
+                (
+                    "Size",
+                    "%s / %s"
+                    % (
+                        fs.humanize_file_size(stats["size"]),
+                        fs.humanize_file_size(size_limit)
+                        if size_limit
+                        else "unlimited",
+                    ),
+                ),
+                ("Requests", stats["requests"]),
+                ("Hits", stats["hits"]),
+                ("Misses", stats["misses"]),
+                ("Hit Rate", "%.1f%%" % stats["hit_rate"]),
+                ("Saved", fs.humanize_file_size(stats["bytes_saved"])),
+                ("Pushed", fs.humanize_file_size(stats["bytes_pushed"])),
+                (
+                    "Evicted",
+                    "%d (%s)"
+                    % (
+                        stats["evictions"],
+                        fs.humanize_file_size(stats["bytes_evicted"]),
+                    ),
+                ),
+            ]
+        )
+    )
+    return None
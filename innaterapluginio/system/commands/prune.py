@@ -16,6 +16,7 @@ from innaterapluginio import fs
 from innaterapluginio.system.prune import (
     prune_cached_data,
     prune_core_packages,
+    prune_package_store,
     prune_platform_packages,
 )
 
@@ -34,7 +35,14 @@ from innaterapluginio.system.prune import (
     is_flag=True,
     help="Prune only unnecessary development platform packages",
 )
-def system_prune_cmd(force, dry_run, cache, core_packages, platform_packages):
+@click.option(
+    "--package-store",
+    is_flag=True,
+    help="Prune only unused entries of the shared package store",
+)
+def system_prune_cmd(  # pylint: disable=too-many-arguments
+    force, dry_run, cache, core_packages, platform_packages, package_store
+):
     if dry_run:
         click.secho(
             "Dry run mode (do not prune, only show data that will be removed)",
@@ -45,7 +53,8 @@ def system_prune_cmd(force, dry_run, cache, core_packages, platform_packages):
     reclaimed_cache = 0
     reclaimed_core_packages = 0
     reclaimed_platform_packages = 0
-    prune_all = not any([cache, core_packages, platform_packages])
+    reclaimed_package_store = 0
+    prune_all = not any([cache, core_packages, platform_packages, package_store])
 
     if cache or prune_all:
         reclaimed_cache = prune_cached_data(force, dry_run)
@@ -59,10 +68,17 @@ def system_prune_cmd(force, dry_run, cache, core_packages, platform_packages):
         reclaimed_platform_packages = prune_platform_packages(force, dry_run)
         click.echo()
 
+    if package_store or prune_all:
+        reclaimed_package_store = prune_package_store(force, dry_run)
+        click.echo()
+
     click.secho(
         "Total reclaimed space: %s"
         % fs.humanize_file_size(
-            reclaimed_cache + reclaimed_core_packages + reclaimed_platform_packages
+            reclaimed_cache
+            + reclaimed_core_packages
+            + reclaimed_platform_packages
+            + reclaimed_package_store
         ),
         fg="green",
     )
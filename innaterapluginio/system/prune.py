@@ -19,6 +19,8 @@ from tabulate import tabulate
 from innaterapluginio import fs
 from innaterapluginio.package.manager.core import remove_unnecessary_core_packages
 from innaterapluginio.package.manager.platform import remove_unnecessary_platform_packages
+from innaterapluginio.package.store import PackageStore
+from innaterapluginio.project.config import ProjectConfig
 from innaterapluginio.project.helpers import get_project_cache_dir
 
 
@@ -53,6 +55,31 @@ def prune_platform_packages(force=False, dry_run=False, silent=False):
     return _prune_packages(force, dry_run, silent, remove_unnecessary_platform_packages)
 
 
+def prune_package_store(force=False, dry_run=False, silent=False):
+    if not silent:
+        click.secho("Prune unused entries of the package store:", bold=True)
+        click.echo("Calculating...")
+    store = PackageStore(
+        ProjectConfig.get_instance().get("platformio", "package_store_dir")
+    )
+    items = store.prune(dry_run=True)
+    reclaimed_space = sum(size for _, size in items)
+    if items and not silent:
+        click.echo(
+            tabulate(
+                [(key[:12], fs.humanize_file_size(size)) for key, size in items],
+                headers=["Entry", "Size"],
+            )
+        )
+    if items and not dry_run:
+        if not force:
+            click.confirm("Do you want to continue?", abort=True)
+        store.prune()
+    if not silent:
+        click.secho("Space on disk: %s" % fs.humanize_file_size(reclaimed_space))
+    return reclaimed_space
+
+
 def _prune_packages(force, dry_run, silent, handler):
     if not silent:
         click.echo("Calculating...")
@@ -93,4 +120,5 @@ def calculate_unnecessary_system_data():
         prune_cached_data(force=True, dry_run=True, silent=True)
         + prune_core_packages(force=True, dry_run=True, silent=True)
         + prune_platform_packages(force=True, dry_run=True, silent=True)
+        + prune_package_store(force=True, dry_run=True, silent=True)
     )
@@ -11,25 +11,28 @@
 # limitations under the License.
 
 import atexit
+import json
 import os
-import queue
 import re
+import subprocess
 import sys
-import threading
 import time
 import traceback
 from collections import deque
 
-import requests
-
 from innaterapluginio import __title__, __version__, app, exception, fs, util
 from innaterapluginio.cli import PlatformioCLI
+from innaterapluginio.compat import IS_WINDOWS
 from innaterapluginio.debug.config.base import DebugConfigBase
-from innaterapluginio.http import HTTPSession
 from innaterapluginio.proc import is_ci
 
 KEEP_MAX_REPORTS = 100
 SEND_MAX_EVENTS = 25
+COLLECTOR_URL = "https://collector.platformio.org/collect"
+SPOOL_FILE_NAME = "telemetry.spool"
+SPOOL_MAX_SIZE = 1024 * 1024  # bytes
+FLUSH_INTERVAL = 60  # seconds
+FLUSH_OFFLINE_INTERVAL = 3600  # seconds, when the collector is not reachable
 
 
 class MeasurementProtocol:
@@ -69,16 +72,6 @@ class TelemetryLogger:
     def __init__(self):
         self._events = deque()
 
-        self._sender_thread = None
-        self._sender_queue = queue.Queue()
-        self._sender_terminated = False
-
-        self._http_session = HTTPSession()
-        self._http_offline = False
-
-    def close(self):
-        self._http_session.close()
-
     def log_event(self, name, params, timestamp=None, instant_sending=False):
         if not app.get_setting("enable_telemetry") or app.get_session_var(
             "pause_telemetry"
@@ -88,50 +81,164 @@ class TelemetryLogger:
         self._events.append(
             MeasurementProtocol.event_to_dict(name, params, timestamp=timestamp)
         )
-        if self._http_offline:  # if network is off-line
-            return False
         if instant_sending:
             self.send()
         return True
 
     def send(self):
-        if not self._events or self._sender_terminated:
+        """Spool the events, a detached process delivers them later."""
+        if not self._events:
             return
-        if not self._sender_thread:
-            self._sender_thread = threading.Thread(
-                target=self._sender_worker, daemon=True
+        events = list(self._events)
+        self._events.clear()
+        spool = TelemetrySpool()
+        # a full spool is flushed too, otherwise it would never drain
+        spool.append(events)
+        if spool.is_flush_due():
+            spool.start_detached_flush()
+
+
+class TelemetrySpool:
+    """Events which wait for sending, one JSON document per line.
+
+    Commands only append to the spool and never wait on the network.
+    The spool is delivered by a detached process started at most every
+    `FLUSH_INTERVAL` seconds (`FLUSH_OFFLINE_INTERVAL` after a failure).
+    A flushing process takes the whole spool by renaming it, so
+    concurrent commands keep appending to a new one.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or app.resolve_state_path("cache_dir", SPOOL_FILE_NAME)
+        self.flush_state_path = os.path.join(
+            os.path.dirname(self.path), "telemetry.flush"
+        )
+
+    def append(self, events):
+        try:
+            if os.path.getsize(self.path) > SPOOL_MAX_SIZE:
+                return False
+        except OSError:
+            pass
+        data = "".join(json.dumps(event) + "\n" for event in events)
+        try:
+            # a single write to a file opened in the append mode
+            with open(self.path, mode="a", encoding="utf8") as fp:
+                fp.write(data)
+        except (OSError, TypeError, ValueError):
+            return False
+        return True
+
+    @staticmethod
+    def read(path):
+        events = []
+        try:
+            with open(path, encoding="utf8") as fp:
+                for line in fp:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:  # an interrupted write
+                        continue
+                    if isinstance(event, dict) and set(
+                        ["name", "params", "timestamp"]
+                    ) <= set(event.keys()):
+                        events.append(event)
+        except OSError:
+            pass
+        return events
+
+    def is_flush_due(self):
+        try:
+            with open(self.flush_state_path, encoding="utf8") as fp:
+                return time.time() >= float(fp.read())
+        except (OSError, ValueError):
+            return True
+
+    def schedule_flush(self, delay):
+        tmp_path = "%s.%d.tmp" % (self.flush_state_path, os.getpid())
+        try:
+            with open(tmp_path, mode="w", encoding="utf8") as fp:
+                fp.write(str(int(time.time() + delay)))
+            os.replace(tmp_path, self.flush_state_path)
+        except OSError:
+            pass
+
+    def start_detached_flush(self):
+        self.schedule_flush(FLUSH_INTERVAL)
+        kwargs = dict(
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+        )
+        if IS_WINDOWS:
+            kwargs["creationflags"] = (
+                subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
             )
-            self._sender_thread.start()
-        while self._events:
-            events = []
+        else:
+            kwargs["start_new_session"] = True
+        try:
+            subprocess.Popen(  # pylint: disable=consider-using-with
+                [sys.executable, "-m", "innaterapluginio.telemetry"], **kwargs
+            )
+        except OSError:
+            return False
+        return True
+
+    def flush(self):
+        # pylint: disable=import-outside-toplevel
+        from innaterapluginio.http import HTTPSession
+
+        events = self._take_abandoned_events()
+        taken_path = "%s.%d" % (self.path, os.getpid())
+        try:
+            os.replace(self.path, taken_path)
+            os.utime(taken_path)
+            events.extend(self.read(taken_path))
+        except OSError:  # nothing was spooled
+            taken_path = None
+        events = events[KEEP_MAX_REPORTS * -1 :]
+        if events:
+            with HTTPSession() as session:
+                while events:
+                    if not self._commit_events(session, events[:SEND_MAX_EVENTS]):
+                        break
+                    events = events[SEND_MAX_EVENTS:]
+        if events:
+            self.append(events)
+            self.schedule_flush(FLUSH_OFFLINE_INTERVAL)
+        if taken_path:
             try:
-                while len(events) < SEND_MAX_EVENTS:
-                    events.append(self._events.popleft())
-            except IndexError:
+                os.remove(taken_path)
+            except OSError:
                 pass
-            self._sender_queue.put(events)
-
-    def _sender_worker(self):
-        while True:
-            if self._sender_terminated:
-                return
+        return not events
+
+    def _take_abandoned_events(self):
+        """Events taken by the flushing processes which have been killed."""
+        result = []
+        spool_dir, spool_name = os.path.split(self.path)
+        for name in os.listdir(spool_dir):
+            if not name.startswith(spool_name + "."):
+                continue
+            path = os.path.join(spool_dir, name)
             try:
-                events = self._sender_queue.get()
-                if not self._commit_events(events):
-                    self._events.extend(events)
-                self._sender_queue.task_done()
-            except (queue.Empty, ValueError):
+                if os.path.getmtime(path) > time.time() - FLUSH_OFFLINE_INTERVAL:
+                    continue
+                result.extend(self.read(path))
+                os.remove(path)
+            except OSError:
                 pass
+        return result
 
-    def _commit_events(self, events):
-        if self._http_offline:
-            return False
-        mp = MeasurementProtocol(events)
-        payload = mp.to_payload()
-        # print("_commit_payload", payload)
+    @staticmethod
+    def _commit_events(session, events):
+        import requests  # pylint: disable=import-outside-toplevel
+
+        payload = MeasurementProtocol(events).to_payload()
         try:
-            r = self._http_session.post(
-                "https://collector.platformio.org/collect",
+            r = session.post(
+                COLLECTOR_URL,
                 json=payload,
                 timeout=(2, 5),  # connect, read
             )
@@ -139,28 +246,12 @@ class TelemetryLogger:
             return True
         except requests.exceptions.HTTPError as exc:
             # skip Bad Request
-            if exc.response.status_code >= 400 and exc.response.status_code < 500:
+            if 400 <= exc.response.status_code < 500:
                 return True
         except:  # pylint: disable=bare-except
             pass
-        self._http_offline = True
         return False
 
-    def terminate_sender(self):
-        self._sender_terminated = True
-
-    def is_sending(self):
-        return self._sender_queue.unfinished_tasks
-
-    def get_unsent_events(self):
-        result = list(self._events)
-        try:
-            while True:
-                result.extend(self._sender_queue.get_nowait())
-        except queue.Empty:
-            pass
-        return result
-
 
 def log_event(name, params, instant_sending=False):
     TelemetryLogger().log_event(name, params, instant_sending=instant_sending)
@@ -306,73 +397,23 @@ def log_debug_exception(exc, debug_config: DebugConfigBase):
 
 @atexit.register
 def _finalize():
-    timeout = 1000  # msec
-    elapsed = 0
-    telemetry = TelemetryLogger()
-    telemetry.terminate_sender()
-    try:
-        while elapsed < timeout:
-            if not telemetry.is_sending():
-                break
-            time.sleep(0.2)
-            elapsed += 200
-    except KeyboardInterrupt:
-        pass
-    postpone_events(telemetry.get_unsent_events())
-    telemetry.close()
-
-
-def load_postponed_events():
+    TelemetryLogger().send()
+
+
+def process_postponed_logs():
+    """Move the events postponed by the previous versions to the spool."""
     state_path = app.resolve_state_path(
         "cache_dir", "telemetry.json", ensure_dir_exists=False
     )
     if not os.path.isfile(state_path):
-        return []
-    with app.State(state_path) as state:
-        return state.get("events", [])
-
-
-def save_postponed_events(events):
-    state_path = app.resolve_state_path("cache_dir", "telemetry.json")
-    if not events:
-        try:
-            if os.path.isfile(state_path):
-                os.remove(state_path)
-        except:  # pylint: disable=bare-except
-            pass
         return None
-    with app.State(state_path, lock=True) as state:
-        state["events"] = events
-        state.modified = True
-    return True
-
-
-def postpone_events(events):
-    if not events:
-        return None
-    postponed_events = load_postponed_events() or []
-    timestamp = int(time.time())
-    for event in events:
-        if "timestamp" not in event:
-            event["timestamp"] = timestamp
-        postponed_events.append(event)
-    save_postponed_events(postponed_events[KEEP_MAX_REPORTS * -1 :])
-    return True
+    try:
+        events = fs.load_json(state_path).get("events", [])
+        os.remove(state_path)
+    except Exception:  # pylint: disable=broad-except
+        return False
+    return TelemetrySpool().append(events) if events else True
 
 
-def process_postponed_logs():
-    events = load_postponed_events()
-    if not events:
-        return None
-    save_postponed_events([])  # clean
-    telemetry = TelemetryLogger()
-    for event in events:
-        if set(["name", "params", "timestamp"]) <= set(event.keys()):
-            telemetry.log_event(
-                event["name"],
-                event["params"],
-                timestamp=event["timestamp"],
-                instant_sending=False,
-            )
-    telemetry.send()
-    return True
+if __name__ == "__main__":
+    TelemetrySpool().flush()
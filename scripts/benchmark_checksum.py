@@ -0,0 +1,117 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measure the project checksum on a synthetic file tree.
+
+    python scripts/benchmark_checksum.py --files 20000
+"""
+
+import os
+import sys
+import tempfile
+import time
+from hashlib import sha1
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import click  # noqa: E402
+
+from innaterapluginio import __version__, fs  # noqa: E402
+from innaterapluginio.compat import hashlib_encode_data  # noqa: E402
+from innaterapluginio.project.config import ProjectConfig  # noqa: E402
+from innaterapluginio.project.helpers import compute_project_checksum  # noqa: E402
+
+
+def generate_project(project_dir, files_nums, files_per_dir):
+    with open(os.path.join(project_dir, "conf.ini"), mode="w", encoding="utf8") as fp:
+        fp.write("[env:bench]\n")
+    for index in range(files_nums):
+        # spread files over the include, src and lib trees
+        top_dir = ("include", "src", "lib")[index % 3]
+        dir_index = index // files_per_dir
+        path = os.path.join(
+            project_dir,
+            top_dir,
+            "group%d" % (dir_index // 10),
+            "dir%d" % dir_index,
+            "file%d.%s" % (index, ("c", "cpp", "h", "txt")[index % 4]),
+        )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, mode="w", encoding="utf8"):
+            pass
+
+
+def compute_walk_checksum(config):
+    """The checksum computed with a full `os.walk()` of the project."""
+    checksum = sha1(hashlib_encode_data(__version__))
+    checksum.update(hashlib_encode_data(config.to_json()))
+    check_suffixes = (".c", ".cc", ".cpp", ".h", ".hpp", ".s", ".S")
+    for d in (
+        config.get("platformio", "include_dir"),
+        config.get("platformio", "src_dir"),
+        config.get("platformio", "lib_dir"),
+    ):
+        if not os.path.isdir(d):
+            continue
+        chunks = []
+        for root, _, files in os.walk(d):
+            for f in files:
+                path = os.path.join(root, f)
+                if path.endswith(check_suffixes):
+                    chunks.append(path)
+        if chunks:
+            checksum.update(hashlib_encode_data(",".join(sorted(chunks))))
+    return checksum.hexdigest()
+
+
+def measure(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+
+@click.command()
+@click.option("--files", "files_nums", default=20000, show_default=True)
+@click.option("--files-per-dir", default=50, show_default=True)
+def main(files_nums, files_per_dir):
+    with tempfile.TemporaryDirectory() as project_dir:
+        generate_project(project_dir, files_nums, files_per_dir)
+        with fs.cd(project_dir):
+            config = ProjectConfig(os.path.join(project_dir, "conf.ini"))
+            # let directories leave the window of racy timestamps
+            time.sleep(2.5)
+            walk_time, walk_checksum = measure(compute_walk_checksum, config)
+            cold_time, cold_checksum = measure(compute_project_checksum, config)
+            warm_time, warm_checksum = measure(compute_project_checksum, config)
+            assert walk_checksum == cold_checksum == warm_checksum
+
+            # a new file invalidates only its directory
+            new_file = os.path.join(project_dir, "src", "group0", "dir1", "new.c")
+            with open(new_file, mode="w", encoding="utf8"):
+                pass
+            changed_time, changed_checksum = measure(
+                compute_project_checksum, config
+            )
+            assert changed_checksum != warm_checksum
+            assert changed_checksum == compute_walk_checksum(config)
+
+    click.echo(
+        "Project: %d files, %d files per directory" % (files_nums, files_per_dir)
+    )
+    click.echo("Full walk: %.3fs" % walk_time)
+    click.echo("Index, cold: %.3fs" % cold_time)
+    click.echo("Index, warm: %.3fs" % warm_time)
+    click.echo("Index, one directory changed: %.3fs" % changed_time)
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,170 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measure the Library Dependency Finder on a synthetic project.
+
+python scripts/benchmark_ldf.py --libs 100 --headers 5000
+"""
+
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import click  # noqa: E402
+import SCons.Defaults  # noqa: E402
+import SCons.Node.FS  # noqa: E402
+from SCons.Script import DefaultEnvironment  # noqa: E402
+
+from innaterapluginio import fs  # noqa: E402
+
+
+def generate_project(project_dir, libs_nums, headers_nums, seed=0):
+    rnd = random.Random(seed)
+    headers_per_lib = max(1, headers_nums // libs_nums)
+    for lib_index in range(libs_nums):
+        lib_src_dir = os.path.join(project_dir, "lib", "Lib%d" % lib_index, "src")
+        os.makedirs(lib_src_dir)
+        for header_index in range(headers_per_lib):
+            # SCons preprocessor scanner does not honor `#pragma once`
+            guard = "LIB%d_%d_H" % (lib_index, header_index)
+            lines = ["#ifndef " + guard, "#define " + guard]
+            # a few includes to the same library and to libraries below
+            for _ in range(3):
+                dep_lib = rnd.randrange(lib_index + 1)
+                lines.append(
+                    '#include "lib%d_%d.h"' % (dep_lib, rnd.randrange(headers_per_lib))
+                )
+            with open(
+                os.path.join(lib_src_dir, "lib%d_%d.h" % (lib_index, header_index)),
+                mode="w",
+                encoding="utf8",
+            ) as fp:
+                fp.write("\n".join(lines + ["#endif"]) + "\n")
+        with open(
+            os.path.join(lib_src_dir, "lib%d.cpp" % lib_index),
+            mode="w",
+            encoding="utf8",
+        ) as fp:
+            fp.write('#include "lib%d_0.h"\n' % lib_index)
+
+    os.makedirs(os.path.join(project_dir, "src"))
+    with open(
+        os.path.join(project_dir, "src", "main.cpp"), mode="w", encoding="utf8"
+    ) as fp:
+        for lib_index in range(libs_nums):
+            fp.write('#include "lib%d_0.h"\n' % lib_index)
+        fp.write("int main() { return 0; }\n")
+
+
+def configure_env(project_dir, ldf_mode, jobs):
+    # start a new build process, SCons caches the state of files in nodes
+    SCons.Node.FS.default_fs = None
+    SCons.Defaults._default_env = None  # pylint: disable=protected-access
+    with open(os.path.join(project_dir, "conf.ini"), mode="w", encoding="utf8") as fp:
+        fp.write(
+            "[env:bench]\nlib_ldf_mode = %s\nlib_ldf_parallel = %s\n"
+            % (ldf_mode, "yes" if jobs else "no")
+        )
+    env = DefaultEnvironment(
+        tools=["piobuild", "pioproject", "piolib"],
+        toolpath=[os.path.join(fs.get_source_dir(), "builder", "tools")],
+        PROJECT_CONFIG=os.path.join(project_dir, "conf.ini"),
+        PIOENV="bench",
+        BUILD_TYPE="release",
+        PROJECT_DIR=project_dir,
+        PROJECT_SRC_DIR=os.path.join(project_dir, "src"),
+        PROJECT_INCLUDE_DIR=os.path.join(project_dir, "include"),
+        PROJECT_TEST_DIR=os.path.join(project_dir, "test"),
+        PROJECT_LIBDEPS_DIR=os.path.join(project_dir, ".pio", "libdeps"),
+        BUILD_DIR=os.path.join(project_dir, ".pio", "build", "bench"),
+        LIBSOURCE_DIRS=[os.path.join(project_dir, "lib")],
+    )
+    # SCons command line options are not parsed outside of `scons` runner
+    env.AddMethod(lambda _, name: jobs if name == "num_jobs" else None, "GetOption")
+    os.makedirs(env.subst("$BUILD_DIR"), exist_ok=True)
+    # SCons loads the tool as a top-level module
+    lib_builder_cls = sys.modules["piolib"].LibBuilderBase
+    lib_builder_cls._INCLUDE_DIRS_CACHE = None  # pylint: disable=protected-access
+    lib_builder_cls._INCLUDE_SCAN_CACHE = None  # pylint: disable=protected-access
+    return env
+
+
+def run_ldf(project_dir, ldf_mode, jobs=None):
+    env = configure_env(project_dir, ldf_mode, jobs)
+    start = time.time()
+    with redirect_stdout(io.StringIO()):
+        project = env.ConfigureProjectLibBuilder()
+    return env, time.time() - start, len(project.depbuilders)
+
+
+def benchmark_owner_lookup(env):
+    lib_builders = env.GetLibBuilders()
+    paths = []
+    for lb in lib_builders:
+        for root, _, files in os.walk(lb.path):
+            paths.extend(os.path.join(root, f) for f in files)
+
+    start = time.time()
+    linear_result = []
+    for path in paths:
+        linear_result.append(next((lb for lb in lib_builders if path in lb), None))
+    linear_time = time.time() - start
+
+    start = time.time()
+    indexed_result = [env.FindLibBuilderByPath(path) for path in paths]
+    indexed_time = time.time() - start
+
+    assert linear_result == indexed_result
+    return len(paths), linear_time, indexed_time
+
+
+@click.command()
+@click.option("--libs", "libs_nums", default=100, show_default=True)
+@click.option("--headers", "headers_nums", default=5000, show_default=True)
+@click.option("--ldf-mode", default="chain+", show_default=True)
+@click.option(
+    "--parallel", "jobs", type=int, help="Scan files in a pool of N processes"
+)
+def main(libs_nums, headers_nums, ldf_mode, jobs):
+    with tempfile.TemporaryDirectory() as project_dir:
+        generate_project(project_dir, libs_nums, headers_nums)
+        with fs.cd(project_dir):
+            _, cold_time, deps_nums = run_ldf(project_dir, ldf_mode, jobs)
+            env, warm_time, _ = run_ldf(project_dir, ldf_mode, jobs)
+            paths_nums, linear_time, indexed_time = benchmark_owner_lookup(env)
+
+    click.echo(
+        "Project: %d libraries, %d headers, LDF mode %s%s"
+        % (
+            libs_nums,
+            headers_nums,
+            ldf_mode,
+            " (parallel, %d processes)" % jobs if jobs else "",
+        )
+    )
+    click.echo("Found dependencies: %d" % deps_nums)
+    click.echo("LDF, cold include-scan cache: %.3fs" % cold_time)
+    click.echo("LDF, warm include-scan cache: %.3fs" % warm_time)
+    click.echo(
+        "Owner lookup for %d paths: linear %.3fs, indexed %.3fs"
+        % (paths_nums, linear_time, indexed_time)
+    )
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
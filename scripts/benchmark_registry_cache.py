@@ -0,0 +1,180 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Count registry round trips of `pio pkg update` against a local mock registry.
+
+    python scripts/benchmark_registry_cache.py --packages 30
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import click  # noqa: E402
+from click.testing import CliRunner  # noqa: E402
+
+OWNER = "bench"
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+class MockRegistryHandler(BaseHTTPRequestHandler):
+    """Serves `/v3/packages/<owner>/library/<name>` with validators."""
+
+    protocol_version = "HTTP/1.1"
+    stats = None
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        name = self.path.split("?")[0].rstrip("/").split("/")[-1]
+        body = json.dumps(
+            {
+                "id": int(name[3:]),
+                "name": name,
+                "owner": {"username": OWNER},
+                "versions": [{"name": "1.0.0", "files": [{"system": "*"}]}],
+            }
+        ).encode()
+        etag = '"%s-1.0.0"' % name
+        with self.stats["lock"]:
+            self.stats["requests"] += 1
+            if self.headers.get("If-None-Match") == etag:
+                self.stats["not_modified"] += 1
+            else:
+                self.stats["bytes"] += len(body)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+def generate_packages(storage_dir, packages_nums):
+    for index in range(packages_nums):
+        name = "Lib%d" % index
+        pkg_dir = os.path.join(storage_dir, name)
+        os.makedirs(pkg_dir)
+        with open(
+            os.path.join(pkg_dir, "library.json"), mode="w", encoding="utf8"
+        ) as fp:
+            json.dump(dict(name=name, version="1.0.0"), fp)
+        with open(os.path.join(pkg_dir, ".piopm"), mode="w", encoding="utf8") as fp:
+            json.dump(
+                dict(
+                    type="library",
+                    name=name,
+                    version="1.0.0",
+                    spec=dict(owner=OWNER, id=index, name=name),
+                ),
+                fp,
+            )
+
+
+def expire_metadata_cache(cache_dir):
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, encoding="utf8") as fp:
+                entry = json.load(fp)
+            entry["expires"] = 0
+            with open(path, mode="w", encoding="utf8") as fp:
+                json.dump(entry, fp)
+
+
+@click.command()
+@click.option("--packages", "packages_nums", default=30, show_default=True)
+def main(packages_nums):
+    with tempfile.TemporaryDirectory() as core_dir:
+        os.environ["PLATFORMIO_CORE_DIR"] = core_dir
+        # pylint: disable=import-outside-toplevel
+        from innaterapluginio import app, http
+        from innaterapluginio.package.commands.update import package_update_cmd
+        from innaterapluginio.registry.cache import RegistryMetadataCache
+        from innaterapluginio.registry.client import RegistryClient
+
+        stats = dict(lock=threading.Lock(), requests=0, not_modified=0, bytes=0)
+        server = ThreadingHTTPServer(
+            ("127.0.0.1", 0),
+            type("Handler", (MockRegistryHandler,), dict(stats=stats)),
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        registry_url = "http://127.0.0.1:%d" % server.server_port
+
+        def _registry_init(self):
+            http.HTTPClient.__init__(self, [registry_url])
+
+        RegistryClient.__init__ = _registry_init
+        RegistryClient.allowed_private_packages = staticmethod(lambda: False)
+        http.ensure_internet_on = lambda raise_exception=False: True
+
+        storage_dir = os.path.join(core_dir, "libs")
+        generate_packages(storage_dir, packages_nums)
+        args = ["-g", "--storage-dir", storage_dir, "-s"]
+        for index in range(packages_nums):
+            args.extend(["-l", "%s/Lib%d" % (OWNER, index)])
+
+        def _run(label):
+            for key in ("requests", "not_modified", "bytes"):
+                stats[key] = 0
+            start = time.time()
+            result = CliRunner().invoke(package_update_cmd, args)
+            assert result.exit_code == 0, result.output
+            click.echo(
+                "%-28s %8d %8d %10d %8.3fs"
+                % (
+                    label,
+                    stats["requests"],
+                    stats["not_modified"],
+                    stats["bytes"],
+                    time.time() - start,
+                )
+            )
+            return stats["requests"]
+
+        click.echo("Packages: %d" % packages_nums)
+        click.echo(
+            "%-28s %8s %8s %10s %9s"
+            % ("Scenario", "Requests", "304", "Bytes", "Time")
+        )
+        app.set_setting("enable_cache", False)
+        uncached = _run("Cache disabled, 1st update")
+        uncached += _run("Cache disabled, 2nd update")
+        app.set_setting("enable_cache", True)
+        cached = _run("Cold cache")
+        cached += _run("Fresh cache")
+        expire_metadata_cache(RegistryMetadataCache().cache_dir)
+        _run("Expired cache, revalidated")
+        click.echo(
+            "Round trips saved by two consecutive updates: %d of %d"
+            % (uncached - cached, uncached)
+        )
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
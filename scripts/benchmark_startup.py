@@ -0,0 +1,124 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measure the CLI startup time and fail when it exceeds a regression budget.
+
+    python scripts/benchmark_startup.py --runs 10 --project-dir path/to/project
+
+The package is copied to a temporary build directory together with the
+table of CLI commands, as `setup.py build_py` does, so the installed startup
+path is measured. The median wall time of every command is compared with its
+budget in seconds. Telemetry is disabled, so the results do not depend on the
+network.
+"""
+
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+COMMANDS = [
+    ("--version", ["--version"]),
+    ("run --list-targets", ["run", "--list-targets"]),
+]
+
+
+def build_package(build_dir):
+    package_dir = os.path.join(build_dir, "innaterapluginio")
+    shutil.copytree(
+        os.path.join(ROOT_DIR, "innaterapluginio"),
+        package_dir,
+        ignore=shutil.ignore_patterns("__pycache__", "*.pyc"),
+    )
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from innaterapluginio.cli import save_commands_registry; "
+            "save_commands_registry()",
+        ],
+        cwd=build_dir,
+        check=True,
+    )
+
+
+def measure(args, cwd, env, runs):
+    result = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "innaterapluginio"] + args,
+            cwd=cwd,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+        result.append(time.perf_counter() - start)
+    return result
+
+
+@click.command()
+@click.option("--runs", default=10, show_default=True)
+@click.option(
+    "--project-dir",
+    type=click.Path(exists=True, file_okay=False),
+    help="A project for `run --list-targets`, an empty one by default",
+)
+@click.option("--budget-version", default=0.35, show_default=True)
+@click.option("--budget-list-targets", default=0.6, show_default=True)
+def main(runs, project_dir, budget_version, budget_list_targets):
+    budgets = [budget_version, budget_list_targets]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(os.environ, PLATFORMIO_SETTING_ENABLE_TELEMETRY="false")
+        build_dir = os.path.join(tmp_dir, "build")
+        build_package(build_dir)
+        env["PYTHONPATH"] = os.pathsep.join(
+            filter(None, [build_dir, os.environ.get("PYTHONPATH")])
+        )
+        if not project_dir:
+            project_dir = os.path.join(tmp_dir, "project")
+            os.makedirs(project_dir)
+            with open(
+                os.path.join(project_dir, "conf.ini"), mode="w", encoding="utf8"
+            ) as fp:
+                fp.write("[platformio]\n")
+        # warm up the bytecode cache
+        measure(["--version"], project_dir, env, 1)
+
+        click.echo("Runs: %d" % runs)
+        click.echo("%-24s %8s %8s %8s" % ("Command", "Median", "Min", "Budget"))
+        exceeded = []
+        for (label, args), budget in zip(COMMANDS, budgets):
+            timings = measure(args, project_dir, env, runs)
+            median = statistics.median(timings)
+            click.echo(
+                "%-24s %7.3fs %7.3fs %7.3fs" % (label, median, min(timings), budget)
+            )
+            if median > budget:
+                exceeded.append(label)
+
+    if exceeded:
+        raise click.ClickException(
+            "Startup time budget is exceeded by: %s" % ", ".join(exceeded)
+        )
+    click.secho("Startup time is within the budget", fg="green")
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
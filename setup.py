@@ -10,7 +10,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+
 from setuptools import find_packages, setup
+from setuptools.command.build_py import build_py
 
 from innaterapluginio import (
     __author__,
@@ -23,6 +26,21 @@ from innaterapluginio import (
 )
 from innaterapluginio.dependencies import get_pip_dependencies
 
+
+class BuildPyCommand(build_py):
+    """Precompute the table of CLI commands for a faster startup."""
+
+    def run(self):
+        super().run()
+        if self.dry_run:
+            return
+        try:
+            # pylint: disable=import-outside-toplevel
+            from innaterapluginio.cli import save_commands_registry
+        except ImportError:  # the commands are discovered at runtime
+            return
+        save_commands_registry(os.path.join(self.build_lib, "innaterapluginio"))
+
 setup(
     name=__title__,
     version=__version__,
@@ -32,6 +50,7 @@ setup(
     author_email=__email__,
     url=__url__,
     license=__license__,
+    cmdclass={"build_py": BuildPyCommand},
     install_requires=get_pip_dependencies(),
     python_requires=">=3.6",
     packages=find_packages(include=["innaterapluginio", "innaterapluginio.*"]),
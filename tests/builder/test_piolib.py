@@ -0,0 +1,290 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+
+import pytest
+import SCons.Defaults
+import SCons.Node.FS
+from SCons.Script import DefaultEnvironment
+
+from Innatera import fs
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode="w", encoding="utf8") as fp:
+        fp.write(content)
+
+
+def _deps_tree(lb):
+    return [(item.name, _deps_tree(item)) for item in lb.depbuilders]
+
+
+class LDFRunner:
+    def __init__(self, project_dir, monkeypatch):
+        self.project_dir = project_dir
+        self.monkeypatch = monkeypatch
+        self.env = None
+        self.ldf_mode = None
+        self.jobs = None
+
+    def write(self, path, content):
+        _write(os.path.join(self.project_dir, path), content)
+
+    def configure(self, ldf_mode="chain", jobs=None):
+        self.ldf_mode = ldf_mode
+        self.jobs = jobs
+        self.write(
+            "conf.ini",
+            "[env:test]\nlib_ldf_mode = %s\nlib_ldf_parallel = %s\n"
+            % (ldf_mode, "yes" if jobs else "no"),
+        )
+        self.monkeypatch.setattr(SCons.Defaults, "_default_env", None)
+        self.env = DefaultEnvironment(
+            tools=["piobuild", "pioproject", "piolib"],
+            toolpath=[os.path.join(fs.get_source_dir(), "builder", "tools")],
+            PROJECT_CONFIG=os.path.join(self.project_dir, "conf.ini"),
+            PIOENV="test",
+            BUILD_TYPE="release",
+            PROJECT_DIR=self.project_dir,
+            PROJECT_SRC_DIR=os.path.join(self.project_dir, "src"),
+            PROJECT_INCLUDE_DIR=os.path.join(self.project_dir, "include"),
+            PROJECT_TEST_DIR=os.path.join(self.project_dir, "test"),
+            PROJECT_LIBDEPS_DIR=os.path.join(self.project_dir, ".pio", "libdeps"),
+            BUILD_DIR=os.path.join(self.project_dir, ".pio", "build", "test"),
+            LIBSOURCE_DIRS=[os.path.join(self.project_dir, "lib")],
+        )
+        # SCons command line options are not parsed outside of `scons` runner
+        self.env.AddMethod(
+            lambda _, name: jobs if name == "num_jobs" else None, "GetOption"
+        )
+        os.makedirs(self.env.subst("$BUILD_DIR"), exist_ok=True)
+        return self.env
+
+    @property
+    def lib_builder_cls(self):
+        # SCons loads the tool as a top-level module
+        return sys.modules["piolib"].LibBuilderBase
+
+    def run(self):
+        # start a new build process, SCons caches the state of files in nodes
+        self.monkeypatch.setattr(SCons.Node.FS, "default_fs", None)
+        self.configure(self.ldf_mode, self.jobs)
+        self.monkeypatch.setattr(self.lib_builder_cls, "_INCLUDE_DIRS_CACHE", None)
+        self.monkeypatch.setattr(self.lib_builder_cls, "_INCLUDE_SCAN_CACHE", None)
+        with redirect_stdout(io.StringIO()):
+            return self.env.ConfigureProjectLibBuilder()
+
+
+@pytest.fixture
+def ldf(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return LDFRunner(str(tmp_path), monkeypatch)
+
+
+def test_dependency_graph(ldf):
+    ldf.write("src/main.cpp", '#include "b.h"\n#include "a.h"\n')
+    ldf.write("lib/A/src/a.h", '#include "a_impl.h"\n')
+    ldf.write("lib/A/src/a_impl.h", '#include "c.h"\n')
+    ldf.write("lib/B/b.h", '#include "c.h"\n')
+    ldf.write("lib/C/c.h", "\n")
+    ldf.write("lib/Unused/unused.h", "\n")
+    ldf.configure()
+    project = ldf.run()
+    assert _deps_tree(project) == [("A", [("C", [])]), ("B", [("C", [])])]
+    unused = [lb for lb in ldf.env.GetLibBuilders() if lb.name == "Unused"]
+    assert not unused[0].is_dependent
+
+
+def test_circular_dependencies(ldf):
+    # pylint: disable=protected-access
+    ldf.write("src/main.cpp", '#include "a.h"\n')
+    ldf.write("lib/A/a.h", '#include "b.h"\n')
+    ldf.write("lib/B/b.h", '#include "a.h"\n')
+    ldf.configure()
+    assert _deps_tree(ldf.run()) == [("A", [("B", [])])]
+    lb = next(lb for lb in ldf.env.GetLibBuilders() if lb.name == "B")
+    assert [item.name for item in lb._circular_deps] == ["A"]
+
+
+def test_dense_dependency_graph(ldf):
+    # pylint: disable=protected-access
+    # the number of paths between the libraries grows exponentially
+    libs_nums = 40
+    for index in range(libs_nums):
+        ldf.write(
+            "lib/L%d/l%d.h" % (index, index),
+            "".join(
+                '#include "l%d.h"\n' % dep for dep in (index - 1, index - 2) if dep >= 0
+            ),
+        )
+    ldf.write(
+        "src/main.cpp",
+        "".join('#include "l%d.h"\n' % index for index in range(libs_nums)),
+    )
+    ldf.configure()
+    project = ldf.run()
+    assert len(project.depbuilders) == libs_nums
+    for lb in project.depbuilders:
+        index = int(lb.name[1:])
+        assert sorted(item.name for item in lb.depbuilders) == sorted(
+            "L%d" % dep for dep in (index - 1, index - 2) if dep >= 0
+        )
+        assert not lb._circular_deps
+
+
+@pytest.mark.parametrize("ldf_mode", ["chain", "chain+", "deep", "deep+"])
+def test_dependency_graph_with_include_scan_cache(ldf, ldf_mode):
+    ldf.write("src/main.cpp", '#include "a.h"\n')
+    ldf.write("lib/A/src/a.h", '#ifdef USE_B\n#include "b.h"\n#endif\n')
+    ldf.write("lib/A/src/a.cpp", '#include "c.h"\n')
+    ldf.write("lib/B/b.h", "\n")
+    ldf.write("lib/C/c.h", '#include "b.h"\n')
+    ldf.configure(ldf_mode)
+    expected = _deps_tree(ldf.run())
+    assert expected
+    assert os.path.isfile(os.path.join(ldf.env.subst("$BUILD_DIR"), "ldfcache.json"))
+    # results of the persistent cache match a cold scan
+    assert _deps_tree(ldf.run()) == expected
+
+
+@pytest.mark.parametrize("ldf_mode", ["chain", "chain+"])
+def test_include_scan_cache_new_header(ldf, ldf_mode):
+    ldf.write("src/main.cpp", '#include "a.h"\n#include "a_extra.h"\n')
+    ldf.write("lib/A/src/a.h", "\n")
+    ldf.write("lib/C/c.h", "\n")
+    ldf.configure(ldf_mode)
+    assert _deps_tree(ldf.run()) == [("A", [])]
+    # an unresolved include appears in the include dir of a known library
+    ldf.write("lib/A/src/a_extra.h", '#include "c.h"\n')
+    result = _deps_tree(ldf.run())
+    assert "C" in str(result)
+    os.remove(os.path.join(ldf.env.subst("$BUILD_DIR"), "ldfcache.json"))
+    assert _deps_tree(ldf.run()) == result
+
+
+def test_include_scan_cache_new_nested_header(ldf):
+    ldf.write("src/main.cpp", '#include "a.h"\n#include "sub/config.h"\n')
+    ldf.write("lib/A/src/a.h", "\n")
+    ldf.write("lib/A/src/sub/dummy.h", "\n")
+    ldf.write("lib/C/c.h", "\n")
+    ldf.configure()
+    assert _deps_tree(ldf.run()) == [("A", [])]
+    # the mtime of the include dir does not change
+    ldf.write("lib/A/src/sub/config.h", '#include "c.h"\n')
+    assert _deps_tree(ldf.run()) == [("A", [("C", [])])]
+
+
+def test_include_scan_cache_new_local_header(ldf):
+    ldf.write("src/main.cpp", '#include "a.h"\n#include "local.h"\n')
+    ldf.write("lib/A/src/a.h", "\n")
+    ldf.write("lib/C/c.h", "\n")
+    ldf.configure()
+    assert _deps_tree(ldf.run()) == [("A", [])]
+    ldf.write("src/local.h", '#include "c.h"\n')
+    assert _deps_tree(ldf.run()) == [("A", []), ("C", [])]
+
+
+def test_include_scan_cache_shadowed_header(ldf):
+    ldf.write("src/main.cpp", '#include "foo.h"\n#include "sub/bar.h"\n')
+    ldf.write("include/README", "\n")
+    ldf.write("lib/B/foo.h", "\n")
+    ldf.write("lib/C/sub/bar.h", "\n")
+    ldf.configure()
+    assert _deps_tree(ldf.run()) == [("B", []), ("C", [])]
+    # a new header of the earlier include dir shadows the resolved one
+    ldf.write("include/foo.h", "\n")
+    assert _deps_tree(ldf.run()) == [("C", [])]
+    ldf.write("include/sub/bar.h", "\n")
+    assert _deps_tree(ldf.run()) == []
+    os.remove(os.path.join(ldf.env.subst("$BUILD_DIR"), "ldfcache.json"))
+    assert _deps_tree(ldf.run()) == []
+
+
+def test_include_scan_cache_shadowed_local_header(ldf):
+    ldf.write("src/main.cpp", '#include "a.h"\n')
+    ldf.write("lib/A/src/a.h", '#include "sub/foo.h"\n')
+    ldf.write("lib/A/src/a.cpp", '#include "a.h"\n')
+    ldf.write("lib/B/sub/foo.h", "\n")
+    ldf.configure()
+    assert _deps_tree(ldf.run()) == [("A", [("B", [])])]
+    # a new header next to the including file
+    ldf.write("lib/A/src/sub/foo.h", "\n")
+    assert _deps_tree(ldf.run()) == [("A", [])]
+
+
+def test_include_scan_cache_reuse(ldf, monkeypatch):
+    ldf.write("src/main.cpp", '#include "a.h"\n#include <system.h>\n')
+    ldf.write("lib/A/src/a.h", '#ifdef USE_B\n#include "b.h"\n#endif\n')
+    ldf.write("lib/B/b.h", "\n")
+    ldf.configure("chain+")
+    expected = _deps_tree(ldf.run())
+    assert expected == [("A", [])]
+
+    scanned = []
+    scanner = ldf.lib_builder_cls.run_include_scanner
+
+    def _run_include_scanner(lb, node, include_dirs):
+        scanned.append(node.get_abspath())
+        return scanner(lb, node, include_dirs)
+
+    monkeypatch.setattr(
+        ldf.lib_builder_cls, "run_include_scanner", _run_include_scanner
+    )
+    # unresolved and excluded includes do not invalidate the entries
+    assert _deps_tree(ldf.run()) == expected
+    assert not scanned
+
+
+@pytest.mark.parametrize("ldf_mode", ["chain", "chain+", "deep", "deep+"])
+def test_parallel_scan(ldf, ldf_mode, monkeypatch):
+    # pylint: disable=protected-access
+    for index in range(20):
+        ldf.write(
+            "lib/L%d/l%d.h" % (index, index),
+            "".join('#include "l%d.h"\n' % dep for dep in range(index % 5, index, 5)),
+        )
+        ldf.write("lib/L%d/l%d.cpp" % (index, index), '#include "l%d.h"\n' % index)
+    ldf.write("lib/A/src/a.h", '#ifdef USE_L1\n#include "l1.h"\n#endif\n')
+    ldf.write(
+        "src/main.cpp",
+        '#include "a.h"\n' + "".join('#include "l%d.h"\n' % i for i in (19, 17)),
+    )
+    ldf.configure(ldf_mode)
+    expected = _deps_tree(ldf.run())
+    assert "L4" in str(expected)
+    os.remove(os.path.join(ldf.env.subst("$BUILD_DIR"), "ldfcache.json"))
+
+    scanned = []
+    scanner = ldf.lib_builder_cls.run_include_scanner
+
+    def _run_include_scanner(lb, node, include_dirs):
+        scanned.append(node.get_abspath())
+        return scanner(lb, node, include_dirs)
+
+    ldf.configure(ldf_mode, jobs=2)
+    monkeypatch.setattr(
+        ldf.lib_builder_cls, "run_include_scanner", _run_include_scanner
+    )
+    assert _deps_tree(ldf.run()) == expected
+    # the files are scanned by the workers
+    assert not scanned
+    assert not ldf.lib_builder_cls._INCLUDE_SCAN_EXECUTOR
+    # the merged results are stored in the include-scan cache
+    assert _deps_tree(ldf.run()) == expected
+    assert not scanned
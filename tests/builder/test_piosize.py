@@ -0,0 +1,98 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import os
+import threading
+import time
+
+import pytest
+
+from Innatera.builder.tools import piosize
+
+
+class FakePlatform:
+    name = "native"
+    version = "1.0.0"
+
+
+class FakeEnv(dict):
+    def __init__(self, build_dir, jobs=4):
+        super().__init__(ENV={"PATH": os.environ.get("PATH", "")})
+        self.build_dir = build_dir
+        self.jobs = jobs
+
+    def subst(self, value):
+        return {"$BUILD_DIR": self.build_dir, "$CC": "arm-none-eabi-gcc"}[value]
+
+    def GetOption(self, name):  # pylint: disable=invalid-name
+        return self.jobs if name == "num_jobs" else None
+
+    def PioPlatform(self):  # pylint: disable=invalid-name
+        return FakePlatform()
+
+
+@pytest.fixture
+def env(tmp_path):
+    return FakeEnv(str(tmp_path / "build"))
+
+
+def test_run_tool_chunked(env, monkeypatch):
+    monkeypatch.setattr(piosize, "TOOL_CHUNK_SIZE", 3)
+    threads = set()
+
+    def _exec_command(cmd, **_):
+        threads.add(threading.current_thread().name)
+        with open(cmd[-1][1:], encoding="utf8") as fp:
+            tool_args = fp.read().split("\n")
+        # the last chunks are finished first
+        time.sleep(0.005 * (20 - int(tool_args[0], 16)))
+        return {"out": "".join("%s:1\n" % arg for arg in tool_args), "returncode": 0}
+
+    monkeypatch.setattr(piosize, "exec_command", _exec_command)
+    tool_args = ["0x%x" % index for index in range(20)]
+    result = piosize._run_tool_chunked(  # pylint: disable=protected-access
+        ["addr2line", "-e", "firmware.elf"], env, tool_args
+    )
+    assert result == ["%s:1" % arg for arg in tool_args]
+    assert len(threads) > 1
+    # the temporary files of chunks are removed
+    assert os.listdir(env.build_dir) == []
+
+
+def test_symbols_cache(env, monkeypatch):
+    build_ids = iter(["id1", "id1", "id2"])
+    resolved = []
+
+    def _resolve_symbols_info(env, elffile, elf_path, sections):
+        resolved.append(elf_path)
+        return [{"name": "main", "addr": len(resolved)}]
+
+    monkeypatch.setattr(
+        piosize, "_get_elf_build_id", lambda elffile, elf_path: next(build_ids)
+    )
+    monkeypatch.setattr(piosize, "_resolve_symbols_info", _resolve_symbols_info)
+    os.makedirs(env.build_dir)
+
+    def _collect_symbols_info():
+        # pylint: disable=protected-access
+        return piosize._collect_symbols_info(env, None, "firmware.elf", {})
+
+    assert _collect_symbols_info() == [{"name": "main", "addr": 1}]
+    assert os.path.isfile(os.path.join(env.build_dir, "sizedata-symbols.json"))
+    # the same build ID, the symbols are reused
+    assert _collect_symbols_info() == [{"name": "main", "addr": 1}]
+    assert len(resolved) == 1
+    # a new firmware
+    assert _collect_symbols_info() == [{"name": "main", "addr": 2}]
+    assert len(resolved) == 2
@@ -12,6 +12,9 @@
 
 from pathlib import Path
 
+import pytest
+
+from Innatera.run import cli as run_cli
 from Innatera.run.cli import cli as cmd_run
 
 
@@ -442,3 +445,86 @@ platform = native
     )
     result = clirunner.invoke(cmd_run, ["--project-dir", str(project_dir)])
     validate_cliresult(result)
+
+
+def test_parallel_envs(clirunner, validate_cliresult, tmpdir, monkeypatch):
+    tmpdir.join("conf.ini").write(
+        """
+[env:a]
+platform = native
+
+[env:b]
+platform = native
+
+[env:c]
+platform = native
+"""
+    )
+    calls = []
+
+    def _exec_command(args, **_):
+        calls.append(args)
+        return {"out": "Output of %s" % args[-1], "err": None, "returncode": 0}
+
+    monkeypatch.setattr(run_cli.proc, "exec_command", _exec_command)
+    result = clirunner.invoke(
+        cmd_run,
+        [
+            "-d",
+            str(tmpdir),
+            "-e",
+            "a",
+            "-e",
+            "b",
+            "--parallel-envs",
+            "2",
+            "--monitor-port",
+            "/dev/ttyUSB0",
+        ],
+    )
+    validate_cliresult(result)
+    assert sorted(args[-1] for args in calls) == ["a", "b"]
+    for args in calls:
+        # children leave the summary to the parent process
+        assert "--disable-summary" in args
+        assert args[args.index("--monitor-port") + 1] == "/dev/ttyUSB0"
+    assert "Output of a" in result.output and "Output of b" in result.output
+    assert result.output.count("2 succeeded in") == 1
+
+
+@pytest.mark.parametrize("env_targets", ["upload, monitor", "upload", "monitor"])
+def test_parallel_envs_serial_targets(
+    clirunner, validate_cliresult, tmpdir, monkeypatch, env_targets
+):
+    tmpdir.join("conf.ini").write(
+        """
+[env:a]
+platform = native
+
+[env:b]
+platform = native
+targets = %s
+"""
+        % env_targets
+    )
+    processed_envs = []
+
+    def _process_env(_, name, *__):
+        processed_envs.append(name)
+        return {"env": name, "duration": 0, "succeeded": True}
+
+    monkeypatch.setattr(run_cli, "process_env", _process_env)
+    monkeypatch.setattr(
+        run_cli, "process_envs_in_parallel", lambda *_, **__: pytest.fail()
+    )
+    result = clirunner.invoke(cmd_run, ["-d", str(tmpdir), "--parallel-envs", "2"])
+    validate_cliresult(result)
+    # a monitor needs the terminal and uploads could share a port,
+    # environments are processed serially
+    assert processed_envs == ["a", "b"]
+    processed_envs.clear()
+    result = clirunner.invoke(
+        cmd_run, ["-d", str(tmpdir), "--parallel-envs", "2", "-t", "upload"]
+    )
+    validate_cliresult(result)
+    assert processed_envs == ["a", "b"]
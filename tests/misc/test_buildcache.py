@@ -0,0 +1,118 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import json
+import os
+
+import pytest
+
+from Innatera.project.config import ProjectConfig
+from Innatera.system.buildcache import BuildCacheStorage
+from Innatera.system.cli import cli
+
+
+def _add_entry(cache_dir, name, size, mtime):
+    path = cache_dir / name[:2] / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"\x00" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    result = tmp_path / "cache"
+    result.mkdir()
+    # a service file of the build system
+    (result / "config").write_text("{}")
+    return result
+
+
+def test_stats(cache_dir):
+    _add_entry(cache_dir, "aa01", 100, 1000)
+    _add_entry(cache_dir, "bb01", 200, 2000)
+    storage = BuildCacheStorage(str(cache_dir))
+    storage.commit(requests=4, hits=3, bytes_saved=300, pushes=1, bytes_pushed=100)
+    storage.commit(requests=4, hits=1, bytes_saved=100)
+    stats = storage.get_stats()
+    assert stats["entries"] == 2
+    assert stats["size"] == 300
+    assert stats["requests"] == 8
+    assert stats["hits"] == 4
+    assert stats["misses"] == 4
+    assert stats["hit_rate"] == 50.0
+    assert stats["bytes_saved"] == 400
+    assert stats["pushes"] == 1
+
+
+def test_stats_corrupted_file(cache_dir):
+    (cache_dir / BuildCacheStorage.STATS_FILE_NAME).write_text("[1, 2")
+    stats = BuildCacheStorage(str(cache_dir)).get_stats()
+    assert stats["requests"] == 0
+    assert stats["hit_rate"] == 0.0
+
+
+def test_lru_eviction(cache_dir):
+    entries = [
+        _add_entry(cache_dir, "%02x01" % index, 100, 1000 + index)
+        for index in range(10)
+    ]
+    storage = BuildCacheStorage(str(cache_dir))
+    # below the limit
+    storage.commit(size_limit=1000, requests=1)
+    assert all(path.is_file() for path in entries)
+    # a retrieved entry is touched by the build system
+    os.utime(entries[0], (5000, 5000))
+    _add_entry(cache_dir, "ff01", 100, 3000)
+    data = storage.commit(size_limit=1000, pushes=1, bytes_pushed=100)
+    # evicted down to 90% of the limit, the least recently used go first
+    assert data["evictions"] == 2
+    assert data["bytes_evicted"] == 200
+    assert data["size"] == 900
+    assert entries[0].is_file()
+    assert not entries[1].is_file()
+    assert not entries[2].is_file()
+    assert entries[3].is_file()
+    assert storage.get_usage() == (9, 900)
+
+
+def test_default_size_limit():
+    assert ProjectConfig().get("platformio", "build_cache_size") == 4096
+
+
+def test_stats_command(clirunner, validate_cliresult, cache_dir):
+    _add_entry(cache_dir, "aa01", 1024, 1000)
+    BuildCacheStorage(str(cache_dir)).commit(requests=4, hits=1, bytes_saved=1024)
+    result = clirunner.invoke(
+        cli, ["cache", "stats", "--cache-dir", str(cache_dir), "--json-output"]
+    )
+    validate_cliresult(result)
+    data = json.loads(result.output)
+    assert data["path"] == str(cache_dir)
+    assert data["entries"] == 1
+    assert data["hit_rate"] == 25.0
+    assert data["size_limit"] == 4096 * 1024 * 1024
+
+    result = clirunner.invoke(cli, ["cache", "stats", "--cache-dir", str(cache_dir)])
+    validate_cliresult(result)
+    assert "Hit Rate" in result.output
+    assert "25.0%" in result.output
+
+
+def test_stats_command_without_cache(clirunner, tmp_path):
+    result = clirunner.invoke(
+        cli, ["cache", "stats", "--cache-dir", str(tmp_path / "unknown")]
+    )
+    assert result.exit_code != 0
+    assert "does not exist" in result.output
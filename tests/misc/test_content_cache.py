@@ -0,0 +1,237 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from Innatera import cache as cache_module
+from Innatera.cache import ContentCache
+
+WRITER_SCRIPT = """
+import sys
+
+from %s import ContentCache
+
+prefix = sys.argv[1]
+for index in range(1, 200):
+    with ContentCache() as cc:
+        assert cc.set("%%s-%%d" %% (prefix, index), "x" * index, "1h")
+        half = (index + 1) // 2
+        assert cc.get("%%s-%%d" %% (prefix, half)) == "x" * half
+""" % ContentCache.__module__
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    result = tmp_path / "cache"
+    monkeypatch.setenv("PLATFORMIO_CACHE_DIR", str(result))
+    return result
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    result = FakeClock()
+    monkeypatch.setattr(cache_module, "time", result)
+    return result
+
+
+def _get_size(cc):
+    # pylint: disable=protected-access
+    conn = cc._connect()
+    assert (
+        dict(conn.execute("SELECT name, value FROM meta"))["size"]
+        == conn.execute("SELECT COALESCE(SUM(size), 0) FROM items").fetchone()[0]
+    )
+    return conn.execute("SELECT COUNT(*), SUM(size) FROM items").fetchone()
+
+
+def test_get_set(cache_dir):
+    with ContentCache() as cc:
+        assert cc.cache_dir == str(cache_dir / "content")
+        assert cc.get("foo") is None
+        assert cc.set("foo", "bar", "1h")
+        assert cc.get("foo") == "bar"
+        assert cc.set("foo", "é", "1h")
+        assert cc.get("foo") == "é"
+        assert _get_size(cc) == (1, 2)
+        # empty data removes an item
+        assert not cc.set("foo", "", "1h")
+        assert cc.get("foo") is None
+        assert cc.set("foo", "bar", "1h")
+        assert cc.delete(["foo"])
+        assert cc.get("foo") is None
+        assert _get_size(cc) == (0, None)
+    # the namespaces are isolated
+    with ContentCache("http") as cc:
+        cc.set("foo", "baz", "1h")
+    with ContentCache() as cc:
+        assert cc.get("foo") is None
+    with ContentCache("http") as cc:
+        assert cc.get("foo") == "baz"
+
+
+def test_disabled_cache(cache_dir, monkeypatch):
+    monkeypatch.setattr(
+        cache_module.app,
+        "get_setting",
+        lambda name: False if name == "enable_cache" else None,
+    )
+    with ContentCache() as cc:
+        assert not cc.set("foo", "bar", "1h")
+        assert cc.get("foo") is None
+
+
+def test_expiration(cache_dir, clock):
+    with ContentCache() as cc:
+        cc.set("seconds", "1", "30s")
+        cc.set("minutes", "2", "2m")
+        cc.set("days", "3", "1d")
+        clock.now += 30
+        assert cc.get("seconds") is None
+        assert cc.get("minutes") == "2"
+        clock.now += 90
+        assert cc.get("minutes") is None
+        assert cc.get("days") == "3"
+        # the expired items are removed explicitly
+        assert _get_size(cc)[0] == 3
+        assert cc.delete()
+        assert _get_size(cc)[0] == 1
+        with pytest.raises(AssertionError):
+            cc.set("weeks", "4", "1w")
+
+
+def test_purge_interval(cache_dir, clock):
+    with ContentCache() as cc:
+        cc.set("foo", "1", "10s")
+        cc.set("bar", "2", "10s")
+        clock.now += 20
+        cc.set("baz", "3", "10s")
+        assert _get_size(cc)[0] == 3
+        # the expired items are removed periodically
+        clock.now += ContentCache.PURGE_INTERVAL + 1
+        cc.set("baz", "3", "10s")
+        assert _get_size(cc)[0] == 1
+
+
+def test_eviction(cache_dir, clock, monkeypatch):
+    monkeypatch.setattr(ContentCache, "MAX_SIZE", 1000)
+    with ContentCache() as cc:
+        for index in range(10):
+            assert cc.set("item-%d" % index, "x" * 100, "%ds" % (100 - index))
+        assert _get_size(cc) == (10, 1000)
+        # the items closest to expiration are evicted down to 90% of the limit
+        assert cc.set("item-10", "x" * 100, "1h")
+        assert _get_size(cc) == (9, 900)
+        assert cc.get("item-10")
+        assert cc.get("item-0")
+        assert cc.get("item-8") is None
+        assert cc.get("item-9") is None
+        # an item larger than the limit is not kept
+        assert cc.set("item-11", "x" * 2000, "2h")
+        assert _get_size(cc) == (0, None)
+
+
+def test_legacy_index(cache_dir):
+    content_dir = cache_dir / "content"
+    content_dir.mkdir(parents=True)
+    for name in ("aa", "bb"):
+        (content_dir / name).write_text("legacy")
+    (content_dir / "unknown").write_text("user data")
+    (content_dir / "db.data").write_text("1000=aa\n2000=bb\n3000=cc\n")
+    with ContentCache() as cc:
+        assert cc.get("aa") is None
+        assert cc.set("aa", "new", "1h")
+        assert cc.get("aa") == "new"
+    assert not (content_dir / "db.data").exists()
+    assert not (content_dir / "aa").exists()
+    assert not (content_dir / "bb").exists()
+    assert (content_dir / "unknown").exists()
+
+
+@pytest.mark.parametrize(
+    "offset,content",
+    [(0, b"\xff" * 4096), (0, b"garbage" * 1024), (100, b"\xff" * 8192)],
+    ids=["header", "text", "pages"],
+)
+def test_corrupted_db(cache_dir, offset, content):
+    with ContentCache() as cc:
+        cc.set("foo", "bar", "1h")
+    db_path = cache_dir / "content" / ContentCache.DB_NAME
+    with open(str(db_path), "r+b") as fp:
+        fp.seek(offset)
+        fp.write(content)
+    # the corrupted database is replaced with a new one
+    with ContentCache() as cc:
+        assert cc.get("foo") is None
+        assert cc.set("foo", "baz", "1h")
+        assert cc.get("foo") == "baz"
+    # the database is corrupted while it is open
+    with ContentCache() as cc:
+        assert cc.get("foo") == "baz"
+        with open(str(db_path), "wb") as fp:
+            fp.write(b"garbage" * 1024)
+        cc.close()
+        assert cc.get("foo") is None
+        assert cc.delete("foo") is not None
+        assert cc.set("foo", "qux", "1h")
+        assert cc.get("foo") == "qux"
+
+
+def test_locked_db(cache_dir, monkeypatch):
+    monkeypatch.setattr(ContentCache, "LOCK_TIMEOUT", 0.1)
+    with ContentCache() as cc:
+        cc.set("foo", "bar", "1h")
+    with ContentCache() as other:
+        # pylint: disable=protected-access
+        other._connect().execute("BEGIN EXCLUSIVE")
+        # a failed write is skipped, a failed read is a miss
+        with ContentCache() as cc:
+            assert not cc.set("foo", "baz", "1h")
+            assert not cc.delete("foo")
+            assert cc.get("foo") is None
+        other._connect().execute("ROLLBACK")
+    with ContentCache() as cc:
+        assert cc.get("foo") == "bar"
+        assert cc.set("foo", "baz", "1h")
+
+
+def test_shared_between_processes(cache_dir, tmp_path):
+    processes = [
+        subprocess.Popen(  # pylint: disable=consider-using-with
+            [sys.executable, "-c", WRITER_SCRIPT, prefix],
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+            cwd=str(tmp_path),
+            stderr=subprocess.PIPE,
+        )
+        for prefix in ("a", "b", "c")
+    ]
+    for process in processes:
+        _, stderr = process.communicate(timeout=120)
+        assert process.returncode == 0, stderr
+    with ContentCache() as cc:
+        for prefix in ("a", "b", "c"):
+            for index in range(1, 200):
+                assert cc.get("%s-%d" % (prefix, index)) == "x" * index
+        assert _get_size(cc) == (3 * 199, 3 * sum(range(200)))
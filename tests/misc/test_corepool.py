@@ -0,0 +1,94 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import asyncio
+import json
+
+import pytest
+
+from Innatera.corepool import CoreWorkerPool
+
+
+@pytest.fixture
+def pool():
+    result = CoreWorkerPool(size=2)
+    yield result
+    result.close()
+
+
+def _make_project(tmpdir, env_name):
+    project_dir = tmpdir.mkdir(env_name)
+    project_dir.join("conf.ini").write("[env:%s]\nplatform = native\n" % env_name)
+    return str(project_dir)
+
+
+def test_concurrent_calls(pool, tmpdir, func_isolated_pio_core):
+    async def _main():
+        return await asyncio.gather(
+            pool.call(
+                ["project", "config", "--json-output"],
+                cwd=_make_project(tmpdir, "foo"),
+            ),
+            pool.call(
+                ["project", "config", "--json-output"],
+                cwd=_make_project(tmpdir, "bar"),
+            ),
+            pool.call(
+                ["settings", "get", "enable_telemetry"],
+                env={"PLATFORMIO_SETTING_ENABLE_TELEMETRY": "no"},
+            ),
+            pool.call(["settings", "get", "enable_telemetry"]),
+        )
+
+    first, second, telemetry_off, telemetry_default = asyncio.run(_main())
+    assert first[2] == 0 and second[2] == 0
+    assert json.loads(first[0])[0][0] == "env:foo"
+    assert json.loads(second[0])[0][0] == "env:bar"
+    assert "No" in telemetry_off[0] and "Yes" in telemetry_default[0]
+
+
+def test_crashed_worker_is_replaced(pool, func_isolated_pio_core):
+    pool.size = 1
+    pool.start()
+    # pylint: disable=protected-access
+    crashed = pool._workers[0]
+    crashed.process.kill()
+    crashed.process.join()
+
+    async def _call():
+        return await pool.call(["settings", "get", "enable_telemetry"])
+
+    with pytest.raises((EOFError, OSError)):
+        asyncio.run(_call())
+    assert crashed not in pool._workers
+    assert len(pool._workers) == 1
+    assert asyncio.run(_call())[2] == 0
+
+
+def test_cancelled_call_replaces_worker(pool, func_isolated_pio_core):
+    pool.size = 1
+
+    async def _main():
+        pool.start()
+        busy = pool._workers[0]  # pylint: disable=protected-access
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pool.call(["system", "info"]), 0.01)
+        assert busy not in pool._workers  # pylint: disable=protected-access
+        assert not busy.process.is_alive()
+        # the next call does not receive the output of the abandoned one
+        return await pool.call(["settings", "get", "enable_telemetry"])
+
+    stdout, _, exit_code = asyncio.run(_main())
+    assert exit_code == 0
+    assert "enable_telemetry" in stdout
@@ -0,0 +1,105 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests.adapters
+
+from Innatera import http
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class CountingHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    connections_nums = 0
+
+    def process_request(self, request, client_address):
+        self.connections_nums += 1
+        super().process_request(request, client_address)
+
+
+@pytest.fixture
+def pooled_adapters(monkeypatch):
+    result = {}
+    monkeypatch.setattr(http, "_POOLED_ADAPTERS", result)
+    return result
+
+
+@pytest.fixture
+def server(monkeypatch):
+    for name in ("HTTP_PROXY", "HTTPS_PROXY", "ALL_PROXY"):
+        monkeypatch.delenv(name, raising=False)
+        monkeypatch.delenv(name.lower(), raising=False)
+    obj = CountingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=obj.serve_forever, daemon=True)
+    thread.start()
+    yield obj
+    obj.shutdown()
+    obj.server_close()
+
+
+def test_shared_adapter(pooled_adapters):
+    sessions = [http.HTTPSession(), http.HTTPSession()]
+    adapter = sessions[0].get_adapter("https://example.com")
+    assert isinstance(adapter, http.PooledHTTPAdapter)
+    assert sessions[1].get_adapter("http://example.com") is adapter
+    assert list(pooled_adapters.values()) == [adapter]
+    # the adapter with retries is shared too
+    retry_sessions = [next(http.HTTPSessionIterator("https://example.com/"))]
+    retry_sessions.append(next(http.HTTPSessionIterator("https://example.com/")))
+    retry_adapter = retry_sessions[0].get_adapter("https://example.com/api")
+    assert retry_adapter is not adapter
+    assert retry_adapter.max_retries.total == http.DEFAULT_RETRY.total
+    assert retry_sessions[1].get_adapter("https://example.com/api") is retry_adapter
+
+
+def test_closed_session_keeps_connections(pooled_adapters, server):
+    url = "http://127.0.0.1:%d/" % server.server_address[1]
+    for _ in range(3):
+        session = http.HTTPSession()
+        assert session.get(url).text == "ok"
+        session.close()
+    # the next session reuses the kept-alive connection
+    assert server.connections_nums == 1
+
+
+def test_pool_settings(pooled_adapters, monkeypatch):
+    # pylint: disable=protected-access
+    monkeypatch.setenv("PLATFORMIO_SETTING_HTTP_POOL_CONNECTIONS", "3")
+    monkeypatch.setenv("PLATFORMIO_SETTING_HTTP_POOL_MAXSIZE", "5")
+    adapter = http.get_pooled_http_adapter()
+    assert adapter.poolmanager.connection_pool_kw["maxsize"] == 5
+    assert adapter.poolmanager.pools._maxsize == 3
+    # an invalid value falls back to the defaults of `requests`
+    pooled_adapters.clear()
+    monkeypatch.setenv("PLATFORMIO_SETTING_HTTP_POOL_MAXSIZE", "many")
+    adapter = http.get_pooled_http_adapter()
+    assert (
+        adapter.poolmanager.connection_pool_kw["maxsize"]
+        == requests.adapters.DEFAULT_POOLSIZE
+    )
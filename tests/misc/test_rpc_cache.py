@@ -0,0 +1,121 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import asyncio
+import threading
+
+import pytest
+
+from Innatera.home.rpc.cache import RPCResultCache
+
+
+class CountingHandler:
+    def __init__(self, dependency_path, delay=0):
+        self.dependency_path = dependency_path
+        self.delay = delay
+        self.calls = []
+        self.dependency_threads = set()
+
+    async def load(self, name, fail=False):
+        self.calls.append(name)
+        result = "%s:%d" % (name, len(self.calls))
+        await asyncio.sleep(self.delay)
+        if fail:
+            raise ValueError("Unknown %s" % name)
+        return result
+
+    def get_dependencies(self, name, fail=False):
+        self.dependency_threads.add(threading.get_ident())
+        return None if name == "volatile" else [self.dependency_path]
+
+
+@pytest.fixture
+def handler(tmp_path):
+    dependency_path = tmp_path / "platform.json"
+    dependency_path.write_text("{}")
+    return CountingHandler(str(dependency_path))
+
+
+def _wrap(handler):
+    return RPCResultCache().wrap(
+        "platform.load", handler.load, handler.get_dependencies
+    )
+
+
+def test_reuse_and_invalidation(handler, tmp_path):
+    load = _wrap(handler)
+
+    async def _main():
+        return [await load("foo"), await load("foo"), await load("bar")]
+
+    assert asyncio.run(_main()) == ["foo:1", "foo:1", "bar:2"]
+    # a dependency has been modified
+    (tmp_path / "platform.json").write_text('{"version": "2.0.0"}')
+    assert asyncio.run(_main()) == ["foo:3", "foo:3", "bar:4"]
+    assert threading.get_ident() not in handler.dependency_threads
+
+
+def test_removed_dependency(handler, tmp_path):
+    load = _wrap(handler)
+    assert asyncio.run(load("foo")) == "foo:1"
+    (tmp_path / "platform.json").unlink()
+    assert asyncio.run(load("foo")) == "foo:2"
+    assert asyncio.run(load("foo")) == "foo:2"
+
+
+def test_not_idempotent_call(handler):
+    load = _wrap(handler)
+    assert asyncio.run(load("volatile")) == "volatile:1"
+    assert asyncio.run(load("volatile")) == "volatile:2"
+
+
+def test_coalescing(handler):
+    handler.delay = 0.2
+    load = _wrap(handler)
+
+    async def _main():
+        return await asyncio.gather(load("foo"), load("foo"), load("foo"), load("bar"))
+
+    results = asyncio.run(_main())
+    assert len(set(results[:3])) == 1
+    assert sorted(handler.calls) == ["bar", "foo"]
+
+
+def test_coalesced_error(handler):
+    handler.delay = 0.2
+    load = _wrap(handler)
+
+    async def _main():
+        return await asyncio.gather(
+            load("foo", fail=True), load("foo", fail=True), return_exceptions=True
+        )
+
+    results = asyncio.run(_main())
+    assert all(isinstance(item, ValueError) for item in results)
+    assert handler.calls == ["foo"]
+    # an error is not cached
+    with pytest.raises(ValueError):
+        asyncio.run(load("foo", fail=True))
+    assert handler.calls == ["foo", "foo"]
+
+
+def test_max_items(handler, monkeypatch):
+    monkeypatch.setattr(RPCResultCache, "MAX_ITEMS", 2)
+    load = _wrap(handler)
+
+    async def _main():
+        return [await load(name) for name in ("foo", "bar", "baz", "foo")]
+
+    # the least recently stored item has been evicted
+    assert asyncio.run(_main()) == ["foo:1", "bar:2", "baz:3", "foo:4"]
@@ -0,0 +1,114 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import asyncio
+import sys
+
+import pytest
+
+from Innatera.custom.rpc.handlers.targets import PIOTargets
+
+# a target is named by the seconds it runs
+TARGET_SCRIPT = """
+import sys
+import time
+
+print("target", sys.argv[1], flush=True)
+time.sleep(float(sys.argv[1]))
+"""
+
+
+class FakeFactory:
+    def __init__(self):
+        self.notifications = []
+
+    async def notify_clients(self, method, params, actor=None):
+        self.notifications.append((method, params[0]))
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    create_subprocess_exec = asyncio.create_subprocess_exec
+
+    def _create_subprocess_exec(program, *args, **kwargs):
+        # pio run --target <target>
+        return create_subprocess_exec(
+            sys.executable, "-c", TARGET_SCRIPT, args[-1], **kwargs
+        )
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", _create_subprocess_exec)
+    result = PIOTargets()
+    result.factory = FakeFactory()
+    return result
+
+
+def _get_processes(handler, run_id):
+    # pylint: disable=protected-access
+    return [process for _, process in handler._processes.get(run_id, {}).values()]
+
+
+async def _wait_processes(handler, run_id, nums):
+    for _ in range(100):
+        if len(_get_processes(handler, run_id)) >= nums:
+            break
+        await asyncio.sleep(0.1)
+    processes = _get_processes(handler, run_id)
+    assert len(processes) == nums
+    return processes
+
+
+def test_fetch(handler):
+    assert asyncio.run(handler.fetch("0, 0", {"runId": "r1"})) == ["0", "0"]
+    notifications = handler.factory.notifications
+    assert {method for method, _ in notifications} == {"targets.output"}
+    assert {params["runId"] for _, params in notifications} == {"r1"}
+    assert "".join(
+        params["data"] for _, params in notifications if params["pipe"] == "stdout"
+    ) == ("target 0\n" * 2)
+
+
+def test_cancel_duplicated_targets(handler):
+    async def _main():
+        task = asyncio.ensure_future(
+            handler.fetch(["60", "60"], {"runId": "r1", "concurrent": True})
+        )
+        processes = await _wait_processes(handler, "r1", 2)
+        # both runs of the same target are stopped
+        assert handler.cancel("r1") == ["60", "60"]
+        assert await asyncio.wait_for(task, 10) == ["60", "60"]
+        return processes
+
+    for process in asyncio.run(_main()):
+        assert process.returncode is not None
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_cancelled_fetch(handler, concurrent):
+    async def _main():
+        task = asyncio.ensure_future(
+            handler.fetch(["60", "60"], {"runId": "r1", "concurrent": concurrent})
+        )
+        processes = await _wait_processes(handler, "r1", 2 if concurrent else 1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # the children have been terminated and are reaped
+        await asyncio.wait_for(
+            asyncio.gather(*[process.wait() for process in processes]), 10
+        )
+        return processes
+
+    for process in asyncio.run(_main()):
+        assert process.returncode is not None
+    assert not handler._processes  # pylint: disable=protected-access
@@ -0,0 +1,118 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import json
+import os
+import time
+
+import pytest
+
+from Innatera import telemetry
+from Innatera.telemetry import TelemetrySpool
+
+
+def _event(name, timestamp=1):
+    return {"name": name, "params": {}, "timestamp": timestamp}
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    committed = []
+
+    def _commit_events(session, events):
+        if spool.offline:
+            return False
+        committed.append([e["name"] for e in events])
+        return True
+
+    monkeypatch.setattr(TelemetrySpool, "_commit_events", staticmethod(_commit_events))
+    spool = TelemetrySpool(str(tmp_path / telemetry.SPOOL_FILE_NAME))
+    spool.offline = False
+    spool.committed = committed
+    return spool
+
+
+def test_append(spool):
+    assert spool.append([_event("a"), _event("b")])
+    assert spool.append([_event("c")])
+    # an interrupted write is skipped
+    with open(spool.path, mode="a", encoding="utf8") as fp:
+        fp.write('{"name": "d", "par')
+    assert [e["name"] for e in spool.read(spool.path)] == ["a", "b", "c"]
+
+
+def test_append_over_max_size(spool, monkeypatch):
+    monkeypatch.setattr(telemetry, "SPOOL_MAX_SIZE", 10)
+    assert spool.append([_event("a")])
+    assert not spool.append([_event("b")])
+    assert [e["name"] for e in spool.read(spool.path)] == ["a"]
+
+
+def test_flush(spool, monkeypatch):
+    monkeypatch.setattr(telemetry, "SEND_MAX_EVENTS", 2)
+    spool.append([_event(name) for name in "abcde"])
+    assert spool.flush()
+    assert spool.committed == [["a", "b"], ["c", "d"], ["e"]]
+    assert not os.listdir(os.path.dirname(spool.path))
+    # nothing to send
+    assert spool.flush()
+    assert len(spool.committed) == 3
+
+
+def test_flush_failure_respools(spool):
+    spool.append([_event("a"), _event("b")])
+    spool.offline = True
+    assert not spool.flush()
+    assert [e["name"] for e in spool.read(spool.path)] == ["a", "b"]
+    # the next flush is postponed
+    assert not spool.is_flush_due()
+    with open(spool.flush_state_path, encoding="utf8") as fp:
+        assert float(fp.read()) > time.time() + telemetry.FLUSH_INTERVAL
+
+    spool.offline = False
+    assert spool.flush()
+    assert spool.committed == [["a", "b"]]
+    assert not os.path.isfile(spool.path)
+
+
+def test_flush_abandoned_spool(spool):
+    # a spool taken by a killed flushing process
+    abandoned_path = spool.path + ".99999"
+    with open(abandoned_path, mode="w", encoding="utf8") as fp:
+        fp.write(json.dumps(_event("old")) + "\n")
+    expired = time.time() - telemetry.FLUSH_OFFLINE_INTERVAL - 1
+    os.utime(abandoned_path, (expired, expired))
+    # a spool of a running flushing process
+    running_path = spool.path + ".99998"
+    with open(running_path, mode="w", encoding="utf8") as fp:
+        fp.write(json.dumps(_event("running")) + "\n")
+
+    spool.append([_event("new")])
+    assert spool.flush()
+    assert spool.committed == [["old", "new"]]
+    assert not os.path.isfile(abandoned_path)
+    assert os.path.isfile(running_path)
+
+
+def test_send_starts_flush_of_full_spool(spool, monkeypatch):
+    monkeypatch.setattr(telemetry, "SPOOL_MAX_SIZE", 10)
+    monkeypatch.setattr(telemetry, "TelemetrySpool", lambda: spool)
+    started = []
+    monkeypatch.setattr(spool, "start_detached_flush", lambda: started.append(True))
+    spool.append([_event("a")])
+
+    logger = telemetry.TelemetryLogger()
+    logger._events.append(_event("b"))  # pylint: disable=protected-access
+    logger.send()
+    assert started
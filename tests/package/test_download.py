@@ -0,0 +1,280 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import hashlib
+import io
+import os
+import re
+import tarfile
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from Innatera import app
+from Innatera.package import download
+from Innatera.package.download import FileDownloader
+from Innatera.package.exception import PackageException
+from Innatera.package.manager.tool import ToolPackageManager
+
+CONTENT = os.urandom(3 * 1024 * 1024 + 123)
+CONTENT_CHECKSUM = hashlib.sha256(CONTENT).hexdigest()
+
+
+class FlakyRequestHandler(BaseHTTPRequestHandler):
+    """Serves `content` and drops a connection after `drop_after` bytes."""
+
+    protocol_version = "HTTP/1.1"
+    content = CONTENT
+    drop_after = None
+    accept_ranges = True
+    empty_ranges = False
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        start, end = 0, len(self.content) - 1
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match and self.accept_ranges:
+            start = int(match.group(1))
+            if match.group(2):
+                end = int(match.group(2))
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", "bytes %d-%d/%d" % (start, end, len(self.content))
+            )
+        else:
+            self.send_response(200)
+        if self.accept_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if match and self.empty_ranges:
+            end = start - 1  # a range response without content
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Last-Modified", "Mon, 01 Jan 2024 00:00:00 GMT")
+        self.end_headers()
+        data = self.content[start : end + 1]
+        if self.drop_after is not None:
+            data = data[: self.drop_after]
+            self.close_connection = True
+        self.wfile.write(data)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+@pytest.fixture
+def http_server(isolated_pio_core):  # pylint: disable=unused-argument
+    servers = []
+
+    def _start(drop_after=None, accept_ranges=True, empty_ranges=False, content=None):
+        handler = type(
+            "Handler",
+            (FlakyRequestHandler,),
+            dict(
+                content=content or CONTENT,
+                drop_after=drop_after,
+                accept_ranges=accept_ranges,
+                empty_ranges=empty_ranges,
+            ),
+        )
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return "http://127.0.0.1:%d/package.tar.gz" % server.server_port
+
+    yield _start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_resume_dropped_connection(http_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(download, "RESUME_RETRIES", 100)
+    monkeypatch.setattr(download.time, "sleep", lambda _: None)
+    url = http_server(drop_after=256 * 1024)
+    fd = FileDownloader(url, str(tmp_path))
+    fd.set_checksum(CONTENT_CHECKSUM)
+    assert fd.start(with_progress=False, silent=True)
+    assert fd.verify(CONTENT_CHECKSUM)
+    with open(fd.get_filepath(), "rb") as fp:
+        assert fp.read() == CONTENT
+
+
+def test_resume_partial_file(http_server, tmp_path):
+    url = http_server()
+    dst = tmp_path / "package.tar.gz.tmp"
+    dst.write_bytes(CONTENT[:1000])
+    fd = FileDownloader(url)
+    fd.set_destination(str(dst))
+    fd.set_checksum(CONTENT_CHECKSUM)
+    assert fd.start(with_progress=False, silent=True, resume=True)
+    assert fd.is_resumed()
+    assert fd.verify(CONTENT_CHECKSUM)
+    assert dst.read_bytes() == CONTENT
+
+
+def test_segmented(http_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(download, "SEGMENT_MIN_SIZE", 512 * 1024)
+    monkeypatch.setattr(download, "RESUME_RETRIES", 100)
+    monkeypatch.setattr(download.time, "sleep", lambda _: None)
+    url = http_server(drop_after=300 * 1024)
+    fd = FileDownloader(url, str(tmp_path))
+    assert fd.start(with_progress=False, silent=True, segments=4)
+    assert fd.verify(CONTENT_CHECKSUM)
+    with open(fd.get_filepath(), "rb") as fp:
+        assert fp.read() == CONTENT
+
+
+def test_no_ranges(http_server, tmp_path):
+    url = http_server(drop_after=1024, accept_ranges=False)
+    fd = FileDownloader(url, str(tmp_path))
+    with pytest.raises((IOError, PackageException)):
+        fd.start(with_progress=False, silent=True, segments=4)
+        fd.verify()
+
+
+def test_segment_closed_without_content(http_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(download, "SEGMENT_MIN_SIZE", 512 * 1024)
+    monkeypatch.setattr(download, "RESUME_RETRIES", 3)
+    sleeps = []
+    monkeypatch.setattr(download.time, "sleep", sleeps.append)
+    url = http_server(empty_ranges=True)
+    fd = FileDownloader(url, str(tmp_path))
+    with pytest.raises(PackageException):
+        fd.start(with_progress=False, silent=True, segments=4)
+    # every segment has backed off before giving up
+    assert len(sleeps) == 4 * 3
+
+
+def _make_archive(archive_type):
+    result = io.BytesIO()
+    if archive_type == "zip":
+        with zipfile.ZipFile(result, "w") as zf:
+            zf.writestr("library.json", '{"name": "Foo"}')
+            zf.writestr("src/foo.h", "// foo")
+    else:
+        with tarfile.open(fileobj=result, mode="w:gz") as tf:
+            for name, data in (
+                ("library.json", b'{"name": "Foo"}'),
+                ("src/foo.h", b"// foo"),
+            ):
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tf.addfile(info, io.BytesIO(data))
+    return result.getvalue()
+
+
+def _get_open_files(root):
+    result = []
+    for name in os.listdir("/proc/self/fd"):
+        try:
+            path = os.readlink(os.path.join("/proc/self/fd", name))
+        except OSError:
+            continue
+        if path.startswith(str(root)):
+            result.append(path)
+    return result
+
+
+def _set_download_cache(monkeypatch, enabled):
+    get_setting = app.get_setting
+    monkeypatch.setattr(
+        app,
+        "get_setting",
+        lambda name: enabled if name == "enable_download_cache" else get_setting(name),
+    )
+
+
+@pytest.mark.parametrize("use_cache", [True, False])
+@pytest.mark.parametrize("archive_type", ["tar.gz", "zip"])
+def test_download_unpack(http_server, tmp_path, monkeypatch, archive_type, use_cache):
+    _set_download_cache(monkeypatch, use_cache)
+    content = _make_archive(archive_type)
+    url = http_server(content=content)
+    pm = ToolPackageManager(str(tmp_path / "packages"))
+    checksum = hashlib.sha256(content).hexdigest()
+    dst = tmp_path / "dst"
+    dst.mkdir()
+    downloads = set(os.listdir(pm.get_download_dir()))
+    assert pm.download_unpack(url, str(dst), checksum, silent=True)
+    assert not _get_open_files(pm.get_download_dir())
+    assert (dst / "src" / "foo.h").read_text() == "// foo"
+    dl_path = pm.compute_download_path(url, checksum)
+    assert os.path.isfile(dl_path) == use_cache
+    # no temporary files are left
+    assert set(os.listdir(pm.get_download_dir())) - downloads <= {
+        os.path.basename(dl_path),
+        "usage.db",
+    }
+
+
+@pytest.mark.parametrize("archive_type", ["tar.gz", "zip"])
+def test_download_unpack_corrupted(http_server, tmp_path, archive_type):
+    content = _make_archive(archive_type)
+    url = http_server(content=content)
+    pm = ToolPackageManager(str(tmp_path / "packages"))
+    dst = tmp_path / "dst"
+    dst.mkdir()
+    downloads = set(os.listdir(pm.get_download_dir()))
+    with pytest.raises(PackageException):
+        pm.download_unpack(url, str(dst), "0" * 64, silent=True)
+    assert not _get_open_files(pm.get_download_dir())
+    assert set(os.listdir(pm.get_download_dir())) - downloads <= {"usage.db"}
+
+
+def test_stream_unpack_cache_error(http_server, tmp_path, monkeypatch):
+    _set_download_cache(monkeypatch, True)
+    content = _make_archive("tar.gz")
+    url = http_server(content=content)
+    pm = ToolPackageManager(str(tmp_path / "packages"))
+    checksum = hashlib.sha256(content).hexdigest()
+    dl_path = pm.compute_download_path(url, checksum)
+
+    def _preserve_filemtime(*_):
+        raise OSError("read-only file system")
+
+    monkeypatch.setattr(FileDownloader, "preserve_filemtime", _preserve_filemtime)
+    downloads = set(os.listdir(pm.get_download_dir()))
+    with pytest.raises(OSError, match="read-only file system"):
+        # pylint: disable=protected-access
+        pm._stream_unpack(url, dl_path, str(tmp_path / "dst"), checksum, True)
+    assert not _get_open_files(pm.get_download_dir())
+    assert set(os.listdir(pm.get_download_dir())) - downloads <= {"usage.db"}
+
+
+def test_download_fallback_without_progress(http_server, tmp_path, monkeypatch):
+    url = http_server()
+    pm = ToolPackageManager(str(tmp_path / "packages"))
+    calls = []
+    download_file = pm._download_file  # pylint: disable=protected-access
+
+    def _download_file(url, path, checksum, with_progress, silent):
+        calls.append(with_progress)
+        if with_progress:
+            raise IOError("progress bar is not supported")
+        return download_file(url, path, checksum, with_progress, silent)
+
+    monkeypatch.setattr(pm, "_download_file", _download_file)
+    monkeypatch.setattr(app, "is_disabled_progressbar", lambda: False)
+    dl_path = pm.download(url, CONTENT_CHECKSUM, silent=True)
+    assert calls == [True, False]
+    with open(dl_path, "rb") as fp:
+        assert fp.read() == CONTENT
+    # an error is not hidden from a user
+    monkeypatch.setattr(pm, "_download_file", _raise_ioerror)
+    with pytest.raises(IOError):
+        pm.download(url + "?v=2", CONTENT_CHECKSUM, silent=True)
+
+
+def _raise_ioerror(*_):
+    raise IOError("connection refused")
@@ -0,0 +1,219 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import json
+import logging
+import os
+import threading
+import time
+
+import pytest
+
+from Innatera.package.exception import PackageException, UnknownPackageError
+from Innatera.package.manager._install import PackageInstallPlanItem
+from Innatera.package.manager.library import LibraryPackageManager
+from Innatera.package.meta import PackageSpec
+
+# name: (version, dependencies)
+REGISTRY = {
+    "Foo": ("1.0.0", [dict(owner="acme", name="Bar", version="^1.0.0")]),
+    "Bar": (
+        "1.2.0",
+        [dict(owner="acme", name="Baz", version="^2.0.0"), dict(name="Unknown")],
+    ),
+    "Baz": ("2.0.1", []),
+    "Qux": ("0.1.0", [dict(owner="acme", name="Baz", version="^2.0.0")]),
+}
+
+
+class FakeRegistry:
+    def __init__(self, storage_dir):
+        self.storage_dir = storage_dir
+        self.requests = []
+        self.mirrors = {}  # name: broken mirrors
+        for name, (version, dependencies) in REGISTRY.items():
+            pkg_dir = storage_dir / name
+            pkg_dir.mkdir(parents=True)
+            (pkg_dir / "library.json").write_text(
+                json.dumps(dict(name=name, version=version, dependencies=dependencies))
+            )
+
+    def fetch_registry_package_sources(self, spec, search_qualifiers=None):
+        self.requests.append(spec.name)
+        if spec.name not in REGISTRY:
+            raise UnknownPackageError(spec.humanize())
+        sources = [
+            "file://%s" % (self.storage_dir / ("broken-%d" % index))
+            for index in range(self.mirrors.get(spec.name, 0))
+        ]
+        sources.append("file://%s" % (self.storage_dir / spec.name))
+        return (
+            PackageSpec(owner="acme", id=len(spec.name), name=spec.name),
+            iter([(url, None) for url in sources]),
+        )
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return FakeRegistry(tmp_path / "storage")
+
+
+@pytest.fixture
+def lm(isolated_pio_core, tmp_path, registry, monkeypatch):
+    manager = LibraryPackageManager(str(tmp_path / "libdeps"))
+    manager.set_log_level(logging.ERROR)
+    monkeypatch.setattr(
+        manager,
+        "fetch_registry_package_sources",
+        registry.fetch_registry_package_sources,
+    )
+    return manager
+
+
+def _get_installed(lm):
+    return sorted(
+        (pkg.metadata.name, str(pkg.metadata.version)) for pkg in lm.get_installed()
+    )
+
+
+def test_install_many(lm, registry):
+    pkgs = lm.install_many(["acme/Qux", "acme/Foo"], jobs=4)
+    assert [pkg.metadata.name for pkg in pkgs] == ["Qux", "Foo"]
+    assert _get_installed(lm) == [
+        ("Bar", "1.2.0"),
+        ("Baz", "2.0.1"),
+        ("Foo", "1.0.0"),
+        ("Qux", "0.1.0"),
+    ]
+    # a shared dependency is resolved once, an unknown one is skipped
+    assert sorted(registry.requests) == ["Bar", "Baz", "Foo", "Qux", "Unknown"]
+    # nothing is left in the temporary directory
+    assert not os.listdir(lm.get_tmp_dir())
+
+
+def test_install_many_skip_dependencies(lm):
+    pkgs = lm.install_many(["acme/Foo"], skip_dependencies=True)
+    assert [pkg.metadata.name for pkg in pkgs] == ["Foo"]
+    assert _get_installed(lm) == [("Foo", "1.0.0")]
+
+
+def test_install_many_installed_dependencies(lm, registry):
+    lm.install_many(["acme/Foo"], skip_dependencies=True)
+    lm._INSTALL_HISTORY = {}  # pylint: disable=protected-access
+    registry.requests.clear()
+    # dependencies of the installed package are ensured
+    lm.install_many(["acme/Foo"])
+    assert registry.requests == ["Bar", "Baz", "Unknown"]
+    assert [name for name, _ in _get_installed(lm)] == ["Bar", "Baz", "Foo"]
+
+
+def test_install_many_force(lm, registry):
+    lm.install_many(["acme/Foo"])
+    registry.requests.clear()
+    pkgs = lm.install_many(["acme/Foo"], force=True)
+    assert [pkg.metadata.name for pkg in pkgs] == ["Foo"]
+    # the dependencies removed with the package are installed again
+    assert registry.requests == ["Foo", "Bar", "Baz", "Unknown"]
+    assert [name for name, _ in _get_installed(lm)] == ["Bar", "Baz", "Foo"]
+
+
+def test_resolve_install_plan(lm, registry):
+    installed = lm.install_many(["acme/Baz"])[0]
+    lm._INSTALL_HISTORY = {}  # pylint: disable=protected-access
+    registry.requests.clear()
+    items = [
+        PackageInstallPlanItem(lm.ensure_spec(spec))
+        for spec in ("acme/Baz", "acme/Foo", "acme/Foo")
+    ]
+    plan = lm.resolve_install_plan(items)
+    # a duplicated spec is resolved once
+    assert plan == items[:2]
+    assert plan[0].pkg.path == installed.path
+    assert not plan[0].is_fetchable
+    assert plan[1].pkg is None
+    assert plan[1].is_fetchable
+    assert plan[1].install_spec.id == 3
+    assert registry.requests == ["Foo"]
+
+    # the packages from the install history are not resolved again
+    plan = lm.resolve_install_plan([PackageInstallPlanItem(lm.ensure_spec("acme/Baz"))])
+    assert plan[0].pkg.path == installed.path
+    assert not plan[0].with_dependencies
+    assert registry.requests == ["Foo"]
+
+
+def test_resolve_install_plan_unknown_package(lm):
+    parent = lm.install_many(["acme/Baz"])[0]
+    with pytest.raises(UnknownPackageError):
+        lm.resolve_install_plan(
+            [PackageInstallPlanItem(lm.ensure_spec("acme/Unknown"))]
+        )
+    # an unknown dependency is skipped
+    dependency = dict(owner="acme", name="Unknown")
+    item = PackageInstallPlanItem(
+        lm.dependency_to_spec(dependency), dependency=dependency, parent=parent
+    )
+    assert not lm.resolve_install_plan([item])
+
+
+def test_fetch_and_commit_install_plan(lm, monkeypatch):
+    threads = set()
+    fetch_from_uri = lm.fetch_from_uri
+
+    def _fetch_from_uri(*args, **kwargs):
+        threads.add(threading.get_ident())
+        time.sleep(0.2)
+        return fetch_from_uri(*args, **kwargs)
+
+    monkeypatch.setattr(lm, "fetch_from_uri", _fetch_from_uri)
+    items = [
+        PackageInstallPlanItem(lm.ensure_spec("acme/%s" % name))
+        for name in ("Foo", "Bar", "Baz")
+    ]
+    plan = lm.resolve_install_plan(items)
+    lm.fetch_install_plan(plan, jobs=3)
+    # the packages are fetched concurrently
+    assert len(threads) == 3
+    assert all(os.path.isdir(item.tmp_dir) for item in plan)
+    assert not _get_installed(lm)
+
+    pkgs = lm.commit_install_plan(plan)
+    assert [pkg.metadata.name for pkg in pkgs] == ["Foo", "Bar", "Baz"]
+    assert [name for name, _ in _get_installed(lm)] == ["Bar", "Baz", "Foo"]
+    assert not any(os.path.isdir(item.tmp_dir) for item in plan)
+
+
+def test_fetch_broken_mirrors(lm, registry):
+    registry.mirrors["Foo"] = 2
+    plan = lm.resolve_install_plan([PackageInstallPlanItem(lm.ensure_spec("acme/Foo"))])
+    lm.fetch_install_plan(plan)
+    # the next mirror is used
+    assert plan[0].tmp_dir
+    assert plan[0].error is None
+    assert [pkg.metadata.name for pkg in lm.commit_install_plan(plan)] == ["Foo"]
+
+
+def test_install_many_broken_sources(lm, registry, monkeypatch):
+    monkeypatch.setattr(
+        lm,
+        "fetch_registry_package_sources",
+        lambda spec, search_qualifiers=None: (
+            spec,
+            iter([("file://%s" % (registry.storage_dir / "broken"), None)]),
+        ),
+    )
+    with pytest.raises(PackageException, match="Could not install package"):
+        lm.install_many(["acme/Foo", "acme/Baz"], jobs=2)
+    assert not _get_installed(lm)
+    assert not os.listdir(lm.get_tmp_dir())
@@ -0,0 +1,193 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import json
+import os
+import time
+
+import pytest
+
+from Innatera.package.manager.tool import ToolPackageManager
+
+
+def _add_package(package_dir, name, version, system=None):
+    pkg_dir = package_dir / name
+    pkg_dir.mkdir(parents=True)
+    manifest = dict(name=name, version=version)
+    if system:
+        manifest["system"] = system
+    (pkg_dir / "package.json").write_text(json.dumps(manifest))
+
+
+def _age_dir(path):
+    # out of the racy window, the index could be saved
+    mtime = time.time() - 60
+    for root, _, files in os.walk(path):
+        for name in files + [""]:
+            os.utime(os.path.join(root, name), (mtime, mtime))
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    result = tmp_path / "cache"
+    monkeypatch.setenv("PLATFORMIO_CACHE_DIR", str(result))
+    return result
+
+
+@pytest.fixture
+def package_dir(tmp_path):
+    result = tmp_path / "packages"
+    _add_package(result, "tool-foo", "1.0.0")
+    _add_package(result, "tool-bar", "2.1.0")
+    _add_package(result, "tool-baz", "3.0.0", system=["unknown_system"])
+    _age_dir(result)
+    return result
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    # pylint: disable=protected-access
+    result = []
+    scan_installed = ToolPackageManager._scan_installed
+
+    def _scan_installed(self):
+        result.append(self.package_dir)
+        return scan_installed(self)
+
+    monkeypatch.setattr(ToolPackageManager, "_scan_installed", _scan_installed)
+    return result
+
+
+def _get_installed(package_dir):
+    return sorted(
+        (pkg.metadata.name, str(pkg.metadata.version), pkg.path)
+        for pkg in ToolPackageManager(str(package_dir)).get_installed()
+    )
+
+
+def test_index_reuse(package_dir, scans, cache_dir):
+    tm = ToolPackageManager(str(package_dir))
+    expected = _get_installed(package_dir)
+    assert [name for name, _, _ in expected] == ["tool-bar", "tool-foo"]
+    assert len(scans) == 1
+    assert os.path.isfile(tm.get_installed_index_path())
+    # the index is kept out of the package directory and its parent
+    assert tm.get_installed_index_path().startswith(str(cache_dir))
+    assert sorted(os.listdir(package_dir.parent)) == ["cache", "packages"]
+    # the next managers do not scan the directory
+    assert _get_installed(package_dir) == expected
+    assert _get_installed(package_dir) == expected
+    assert len(scans) == 1
+
+
+def test_index_invalidation(package_dir, scans):
+    _get_installed(package_dir)
+    _add_package(package_dir, "tool-qux", "0.1.0")
+    _age_dir(package_dir)
+    assert [name for name, _, _ in _get_installed(package_dir)] == [
+        "tool-bar",
+        "tool-foo",
+        "tool-qux",
+    ]
+    assert len(scans) == 2
+    # a package has been removed
+    (package_dir / "tool-foo" / "package.json").unlink()
+    (package_dir / "tool-foo").rmdir()
+    _age_dir(package_dir)
+    assert [name for name, _, _ in _get_installed(package_dir)] == [
+        "tool-bar",
+        "tool-qux",
+    ]
+    assert len(scans) == 3
+    assert _get_installed(package_dir)
+    assert len(scans) == 3
+
+
+def test_index_manifest_changes(package_dir, scans):
+    _get_installed(package_dir)
+    # the files are edited in place, the directory is not modified
+    dir_mtime = os.stat(package_dir).st_mtime_ns
+    (package_dir / "tool-foo" / "package.json").write_text(
+        json.dumps(dict(name="tool-foo", version="1.0.1"))
+    )
+    _age_dir(package_dir / "tool-foo")
+    assert ("tool-foo", "1.0.1") in [
+        (name, version) for name, version, _ in _get_installed(package_dir)
+    ]
+    assert len(scans) == 2
+    (package_dir / "tool-bar" / ".piopm").write_text(
+        json.dumps(
+            dict(type="tool", name="tool-bar", version="2.2.0", spec=dict(name="bar"))
+        )
+    )
+    _age_dir(package_dir / "tool-bar")
+    assert ("tool-bar", "2.2.0") in [
+        (name, version) for name, version, _ in _get_installed(package_dir)
+    ]
+    assert len(scans) == 3
+    assert os.stat(package_dir).st_mtime_ns == dir_mtime
+    assert len(_get_installed(package_dir)) == 2
+    assert len(scans) == 3
+
+
+def test_index_racy_window(package_dir, scans):
+    tm = ToolPackageManager(str(package_dir))
+    _add_package(package_dir, "tool-qux", "0.1.0")
+    # the directory could be modified again within the same mtime
+    assert len(_get_installed(package_dir)) == 3
+    assert not os.path.isfile(tm.get_installed_index_path())
+    assert len(_get_installed(package_dir)) == 3
+    assert len(scans) == 2
+
+
+def test_index_reset(package_dir, scans):
+    tm = ToolPackageManager(str(package_dir))
+    tm.get_installed()
+    assert os.path.isfile(tm.get_installed_index_path())
+    tm.memcache_reset()
+    assert not os.path.isfile(tm.get_installed_index_path())
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "",
+        "{[broken",
+        "[]",
+        '{"version": 2, "type": "tool"}',
+        '{"version": 2, "type": "tool", "mtime": 0, "items": []}',
+    ],
+)
+def test_corrupted_index(package_dir, scans, content):
+    expected = _get_installed(package_dir)
+    index_path = ToolPackageManager(str(package_dir)).get_installed_index_path()
+    with open(index_path, mode="w", encoding="utf8") as fp:
+        fp.write(content)
+    assert _get_installed(package_dir) == expected
+    assert len(scans) == 2
+    # the index has been saved again
+    assert _get_installed(package_dir) == expected
+    assert len(scans) == 2
+
+
+def test_index_of_other_type(package_dir, scans):
+    _get_installed(package_dir)
+    index_path = ToolPackageManager(str(package_dir)).get_installed_index_path()
+    with open(index_path, encoding="utf8") as fp:
+        data = json.load(fp)
+    data["type"] = "library"
+    with open(index_path, mode="w", encoding="utf8") as fp:
+        json.dump(data, fp)
+    assert len(_get_installed(package_dir)) == 2
+    assert len(scans) == 2
@@ -0,0 +1,188 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import json
+import logging
+import os
+
+import pytest
+
+from Innatera import fs
+from Innatera.package import store as store_module
+from Innatera.package.manager.library import LibraryPackageManager
+from Innatera.package.meta import PackageItem, PackageMetadata, PackageSpec
+from Innatera.package.store import PackageStore
+from Innatera.system.cli import cli
+
+
+def _make_package(path, version="1.0.0", content="void foo() {}", name="Foo"):
+    (path / "src").mkdir(parents=True)
+    (path / "library.json").write_text(json.dumps(dict(name=name, version=version)))
+    (path / "src" / "foo.c").write_text(content)
+    return path
+
+
+def _new_pkg(path, version="1.0.0"):
+    return PackageItem(
+        str(path),
+        PackageMetadata(
+            "library", "Foo", version, spec=PackageSpec(owner="acme", name="Foo")
+        ),
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PackageStore(str(tmp_path / "store"))
+
+
+def test_store_hit_and_miss(store, tmp_path):
+    key = store.add(str(_make_package(tmp_path / "a")))
+    assert list(store.iter_keys()) == [key]
+    # the same content is kept once, the metadata file is not a content
+    pkg_dir = _make_package(tmp_path / "b")
+    _new_pkg(pkg_dir).dump_meta()
+    assert store.add(str(pkg_dir)) == key
+    assert list(store.iter_keys()) == [key]
+    assert not os.path.isfile(
+        os.path.join(store.get_entry_dir(key), PackageItem.METAFILE_NAME)
+    )
+    # the other content
+    other_key = store.add(str(_make_package(tmp_path / "c", content="")))
+    assert other_key != key
+    assert sorted(store.iter_keys()) == sorted([key, other_key])
+
+
+def test_store_read_only(store, tmp_path):
+    key = store.add(str(_make_package(tmp_path / "a")))
+    path = os.path.join(store.get_entry_dir(key), "src", "foo.c")
+    assert not os.stat(path).st_mode & store_module.READ_ONLY_MASK
+    # the source package is not changed
+    assert os.access(str(tmp_path / "a" / "src" / "foo.c"), os.W_OK)
+
+
+@pytest.mark.parametrize("mode", ["copy", "auto", "reflink", "hardlink", "symlink"])
+def test_materialize(store, tmp_path, mode):
+    key = store.add(str(_make_package(tmp_path / "src")))
+    pkg = store.materialize(key, _new_pkg(tmp_path / "libdeps" / "Foo"), mode)
+    src = os.path.join(store.get_entry_dir(key), "src", "foo.c")
+    dst = os.path.join(pkg.path, "src", "foo.c")
+    with open(dst, encoding="utf8") as fp:
+        assert fp.read() == "void foo() {}"
+    assert os.path.islink(dst) == (mode == "symlink")
+    if mode == "hardlink":
+        assert os.path.samefile(src, dst)
+    if mode == "copy":
+        assert not os.path.samefile(src, dst)
+        assert os.access(dst, os.W_OK)
+    assert PackageItem(pkg.path).metadata.name == "Foo"
+    assert store.get_live_refs(key) == {pkg.path: "Foo@1.0.0"}
+
+
+def test_materialize_fallback(store, tmp_path, monkeypatch):
+    def _hardlink_file(src, dst):
+        raise OSError("Cross-device link")
+
+    monkeypatch.setattr(store_module, "_hardlink_file", _hardlink_file)
+    key = store.add(str(_make_package(tmp_path / "src")))
+    pkg = store.materialize(key, _new_pkg(tmp_path / "libdeps" / "Foo"), "hardlink")
+    dst = os.path.join(pkg.path, "src", "foo.c")
+    assert not os.path.samefile(
+        os.path.join(store.get_entry_dir(key), "src", "foo.c"), dst
+    )
+    assert os.access(dst, os.W_OK)
+
+
+def test_prune(store, tmp_path):
+    key = store.add(str(_make_package(tmp_path / "src")))
+    pkgs = [
+        store.materialize(key, _new_pkg(tmp_path / name / "Foo"), "hardlink")
+        for name in ("libdeps1", "libdeps2")
+    ]
+    assert store.prune() == []
+    fs.rmtree(pkgs[0].path)
+    assert store.prune() == []
+    assert list(store.get_live_refs(key)) == [pkgs[1].path]
+    # the directory is reused by the other version of a package
+    fs.rmtree(pkgs[1].path)
+    _new_pkg(_make_package(tmp_path / "libdeps2" / "Foo", "2.0.0"), "2.0.0").dump_meta()
+    items = store.prune(dry_run=True)
+    assert [item[0] for item in items] == [key]
+    assert list(store.iter_keys()) == [key]
+    assert store.prune() == items
+    assert not list(store.iter_keys())
+    assert not os.path.exists(store.get_refs_path(key))
+
+
+@pytest.fixture
+def registry_lm_factory(isolated_pio_core, tmp_path, monkeypatch):
+    monkeypatch.setenv("PLATFORMIO_PACKAGE_STORE", "hardlink")
+    monkeypatch.setenv("PLATFORMIO_PACKAGE_STORE_DIR", str(tmp_path / "store"))
+    storage_dir = _make_package(tmp_path / "storage" / "Foo")
+
+    def _fetch_registry_package_sources(spec, search_qualifiers=None):
+        return (
+            PackageSpec(owner="acme", id=1, name="Foo"),
+            iter([("file://%s" % storage_dir, None)]),
+        )
+
+    def _factory(package_dir):
+        manager = LibraryPackageManager(str(package_dir))
+        manager.set_log_level(logging.ERROR)
+        monkeypatch.setattr(
+            manager, "fetch_registry_package_sources", _fetch_registry_package_sources
+        )
+        return manager
+
+    return _factory
+
+
+def test_install_to_store(registry_lm_factory, tmp_path):
+    store = PackageStore(str(tmp_path / "store"))
+    pkgs = [
+        registry_lm_factory(tmp_path / name).install("acme/Foo")
+        for name in ("project1", "project2")
+    ]
+    key = next(store.iter_keys())
+    assert list(store.iter_keys()) == [key]
+    assert sorted(store.get_live_refs(key)) == sorted(pkg.path for pkg in pkgs)
+    for pkg in pkgs:
+        assert os.path.samefile(
+            os.path.join(store.get_entry_dir(key), "src", "foo.c"),
+            os.path.join(pkg.path, "src", "foo.c"),
+        )
+        assert PackageItem(pkg.path).metadata.spec.owner == "acme"
+    # an external package is not stored
+    registry_lm_factory(tmp_path / "project1").install(
+        "file://%s" % _make_package(tmp_path / "Bar", name="Bar")
+    )
+    assert list(store.iter_keys()) == [key]
+
+
+def test_prune_command(clirunner, validate_cliresult, registry_lm_factory, tmp_path):
+    store = PackageStore(str(tmp_path / "store"))
+    lm = registry_lm_factory(tmp_path / "project1")
+    lm.uninstall(lm.install("acme/Foo"))
+    key = next(store.iter_keys())
+
+    result = clirunner.invoke(cli, ["prune", "--package-store", "--dry-run"])
+    validate_cliresult(result)
+    assert key[:12] in result.output
+    assert list(store.iter_keys()) == [key]
+
+    result = clirunner.invoke(cli, ["prune", "--package-store", "--force"])
+    validate_cliresult(result)
+    assert key[:12] in result.output
+    assert not list(store.iter_keys())
+    assert os.listdir(str(tmp_path / "store")) == []
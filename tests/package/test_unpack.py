@@ -0,0 +1,210 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import io
+import os
+import queue
+import tarfile
+import time
+import zipfile
+import zlib
+
+import pytest
+
+from Innatera.package import unpack
+from Innatera.package.unpack import (
+    FileUnpacker,
+    StreamUnpacker,
+    TARArchiver,
+    ZIPArchiver,
+)
+
+ITEMS_NUMS = unpack.PARALLEL_MIN_ITEMS + 44
+
+
+def _content(index):
+    return ("content of %d\n" % index).encode()
+
+
+@pytest.fixture
+def sources_dir(tmp_path):
+    result = tmp_path / "sources"
+    for index in range(ITEMS_NUMS):
+        item = result / ("dir%d" % (index % 10)) / ("file%d.txt" % index)
+        item.parent.mkdir(parents=True, exist_ok=True)
+        item.write_bytes(_content(index))
+    # extracted by the decompressor thread itself
+    (result / "large.bin").write_bytes(b"\x01" * (unpack.PIPELINE_MAX_ITEM_SIZE + 1))
+    return result
+
+
+@pytest.fixture
+def tar_path(tmp_path, sources_dir):
+    result = tmp_path / "archive.tar.gz"
+    with tarfile.open(result, "w:gz") as tf:
+        tf.add(sources_dir, arcname=".")
+        info = tarfile.TarInfo("link.txt")
+        info.type = tarfile.SYMTYPE
+        info.linkname = "dir0/file0.txt"
+        tf.addfile(info)
+    return result
+
+
+@pytest.fixture
+def zip_path(tmp_path, sources_dir):
+    result = tmp_path / "archive.zip"
+    with zipfile.ZipFile(result, "w") as zf:
+        for root, _, files in os.walk(sources_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                zf.write(path, os.path.relpath(path, sources_dir))
+    return result
+
+
+def _validate_unpacked(dest_dir):
+    for index in range(ITEMS_NUMS):
+        item = dest_dir / ("dir%d" % (index % 10)) / ("file%d.txt" % index)
+        assert item.read_bytes() == _content(index)
+    assert (dest_dir / "large.bin").stat().st_size == (
+        unpack.PIPELINE_MAX_ITEM_SIZE + 1
+    )
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_unpack_zip(zip_path, tmp_path, jobs):
+    dest_dir = tmp_path / "dest"
+    with FileUnpacker(str(zip_path), jobs=jobs) as fu:
+        assert fu.unpack(str(dest_dir), silent=True)
+    _validate_unpacked(dest_dir)
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_unpack_tar(tar_path, tmp_path, jobs):
+    dest_dir = tmp_path / "dest"
+    with FileUnpacker(str(tar_path), jobs=jobs) as fu:
+        assert fu.unpack(str(dest_dir), silent=True)
+    _validate_unpacked(dest_dir)
+    assert (dest_dir / "link.txt").read_bytes() == _content(0)
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_stream_unpack_tar(tar_path, tmp_path, jobs):
+    dest_dir = tmp_path / "dest"
+    with open(tar_path, "rb") as fp:
+        assert StreamUnpacker(fp, jobs=jobs).unpack(str(dest_dir))
+    _validate_unpacked(dest_dir)
+    assert (dest_dir / "link.txt").read_bytes() == _content(0)
+
+
+def test_tar_pipeline_yields_every_item(tar_path, tmp_path):
+    with tarfile.open(tar_path) as tf:
+        names = sorted(item.name for item in tf.getmembers())
+    for index in range(10):
+        archiver = TARArchiver(str(tar_path))
+        try:
+            extracted = archiver.iter_extract(
+                archiver.get_items(), str(tmp_path / ("dest%d" % index)), jobs=4
+            )
+            assert sorted(item.name for item in extracted) == names
+        finally:
+            archiver.close()
+
+
+def test_tar_pipeline_drains_results(tmp_path, monkeypatch):
+    class _SlowQueue(queue.Queue):
+        timeouts = 0
+
+        def get(self, block=True, timeout=None):
+            if timeout is not None and not _SlowQueue.timeouts and self.empty():
+                # the threads finish right after the wait has timed out
+                _SlowQueue.timeouts += 1
+                time.sleep(0.5)
+                raise queue.Empty
+            return super().get(block, timeout)
+
+    archive_path = tmp_path / "small.tar"
+    with tarfile.open(archive_path, "w") as tf:
+        for index in range(3):
+            data = _content(index)
+            info = tarfile.TarInfo("file%d.txt" % index)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    write_item = TARArchiver._write_item  # pylint: disable=protected-access
+
+    def _write_item(*args):
+        # no results yet when the consumer starts waiting
+        time.sleep(0.1)
+        return write_item(*args)
+
+    monkeypatch.setattr(unpack.queue, "Queue", _SlowQueue)
+    monkeypatch.setattr(TARArchiver, "_write_item", _write_item)
+    archiver = TARArchiver(str(archive_path))
+    try:
+        extracted = archiver.iter_extract(
+            archiver.get_items(), str(tmp_path / "dest"), jobs=2
+        )
+        assert sorted(item.name for item in extracted) == [
+            "file0.txt",
+            "file1.txt",
+            "file2.txt",
+        ]
+    finally:
+        archiver.close()
+
+
+def test_unpack_tar_write_error(tar_path, tmp_path, monkeypatch):
+    def _write_item(*_):
+        raise OSError("disk is full")
+
+    monkeypatch.setattr(TARArchiver, "_write_item", _write_item)
+    with pytest.raises(OSError, match="disk is full"):
+        with FileUnpacker(str(tar_path), jobs=4) as fu:
+            fu.unpack(str(tmp_path / "dest"), silent=True)
+
+
+def test_unpack_tar_decompress_error(tar_path, tmp_path):
+    # a truncated stream fails in the decompressor thread
+    data = tar_path.read_bytes()
+    broken_path = tmp_path / "broken.tar.gz"
+    broken_path.write_bytes(data[: len(data) // 2])
+    with pytest.raises((tarfile.TarError, EOFError, OSError)):
+        with open(broken_path, "rb") as fp:
+            StreamUnpacker(fp, jobs=4).unpack(str(tmp_path / "dest"))
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_stream_unpack_truncated_on_member_boundary(tmp_path, jobs):
+    raw = io.BytesIO()
+    with tarfile.open(fileobj=raw, mode="w") as tf:
+        for index in range(2):
+            data = _content(index)
+            info = tarfile.TarInfo("file%d.txt" % index)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    # a gzip stream without the end marker, cut after the first member
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    data = compressor.compress(raw.getvalue()[: tarfile.BLOCKSIZE * 2])
+    data += compressor.flush(zlib.Z_SYNC_FLUSH)
+    with pytest.raises(tarfile.ReadError, match="unexpected end of data"):
+        StreamUnpacker(io.BytesIO(data), jobs=jobs).unpack(str(tmp_path / "dest"))
+
+
+def test_unpack_zip_error(zip_path, tmp_path, monkeypatch):
+    def _after_extract(*_):
+        raise OSError("permission denied")
+
+    monkeypatch.setattr(ZIPArchiver, "after_extract", _after_extract)
+    with pytest.raises(OSError, match="permission denied"):
+        with FileUnpacker(str(zip_path), jobs=4) as fu:
+            fu.unpack(str(tmp_path / "dest"), silent=True)
@@ -0,0 +1,49 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+from Innatera.project.config import ProjectConfig
+from Innatera.project.filetree import ProjectFileTreeIndex
+from Innatera.project.helpers import compute_project_checksum
+from Innatera.run.helpers import clean_build_dir
+
+
+def test_index_survives_clean(tmpdir):
+    tmpdir.join("conf.ini").write("[env:native]\nplatform = native\n")
+    tmpdir.mkdir("src").join("main.cpp").write("int main() {}\n")
+    with tmpdir.as_cwd():
+        config = ProjectConfig(tmpdir.join("conf.ini").strpath)
+        build_dir = config.get("platformio", "build_dir")
+        index_path = os.path.join(
+            config.get("platformio", "workspace_dir"), "filetree.json"
+        )
+        clean_build_dir(build_dir, config)
+        assert os.path.isfile(index_path)
+        marker_path = os.path.join(build_dir, "marker")
+        with open(marker_path, mode="w", encoding="utf8") as fp:
+            fp.write("")
+
+        # a new source file changes the project structure
+        tmpdir.join("src").join("util.cpp").write("\n")
+        checksum = compute_project_checksum(config)
+        clean_build_dir(build_dir, config)
+        assert not os.path.isfile(marker_path)
+        assert os.path.isfile(index_path)
+        with open(os.path.join(build_dir, "project.checksum"), encoding="utf8") as fp:
+            assert fp.read() == checksum
+
+        # the index is reused and lists the new file
+        index = ProjectFileTreeIndex(index_path)
+        assert os.path.join(tmpdir.join("src").strpath, "util.cpp") in index.get_files(
+            tmpdir.join("src").strpath, (".cpp",)
+        )
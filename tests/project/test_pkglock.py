@@ -0,0 +1,259 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import json
+import logging
+
+import pytest
+
+from Innatera import util
+from Innatera.http import InternetConnectionError
+from Innatera.package.manager import _registry as registry_mixin
+from Innatera.package.manager import platform as platform_manager
+from Innatera.package.manager._install import PackageManagerInstallMixin
+from Innatera.package.manager.library import LibraryPackageManager
+from Innatera.package.manager.platform import PlatformPackageManager
+from Innatera.package.manager.tool import ToolPackageManager
+from Innatera.package.meta import PackageItem, PackageMetadata, PackageSpec
+from Innatera.project.pkglock import LOCK_FILE_NAME, ProjectPackageLock
+
+LOCK_ENTRY = dict(
+    owner="acme",
+    id=13,
+    name="Foo",
+    version="1.2.3",
+    system="*",
+    url="https://dl.example.com/foo-1.2.3.tar.gz",
+    checksum="abc",
+)
+REGISTRY_PACKAGE = dict(
+    owner=dict(username="acme"),
+    id=13,
+    name="Foo",
+    versions=[
+        dict(
+            name="1.3.0",
+            files=[
+                dict(
+                    system="*",
+                    download_url="https://dl.example.com/foo-1.3.0.tar.gz",
+                    checksum=dict(sha256="def"),
+                )
+            ],
+        ),
+        dict(
+            name="1.2.3",
+            files=[
+                dict(
+                    system="*",
+                    download_url="https://dl.example.com/foo-1.2.3.tar.gz",
+                    checksum=dict(sha256="abc"),
+                )
+            ],
+        ),
+    ],
+)
+
+
+def _make_tool_package(systems):
+    # version: systems of the package files
+    return dict(
+        owner=dict(username="acme"),
+        id=14,
+        name="tool-foo",
+        versions=[
+            dict(
+                name=name,
+                files=[
+                    dict(
+                        system=[system],
+                        download_url="https://dl.example.com/tool-foo-%s-%s.tar.gz"
+                        % (name, system),
+                        checksum=dict(sha256="%s-%s" % (name, system)),
+                    )
+                    for system in items
+                ],
+            )
+            for name, items in systems.items()
+        ],
+    )
+
+
+@pytest.fixture
+def lm(tmp_path):
+    pkg_dir = tmp_path / "libdeps" / "Foo"
+    pkg_dir.mkdir(parents=True)
+    (pkg_dir / "library.json").write_text('{"name": "Foo", "version": "1.2.3"}')
+    PackageMetadata(
+        "library", "Foo", "1.2.3", spec=PackageSpec(owner="acme", id=13, name="Foo")
+    ).dump(str(pkg_dir / ".piopm"))
+    manager = LibraryPackageManager(str(tmp_path / "libdeps"))
+    manager.set_log_level(logging.ERROR)
+    manager.package_lock = ProjectPackageLock(str(tmp_path), "test")
+    return manager
+
+
+def _load_lock(tmp_path):
+    with open(tmp_path / LOCK_FILE_NAME, encoding="utf8") as fp:
+        return json.load(fp)["envs"]
+
+
+def test_keep(tmp_path):
+    pkg = PackageItem(
+        str(tmp_path), PackageMetadata("library", "Foo", "1.2.3", PackageSpec("Foo"))
+    )
+    spec = PackageSpec("acme/Foo@^1.2.0")
+    lock = ProjectPackageLock(str(tmp_path), "test")
+    assert not lock.keep("library", spec, pkg)
+    lock.set("library", spec, LOCK_ENTRY)
+    lock.save()
+
+    lock = ProjectPackageLock(str(tmp_path), "test")
+    assert lock.keep("library", spec, pkg)
+    # another installed version
+    pkg.metadata.version = "1.3.0"
+    lock = ProjectPackageLock(str(tmp_path), "test")
+    assert not lock.keep("library", spec, pkg)
+    lock.save()
+    assert not (tmp_path / LOCK_FILE_NAME).is_file()
+
+
+def test_lock_package_installed_before(lm, tmp_path, monkeypatch):
+    requests = []
+
+    def _fetch_registry_package(spec):
+        requests.append(spec)
+        return REGISTRY_PACKAGE
+
+    monkeypatch.setattr(lm, "fetch_registry_package", _fetch_registry_package)
+    lm.install("acme/Foo@^1.2.0")
+    lm.package_lock.save()
+    assert len(requests) == 1
+    # the installed version is locked instead of the latest one
+    assert _load_lock(tmp_path) == {
+        "test": {"library": {"acme/Foo @ ^1.2.0": {"*": LOCK_ENTRY}}}
+    }
+
+    # the next installation does not query the registry
+    lm = LibraryPackageManager(lm.package_dir)
+    lm.set_log_level(logging.ERROR)
+    lm.package_lock = ProjectPackageLock(str(tmp_path), "test")
+    monkeypatch.setattr(lm, "fetch_registry_package", _fetch_registry_package)
+    lm.install("acme/Foo@^1.2.0")
+    lm.package_lock.save()
+    assert len(requests) == 1
+    assert _load_lock(tmp_path)["test"]["library"]["acme/Foo @ ^1.2.0"] == {
+        "*": LOCK_ENTRY
+    }
+
+
+def test_lock_package_installed_before_offline(lm, tmp_path, monkeypatch):
+    def _fetch_registry_package(_):
+        raise InternetConnectionError()
+
+    monkeypatch.setattr(lm, "fetch_registry_package", _fetch_registry_package)
+    pkg = lm.install("acme/Foo@^1.2.0")
+    assert str(pkg.metadata.version) == "1.2.3"
+    lm.package_lock.save()
+    assert not (tmp_path / LOCK_FILE_NAME).is_file()
+
+
+def test_platform_passes_lock_to_tool_manager(tmp_path, monkeypatch):
+    tool_pm = ToolPackageManager(str(tmp_path / "packages"))
+
+    class FakePlatform:
+        pm = tool_pm
+
+        def ensure_engine_compatible(self):
+            pass
+
+        def on_installed(self):
+            pass
+
+        def install_required_packages(self, force=False):
+            assert self.pm.package_lock is package_lock
+
+    monkeypatch.setattr(
+        PackageManagerInstallMixin, "install", lambda *args, **kwargs: "pkg"
+    )
+    monkeypatch.setattr(
+        platform_manager.PlatformFactory, "new", lambda *args, **kwargs: FakePlatform()
+    )
+    package_lock = ProjectPackageLock(str(tmp_path), "test")
+    pm = PlatformPackageManager(str(tmp_path / "platforms"))
+    pm.package_lock = package_lock
+    pm.install("acme/platform")
+    assert tool_pm.package_lock is package_lock
+
+
+def test_lock_per_system(tmp_path, monkeypatch):
+    requests = []
+
+    def _fetch_sources(systype, package):
+        def _fetch_registry_package(spec):
+            requests.append(spec)
+            return package
+
+        monkeypatch.setattr(util, "get_systype", lambda: systype)
+        monkeypatch.setattr(
+            registry_mixin, "RegistryFileMirrorIterator", lambda url: [(url, None)]
+        )
+        tm = ToolPackageManager(str(tmp_path / "packages"))
+        tm.package_lock = ProjectPackageLock(str(tmp_path), "test")
+        monkeypatch.setattr(tm, "fetch_registry_package", _fetch_registry_package)
+        _, sources = tm.fetch_registry_package_sources(
+            PackageSpec("acme/tool-foo@^1.0.0")
+        )
+        tm.package_lock.save()
+        return next(sources)
+
+    def _locked_systems():
+        return {
+            system: entry["version"]
+            for system, entry in _load_lock(tmp_path)["test"]["tool"][
+                "acme/tool-foo @ ^1.0.0"
+            ].items()
+        }
+
+    package = _make_tool_package({"1.0.0": ["darwin_arm64", "linux_x86_64"]})
+    assert _fetch_sources("darwin_arm64", package) == (
+        "https://dl.example.com/tool-foo-1.0.0-darwin_arm64.tar.gz",
+        "1.0.0-darwin_arm64",
+    )
+    assert len(requests) == 1
+    # another system does not use the locked file, but keeps the locked version
+    package = _make_tool_package(
+        {"1.0.0": ["darwin_arm64", "linux_x86_64"], "1.1.0": ["linux_x86_64"]}
+    )
+    assert _fetch_sources("linux_x86_64", package) == (
+        "https://dl.example.com/tool-foo-1.0.0-linux_x86_64.tar.gz",
+        "1.0.0-linux_x86_64",
+    )
+    assert len(requests) == 2
+    assert _locked_systems() == {"darwin_arm64": "1.0.0", "linux_x86_64": "1.0.0"}
+    # every system uses its own locked file
+    for systype in ("darwin_arm64", "linux_x86_64"):
+        assert _fetch_sources(systype, package)[0].endswith("1.0.0-%s.tar.gz" % systype)
+    assert len(requests) == 2
+
+    # the locked version is not available for a system
+    package = _make_tool_package(
+        {"1.0.0": ["darwin_arm64"], "1.1.0": ["darwin_arm64", "windows_amd64"]}
+    )
+    assert _fetch_sources("windows_amd64", package)[0].endswith(
+        "1.1.0-windows_amd64.tar.gz"
+    )
+    assert len(requests) == 3
+    # the systems locked to another version are dropped
+    assert _locked_systems() == {"windows_amd64": "1.1.0"}
@@ -0,0 +1,147 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import json
+
+import pytest
+
+from Innatera import app
+from Innatera.registry import client as registry_client
+from Innatera.registry.cache import RegistryMetadataCache
+from Innatera.registry.client import RegistryClient
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self.text = json.dumps(data)
+        self.headers = headers or {}
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+@pytest.fixture
+def registry(func_isolated_pio_core, tmp_path, monkeypatch):
+    # the session-wide `clirunner` shares a cache dir between tests
+    monkeypatch.setenv("PLATFORMIO_CACHE_DIR", str(tmp_path / "cache"))
+    requests = []
+    responses = []
+
+    def _send_request(self, method, path, **kwargs):
+        requests.append(dict(kwargs, method=method, path=path))
+        return responses.pop(0)
+
+    monkeypatch.setattr(RegistryClient, "send_request", _send_request)
+    monkeypatch.delenv("PLATFORMIO_AUTH_TOKEN", raising=False)
+    client = RegistryClient()
+    client.requests = requests
+    client.responses = responses
+    return client
+
+
+def test_fresh_entry(registry):
+    registry.responses.append(FakeResponse(200, {"name": "foo"}, {"ETag": '"v1"'}))
+    assert registry.fetch_metadata("/v3/packages/acme/library/foo") == {"name": "foo"}
+    assert registry.fetch_metadata("/v3/packages/acme/library/foo") == {"name": "foo"}
+    assert len(registry.requests) == 1
+    # other parameters
+    registry.responses.append(FakeResponse(200, {"items": []}))
+    assert registry.fetch_metadata("/v3/search", {"query": "foo"}) == {"items": []}
+    assert len(registry.requests) == 2
+
+
+def test_revalidation(registry, monkeypatch):
+    monkeypatch.setattr(registry_client, "METADATA_CACHE_VALID", "0s")
+    path = "/v3/packages/acme/library/foo"
+    registry.responses.append(
+        FakeResponse(
+            200,
+            {"name": "foo"},
+            {"ETag": '"v1"', "Last-Modified": "Wed, 21 Oct 2026 07:28:00 GMT"},
+        )
+    )
+    assert registry.fetch_metadata(path) == {"name": "foo"}
+    assert registry.requests[-1]["headers"] == {}
+
+    # an expired entry is revalidated with a conditional request
+    registry.responses.append(FakeResponse(304))
+    assert registry.fetch_metadata(path) == {"name": "foo"}
+    assert registry.requests[-1]["headers"] == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Wed, 21 Oct 2026 07:28:00 GMT",
+    }
+
+    # a revalidated entry is fresh again
+    monkeypatch.setattr(registry_client, "METADATA_CACHE_VALID", "1h")
+    registry.responses.append(FakeResponse(304))
+    assert registry.fetch_metadata(path) == {"name": "foo"}
+    assert len(registry.requests) == 3
+    assert registry.fetch_metadata(path) == {"name": "foo"}
+    assert len(registry.requests) == 3
+
+
+def test_expired_entry_is_replaced(registry, monkeypatch):
+    monkeypatch.setattr(registry_client, "METADATA_CACHE_VALID", "0s")
+    path = "/v3/packages/acme/library/foo"
+    registry.responses.append(FakeResponse(200, {"version": "1.0.0"}, {"ETag": "1"}))
+    assert registry.fetch_metadata(path) == {"version": "1.0.0"}
+    registry.responses.append(FakeResponse(200, {"version": "2.0.0"}, {"ETag": "2"}))
+    assert registry.fetch_metadata(path) == {"version": "2.0.0"}
+    registry.responses.append(FakeResponse(304))
+    assert registry.fetch_metadata(path) == {"version": "2.0.0"}
+    assert registry.requests[-1]["headers"] == {"If-None-Match": "2"}
+
+
+def test_authorized_requests_of_accounts(registry, monkeypatch):
+    path = "/v3/packages/acme/library/private"
+
+    def _fetch(data):
+        registry.responses.append(FakeResponse(200, data))
+        return registry.fetch_metadata(path, x_with_authorization=True)
+
+    app.set_state_item("account", {"username": "alice"})
+    assert _fetch({"owner": "alice"}) == {"owner": "alice"}
+    app.set_state_item("account", {"username": "bob"})
+    assert _fetch({"owner": "bob"}) == {"owner": "bob"}
+    monkeypatch.setenv("PLATFORMIO_AUTH_TOKEN", "ci-token")
+    assert _fetch({"owner": "ci"}) == {"owner": "ci"}
+    assert len(registry.requests) == 3
+
+    # each account reads its own entry
+    monkeypatch.delenv("PLATFORMIO_AUTH_TOKEN")
+    app.set_state_item("account", {"username": "alice"})
+    assert registry.fetch_metadata(path, x_with_authorization=True) == {
+        "owner": "alice"
+    }
+    # an anonymous request does not share the authorized entries
+    registry.responses.append(FakeResponse(200, {"public": True}))
+    assert registry.fetch_metadata(path) == {"public": True}
+    assert len(registry.requests) == 4
+
+
+def test_account_identity(func_isolated_pio_core, monkeypatch):
+    monkeypatch.delenv("PLATFORMIO_AUTH_TOKEN", raising=False)
+    assert RegistryMetadataCache.get_account_identity() == "anonymous"
+    app.set_state_item("account", {"auth": {"refresh_token": "secret"}})
+    identity = RegistryMetadataCache.get_account_identity()
+    assert identity.startswith("token:") and "secret" not in identity
+    app.set_state_item("account", {"username": "alice"})
+    assert RegistryMetadataCache.get_account_identity() == "user:alice"
+    monkeypatch.setenv("PLATFORMIO_AUTH_TOKEN", "ci-token")
+    assert RegistryMetadataCache.get_account_identity().startswith("token:")
+    assert RegistryMetadataCache.key_from_request(
+        "/path", None, "user:alice"
+    ) != RegistryMetadataCache.key_from_request("/path", None, "user:bob")
@@ -0,0 +1,207 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+import SCons.Tool
+
+from Innatera import app, fs
+from Innatera.platform.factory import PlatformFactory
+from Innatera.run.server import BuildServer, BuildServerClient
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "fork"), reason="The build server requires `fork`"
+)
+
+SCONS_SCRIPT = """
+import sys
+import time
+
+time.sleep(float(sys.argv[1]))
+print("built in", sys.argv[1])
+sys.exit(int(sys.argv[2]))
+"""
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    scons_dir = tmp_path / "scons"
+    scons_dir.mkdir()
+    (scons_dir / "scons.py").write_text(SCONS_SCRIPT)
+    monkeypatch.setattr(BuildServer, "warm_up", lambda _: None)
+    obj = BuildServer(str(tmp_path / "server.sock"), str(scons_dir))
+    thread = threading.Thread(target=obj.serve_forever, daemon=True)
+    thread.start()
+    client = BuildServerClient(obj.socket_path)
+    for _ in range(50):
+        if client.is_running():
+            break
+        time.sleep(0.1)
+    yield obj
+    client.stop()
+    thread.join(10)
+    assert not thread.is_alive()
+
+
+def _run_build(server, tmp_path, args, scons_script=None):
+    output_path = tmp_path / ("%s.log" % "-".join(args))
+    with open(output_path, mode="w", encoding="utf8") as fp:
+        result = BuildServerClient(server.socket_path).run(
+            scons_script or server.scons_script,
+            args,
+            dict(pioenv="test", project_config=str(tmp_path / "conf.ini")),
+            fp,
+            fp,
+        )
+    return result, output_path.read_text()
+
+
+def test_build(server, tmp_path):
+    assert _run_build(server, tmp_path, ["0", "0"]) == (0, "built in 0\n")
+    assert _run_build(server, tmp_path, ["0", "3"]) == (3, "built in 0\n")
+
+
+def test_incompatible_client(server, tmp_path):
+    scons_script = str(tmp_path / "other" / "scons.py")
+    assert _run_build(server, tmp_path, ["0", "0"], scons_script) == (
+        None,
+        "",
+    )
+
+
+def test_concurrent_connections(server, tmp_path):
+    # a client which has connected and does not send a request
+    stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stalled.connect(server.socket_path)
+    stalled.sendall(b'{"command": ')
+
+    results = {}
+    threads = [
+        threading.Thread(
+            target=lambda name=name, duration=duration: results.update(
+                {name: _run_build(server, tmp_path, [duration, "0"])}
+            )
+        )
+        for name, duration in (("slow", "1"), ("fast", "0"))
+    ]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    threads[1].join(5)
+    assert results.get("fast") == (0, "built in 0\n")
+    assert "slow" not in results
+    threads[0].join(5)
+    assert results["slow"] == (0, "built in 1\n")
+    assert time.time() - start < 5
+    stalled.close()
+
+
+def test_aborted_client(server, tmp_path):
+    # a client in own process, a forked build inherits the sockets of tests
+    client = subprocess.Popen(  # pylint: disable=consider-using-with
+        [
+            sys.executable,
+            "-c",
+            "import sys; from %s import BuildServerClient; "
+            "BuildServerClient(sys.argv[1]).run(sys.argv[2], ['60', '0'], "
+            "dict(pioenv='test', project_config=sys.argv[3]), "
+            "sys.stdout, sys.stdout)" % BuildServer.__module__,
+            server.socket_path,
+            server.scons_script,
+            str(tmp_path / "conf.ini"),
+        ],
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+        stdout=subprocess.PIPE,
+    )
+    connections = server._connections  # pylint: disable=protected-access
+    for _ in range(50):
+        if any(state["pid"] for state in connections.values()):
+            break
+        time.sleep(0.1)
+    pid = next(state["pid"] for state in connections.values())
+    client.kill()
+    client.communicate()
+    # the build is interrupted and the server has no active connections
+    for _ in range(50):
+        if not connections:
+            break
+        time.sleep(0.1)
+    assert not connections
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+
+
+def test_stop(server):
+    client = BuildServerClient(server.socket_path)
+    assert client.is_running()
+    assert client.stop()
+    for _ in range(50):
+        if not os.path.exists(server.socket_path):
+            break
+        time.sleep(0.1)
+    assert not client.is_running()
+    assert not client.stop()
+
+
+def test_warm_up(tmp_path):
+    BuildServer(str(tmp_path / "server.sock"), str(tmp_path)).warm_up()
+    # SCons reuses the top-level modules of the builder tools
+    module = sys.modules["piolib"]
+    SCons.Tool.Tool(
+        "piolib", toolpath=[os.path.join(fs.get_source_dir(), "builder", "tools")]
+    )
+    assert sys.modules["piolib"] is module
+    assert "SCons.Tool.cc" in sys.modules
+
+
+def test_warm_up_project(tmp_path, monkeypatch):
+    # pylint: disable=protected-access
+    monkeypatch.setattr(PlatformFactory, "_INSTANCES_CACHE", {})
+    manifest_path = tmp_path / "platform" / "platform.json"
+    manifest_path.parent.mkdir()
+    manifest_path.write_text('{"name": "foo", "title": "Foo", "version": "1.0.0"}')
+    (tmp_path / "conf.ini").write_text(
+        "[env:test]\nplatform = %s\n" % manifest_path.parent
+    )
+    request = dict(
+        cwd=str(tmp_path), project_config=str(tmp_path / "conf.ini"), env="test"
+    )
+    BuildServer.warm_up_project(request)
+    cache = PlatformFactory._INSTANCES_CACHE
+    (item,) = cache.values()
+    BuildServer.warm_up_project(request)
+    assert list(cache.values()) == [item]
+    # a modified platform is loaded again
+    mtime = manifest_path.stat().st_mtime + 10
+    os.utime(manifest_path, (mtime, mtime))
+    BuildServer.warm_up_project(request)
+    assert cache[(request["project_config"], str(manifest_path.parent))] != item
+    (item,) = cache.values()
+
+    # a forked build takes over the instance of own project
+    monkeypatch.setattr(PlatformFactory, "_INSTANCES_CACHE", dict(cache))
+    app.set_session_var("custom_project_conf", request["project_config"])
+    try:
+        platform = PlatformFactory.from_env("test")
+        assert platform is item["platform"]
+        assert platform.project_env == "test"
+        assert PlatformFactory.from_env("test") is not platform
+    finally:
+        app.set_session_var("custom_project_conf", None)
@@ -0,0 +1,171 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+import os
+
+import pytest
+
+from Innatera import telemetry
+from Innatera.platform._run import PlatformRunMixin
+from Innatera.project import filetree
+from Innatera.project.config import ProjectConfig
+from Innatera.run.snapshot import BuildSnapshot
+
+
+class FakePlatform(PlatformRunMixin):
+    name = "fake"
+    version = "1.0.0"
+
+    def __init__(self, project_dir):
+        self.project_dir = project_dir
+        self.config = ProjectConfig(os.path.join(project_dir, "conf.ini"))
+        self.silent = True
+        self.verbose = False
+        self.builds = []
+        self.on_build = None
+
+    def get_dir(self):
+        return os.path.join(self.project_dir, "platform")
+
+    def get_build_script(self):
+        return os.path.join(self.get_dir(), "builder", "main.py")
+
+    def ensure_engine_compatible(self):
+        pass
+
+    @staticmethod
+    def get_installed_packages(with_optional=True):
+        return []
+
+    def _run_scons(self, variables, targets, jobs):
+        self.builds.append(targets)
+        build_dir = self.get_build_dir()
+        os.makedirs(build_dir, exist_ok=True)
+        with open(os.path.join(build_dir, "firmware.bin"), "w", encoding="utf8") as fp:
+            fp.write("firmware %d" % len(self.builds))
+        if self.on_build:
+            self.on_build()
+        return {"out": None, "err": None, "returncode": 0}
+
+    def get_build_dir(self):
+        return os.path.join(self.config.get("platformio", "build_dir"), "test")
+
+    def build(self, targets=None):
+        builds_nums = len(self.builds)
+        self.run({"pioenv": "test"}, targets or [], silent=True, verbose=False, jobs=1)
+        return len(self.builds) > builds_nums
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode="w", encoding="utf8") as fp:
+        fp.write(content)
+
+
+@pytest.fixture
+def platform(tmp_path, monkeypatch):
+    monkeypatch.setattr(telemetry, "log_platform_run", lambda *args, **kwargs: None)
+    project_dir = str(tmp_path)
+    _write(os.path.join(project_dir, "conf.ini"), "[env:test]\nbuild_fast_noop = yes\n")
+    _write(os.path.join(project_dir, "src", "main.cpp"), "int main() {}\n")
+    _write(os.path.join(project_dir, "platform", "builder", "main.py"), "\n")
+    monkeypatch.chdir(project_dir)
+    return FakePlatform(project_dir)
+
+
+def _snapshot_path(platform):
+    return os.path.join(platform.get_build_dir(), BuildSnapshot.FILE_NAME)
+
+
+def test_first_run(platform):
+    assert not os.path.isfile(_snapshot_path(platform))
+    assert platform.build()
+    assert os.path.isfile(_snapshot_path(platform))
+    # nothing changed
+    assert not platform.build()
+    # a source file is modified
+    _write(os.path.join(platform.project_dir, "src", "main.cpp"), "int main() {1;}\n")
+    assert platform.build()
+    assert not platform.build()
+
+
+def test_disabled_for_targets(platform):
+    assert platform.build()
+    assert platform.build(["upload"])
+    assert platform.build(["upload"])
+
+
+def test_edit_during_build(platform):
+    def _edit_source():
+        _write(
+            os.path.join(platform.project_dir, "src", "main.cpp"), "int main() {2;}\n"
+        )
+
+    # the first build, without a snapshot
+    platform.on_build = _edit_source
+    assert platform.build()
+    # the source was changed after the build had read it
+    platform.on_build = None
+    assert platform.build()
+    assert not platform.build()
+
+    # the next build, with an up-to-date snapshot
+    platform.on_build = _edit_source
+    _write(os.path.join(platform.project_dir, "src", "main.cpp"), "int main() {3;}\n")
+    assert platform.build()
+    platform.on_build = None
+    assert platform.build()
+    assert not platform.build()
+
+
+def test_artifact_missing(platform):
+    assert platform.build()
+    assert not platform.build()
+    os.remove(os.path.join(platform.get_build_dir(), "firmware.bin"))
+    assert platform.build()
+    assert not platform.build()
+    # an artifact is overwritten by another tool
+    with open(
+        os.path.join(platform.get_build_dir(), "firmware.bin"),
+        mode="a",
+        encoding="utf8",
+    ) as fp:
+        fp.write("patched")
+    assert platform.build()
+
+
+def test_watched_dirs_index(platform, monkeypatch):
+    # trust the mtimes of just created directories
+    monkeypatch.setattr(filetree, "RACY_MTIME_WINDOW", 0)
+    lib_src_dir = os.path.join(platform.project_dir, "lib", "Foo", "src")
+    _write(os.path.join(lib_src_dir, "foo.h"), "\n")
+    assert platform.build()
+    assert not platform.build()
+
+    listed_dirs = []
+    scandir = os.scandir
+
+    def _scandir(path):
+        listed_dirs.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", _scandir)
+    # only the modified directories are listed again
+    _write(os.path.join(lib_src_dir, "foo.c"), "\n")
+    assert platform.build()
+    assert lib_src_dir in listed_dirs
+    assert os.path.join(platform.project_dir, "src") not in listed_dirs
+    del listed_dirs[:]
+    assert not platform.build()
+    assert not listed_dirs